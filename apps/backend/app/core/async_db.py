@@ -0,0 +1,281 @@
+"""Async PostgREST access over one shared, pooled HTTP client.
+
+The supabase-py client is synchronous, so every `def` handler using it holds an AnyIO worker
+thread (40 by default) for its whole database round trip. Handlers on the hot paths use this
+module instead and await the request on the event loop; concurrency is then bounded by the
+connection pool and the database, not by the thread count.
+
+    db = get_async_db()
+    rows = await db.table("screenings").select("*").eq("user_id", uid).limit(25).execute()
+
+`execute()` returns the decoded JSON body (a list of rows, an object for `single()`, or the
+RPC result). Errors raise postgrest's `APIError`, so `e.code` / `e.message` handling is the
+same as with the sync client.
+
+Settings:
+- SUPABASE_HTTP_TIMEOUT_SECONDS (10): per attempt; `execute(timeout=...)` overrides it
+- SUPABASE_HTTP_RETRIES (2): extra attempts on connection failures, 429 and 502-504
+- SUPABASE_HTTP_MAX_CONNECTIONS (100) / SUPABASE_HTTP_MAX_KEEPALIVE (20)
+
+The pool speaks HTTP/2 (one multiplexed connection per host) when `h2` is installed and
+falls back to HTTP/1.1 keep-alive otherwise. Requests that are not known to be idempotent
+(inserts, RPCs) are only retried when they cannot have reached the server.
+"""
+
+import asyncio
+import importlib.util
+import logging
+import os
+import random
+from typing import Any, Iterable, Optional
+
+import httpx
+from postgrest.exceptions import APIError
+
+
+_log = logging.getLogger(__name__)
+
+_RETRY_STATUSES = frozenset({429, 502, 503, 504})
+# Raised before the request was written; safe to retry for any method
+_NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return max(0.0, float(os.getenv(name, str(default))))
+    except ValueError:
+        return default
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(0, int(os.getenv(name, str(default))))
+    except ValueError:
+        return default
+
+
+def _filter_value(value: Any) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return "null" if value is None else str(value)
+
+
+def _quote_list_item(value: Any) -> str:
+    text = _filter_value(value)
+    if any(c in text for c in ',()"\\ '):
+        return '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+    return text
+
+
+class AsyncQuery:
+    """One PostgREST request; built like the supabase-py query builder, then awaited."""
+
+    def __init__(self, db: "AsyncDB", method: str, path: str) -> None:
+        self._db = db
+        self._method = method
+        self._path = path
+        self._params: list[tuple[str, str]] = []
+        self._prefer: list[str] = []
+        self._headers: dict[str, str] = {}
+        self._body: Any = None
+        # Reads, updates and upserts may be replayed; inserts and RPCs opt in via idempotent()
+        self._idempotent = method in ("GET", "HEAD", "PATCH", "DELETE")
+
+    # --- verbs ---
+
+    def select(self, columns: str = "*") -> "AsyncQuery":
+        self._params.append(("select", columns.replace(" ", "")))
+        return self
+
+    def insert(self, row: Any) -> "AsyncQuery":
+        self._method, self._body, self._idempotent = "POST", row, False
+        self._prefer.append("return=representation")
+        return self
+
+    def upsert(self, row: Any, on_conflict: Optional[str] = None) -> "AsyncQuery":
+        self._method, self._body, self._idempotent = "POST", row, True
+        self._prefer += ["return=representation", "resolution=merge-duplicates"]
+        if on_conflict:
+            self._params.append(("on_conflict", on_conflict))
+        return self
+
+    def update(self, values: dict) -> "AsyncQuery":
+        self._method, self._body, self._idempotent = "PATCH", values, True
+        self._prefer.append("return=representation")
+        return self
+
+    # --- filters and modifiers ---
+
+    def eq(self, column: str, value: Any) -> "AsyncQuery":
+        self._params.append((column, f"eq.{_filter_value(value)}"))
+        return self
+
+    def in_(self, column: str, values: Iterable[Any]) -> "AsyncQuery":
+        self._params.append((column, f"in.({','.join(_quote_list_item(v) for v in values)})"))
+        return self
+
+    def order(self, column: str, *, desc: bool = False) -> "AsyncQuery":
+        self._params.append(("order", f"{column}.{'desc' if desc else 'asc'}"))
+        return self
+
+    def limit(self, count: int) -> "AsyncQuery":
+        self._params.append(("limit", str(int(count))))
+        return self
+
+    def single(self) -> "AsyncQuery":
+        self._headers["Accept"] = "application/vnd.pgrst.object+json"
+        return self
+
+    def idempotent(self, value: bool = True) -> "AsyncQuery":
+        """Allow retrying after the request may have reached the server (e.g. read-only RPCs)."""
+        self._idempotent = value
+        return self
+
+    async def execute(self, *, timeout: Optional[float] = None) -> Any:
+        headers = dict(self._headers)
+        if self._prefer:
+            headers["Prefer"] = ",".join(self._prefer)
+        return await self._db.request(
+            self._method,
+            self._path,
+            params=self._params,
+            json_body=self._body,
+            headers=headers,
+            timeout=timeout,
+            idempotent=self._idempotent,
+        )
+
+
+class AsyncDB:
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str,
+        *,
+        timeout: float = 10.0,
+        retries: int = 2,
+        max_connections: int = 100,
+        max_keepalive: int = 20,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.timeout = timeout
+        self.retries = retries
+        self.http2 = transport is None and importlib.util.find_spec("h2") is not None
+        self._limits = httpx.Limits(
+            max_connections=max_connections or None,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=30.0,
+        )
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _http(self) -> httpx.AsyncClient:
+        # Created on first use so the pool belongs to the serving event loop
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=f"{self.base_url}/rest/v1",
+                headers={"apikey": self.api_key, "Authorization": f"Bearer {self.api_key}"},
+                http2=self.http2,
+                limits=self._limits,
+                timeout=self.timeout,
+                transport=self._transport,
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        client, self._client = self._client, None
+        if client is not None:
+            await client.aclose()
+
+    def table(self, name: str) -> AsyncQuery:
+        return AsyncQuery(self, "GET", f"/{name}")
+
+    def rpc(self, name: str, params: Optional[dict] = None) -> AsyncQuery:
+        query = AsyncQuery(self, "POST", f"/rpc/{name}")
+        query._body = params or {}
+        query._idempotent = False
+        return query
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        *,
+        params: Optional[list[tuple[str, str]]] = None,
+        json_body: Any = None,
+        headers: Optional[dict[str, str]] = None,
+        timeout: Optional[float] = None,
+        idempotent: bool = True,
+    ) -> Any:
+        client = self._http()
+        attempts = 1 + self.retries
+        for attempt in range(attempts):
+            last = attempt == attempts - 1
+            try:
+                resp = await client.request(
+                    method,
+                    path,
+                    params=params,
+                    json=json_body,
+                    headers=headers,
+                    timeout=self.timeout if timeout is None else timeout,
+                )
+            except _NOT_SENT_ERRORS as e:
+                if last:
+                    raise APIError({"message": f"PostgREST unreachable: {e}", "code": "HTTP"}) from e
+            except httpx.TransportError as e:
+                if last or not idempotent:
+                    raise APIError({"message": f"PostgREST request failed: {e}", "code": "HTTP"}) from e
+            else:
+                if resp.status_code < 400:
+                    return _decode(resp)
+                if last or resp.status_code not in _RETRY_STATUSES or not (idempotent or resp.status_code == 429):
+                    raise APIError(_error_body(resp))
+            delay = min(2.0, 0.1 * (2 ** attempt)) * (0.5 + random.random())
+            _log.debug("[db] %s %s retry %s in %.2fs", method, path, attempt + 1, delay)
+            await asyncio.sleep(delay)
+        raise AssertionError("unreachable")
+
+
+def _decode(resp: httpx.Response) -> Any:
+    if not resp.content:
+        return None
+    return resp.json()
+
+
+def _error_body(resp: httpx.Response) -> dict:
+    try:
+        body = resp.json()
+    except ValueError:
+        body = None
+    if not isinstance(body, dict):
+        body = {"message": resp.text or resp.reason_phrase}
+    body.setdefault("code", str(resp.status_code))
+    return body
+
+
+_db: Optional[AsyncDB] = None
+
+
+def get_async_db() -> AsyncDB:
+    global _db
+    if _db is None:
+        # Same project and (service role) key as the sync client
+        from app.core.supabase_client import api_key, project_url
+
+        _db = AsyncDB(
+            project_url,
+            api_key,
+            timeout=_env_float("SUPABASE_HTTP_TIMEOUT_SECONDS", 10.0),
+            retries=_env_int("SUPABASE_HTTP_RETRIES", 2),
+            max_connections=_env_int("SUPABASE_HTTP_MAX_CONNECTIONS", 100),
+            max_keepalive=_env_int("SUPABASE_HTTP_MAX_KEEPALIVE", 20),
+        )
+    return _db
+
+
+async def close_async_db() -> None:
+    if _db is not None:
+        await _db.aclose()
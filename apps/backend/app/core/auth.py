@@ -1,21 +1,23 @@
+import asyncio
+from collections import OrderedDict
+import hashlib
+import os
+import threading
 from typing import Optional
 
 from fastapi import HTTPException, status, Request
 from fastapi.security import HTTPBearer
-from jose import jwt, JWTError
-from jose.utils import base64url_decode
+from jose import jwk, jwt, JWTError
+from jose.backends.base import Key
 from pydantic import BaseModel
 import time
 import requests
-from cryptography.hazmat.primitives.asymmetric.rsa import RSAPublicNumbers
-from cryptography.hazmat.primitives import serialization
-from cryptography.hazmat.backends import default_backend
 
-from app.core.config import Settings
+from app.core.config import get_settings
+from app.core.jwks import JwksStore, default_cache_path, jwks_ttl_seconds, unknown_kid_min_interval
 from app.core.supabase_client import supabase
 
 oauth2_scheme = HTTPBearer()
-settings = Settings()
 
 
 class User(BaseModel):
@@ -23,47 +25,97 @@ class User(BaseModel):
     email: str
 
 
-_JWKS_CACHE: dict[str, object] = {"keys": None, "fetched_at": 0.0}
-_JWKS_TTL_SECONDS = 60 * 60  # 1 hour
+_jwks_store = JwksStore(
+    lambda: get_settings().get_supabase_project_url().rstrip("/") + "/auth/v1/keys",
+    ttl_seconds=jwks_ttl_seconds(),
+    unknown_kid_min_interval=unknown_kid_min_interval(),
+    cache_path=default_cache_path(),
+)
+
+# Verified payloads by SHA-256 of the token, least recently used first; entries expire with the token
+_VERIFIED_TOKENS: "OrderedDict[bytes, tuple[dict, float]]" = OrderedDict()
+_VERIFIED_TOKENS_LOCK = threading.Lock()
+_HS256_KEYS: dict[str, Key] = {}
+
+
+def _verified_cache_size() -> int:
+    try:
+        return max(0, int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "4096")))
+    except ValueError:
+        return 4096
 
 
 def _get_expected_issuer() -> str:
-    base = settings.get_supabase_project_url().rstrip("/")
+    base = get_settings().get_supabase_project_url().rstrip("/")
     return f"{base}/auth/v1"
 
 
-def _get_jwks() -> list[dict]:
-    now = time.time()
-    keys = _JWKS_CACHE.get("keys")
-    fetched_at = _JWKS_CACHE.get("fetched_at") or 0
-    if keys and isinstance(fetched_at, (int, float)) and (now - float(fetched_at) < _JWKS_TTL_SECONDS):
-        return keys  # type: ignore[return-value]
-    # Fetch JWKS from Supabase GoTrue
-    keys_url = settings.get_supabase_project_url().rstrip("/") + "/auth/v1/keys"
-    response = requests.get(keys_url, timeout=5)
-    response.raise_for_status()
-    data = response.json()
-    keys = data.get("keys", []) if isinstance(data, dict) else []
-    _JWKS_CACHE["keys"] = keys
-    _JWKS_CACHE["fetched_at"] = now
-    return keys
-
-
-def _rsa_public_pem_from_jwk(jwk_data: dict) -> bytes:
-    n_b = base64url_decode(jwk_data["n"].encode("utf-8"))
-    e_b = base64url_decode(jwk_data["e"].encode("utf-8"))
-    n_int = int.from_bytes(n_b, "big")
-    e_int = int.from_bytes(e_b, "big")
-    public_numbers = RSAPublicNumbers(e_int, n_int)
-    public_key = public_numbers.public_key(default_backend())
-    pem = public_key.public_bytes(
-        encoding=serialization.Encoding.PEM,
-        format=serialization.PublicFormat.SubjectPublicKeyInfo,
-    )
-    return pem
+def get_jwks_store() -> JwksStore:
+    return _jwks_store
+
+
+def _get_signing_key(kid: str) -> Optional[Key]:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        # Off the event loop (worker threads, scripts) a blocking refresh is acceptable
+        return _jwks_store.ensure_key_blocking(kid)
+    # On the event loop this sync path must not fetch: an unknown kid fails this request and
+    # schedules a (throttled, single-flight) refresh for the next ones
+    key = _jwks_store.get_key(kid)
+    if key is None:
+        _jwks_store.schedule_key_fetch(kid)
+    return key
+
+
+def _hs256_key() -> Key:
+    secret = get_settings().get_supabase_jwt_secret()
+    key = _HS256_KEYS.get(secret)
+    if key is None:
+        key = jwk.construct(secret, algorithm="HS256")
+        _HS256_KEYS.clear()
+        _HS256_KEYS[secret] = key
+    return key
+
+
+def _cached_payload(token_hash: bytes) -> Optional[dict]:
+    with _VERIFIED_TOKENS_LOCK:
+        entry = _VERIFIED_TOKENS.get(token_hash)
+        if entry is None:
+            return None
+        payload, exp = entry
+        if exp <= time.time():
+            del _VERIFIED_TOKENS[token_hash]
+            return None
+        _VERIFIED_TOKENS.move_to_end(token_hash)
+        return payload
+
+
+def _remember_payload(token_hash: bytes, payload: dict) -> None:
+    limit = _verified_cache_size()
+    exp = payload.get("exp")
+    # Tokens without an expiry are verified every time
+    if not limit or not isinstance(exp, (int, float)):
+        return
+    with _VERIFIED_TOKENS_LOCK:
+        _VERIFIED_TOKENS[token_hash] = (payload, float(exp))
+        _VERIFIED_TOKENS.move_to_end(token_hash)
+        while len(_VERIFIED_TOKENS) > limit:
+            _VERIFIED_TOKENS.popitem(last=False)
 
 
 def decode_supabase_jwt(token: str) -> dict:
+    # Repeat tokens are a hash lookup; signature, audience and issuer were checked on first sight
+    token_hash = hashlib.sha256(token.encode("utf-8")).digest()
+    cached = _cached_payload(token_hash)
+    if cached is not None:
+        return cached
+    payload = _verify_supabase_jwt(token)
+    _remember_payload(token_hash, payload)
+    return payload
+
+
+def _verify_supabase_jwt(token: str) -> dict:
     try:
         header = jwt.get_unverified_header(token)
         alg = str(header.get("alg") or "")
@@ -78,23 +130,16 @@ def decode_supabase_jwt(token: str) -> dict:
                     detail="Missing key id (kid) in token header.",
                     headers={"WWW-Authenticate": "Bearer"},
                 )
-            keys = _get_jwks()
-            jwk_for_kid = next((k for k in keys if k.get("kid") == kid), None)
-            if not jwk_for_kid:
-                # Refresh once in case of rotation
-                _JWKS_CACHE["fetched_at"] = 0.0
-                keys = _get_jwks()
-                jwk_for_kid = next((k for k in keys if k.get("kid") == kid), None)
-            if not jwk_for_kid:
+            signing_key = _get_signing_key(str(kid))
+            if signing_key is None:
                 raise HTTPException(
                     status_code=status.HTTP_401_UNAUTHORIZED,
                     detail="Unknown signing key.",
                     headers={"WWW-Authenticate": "Bearer"},
                 )
-            public_pem = _rsa_public_pem_from_jwk(jwk_for_kid)
             payload = jwt.decode(
                 token,
-                public_pem,
+                signing_key,
                 algorithms=["RS256"],
                 audience=audience,
                 issuer=issuer,
@@ -104,12 +149,14 @@ def decode_supabase_jwt(token: str) -> dict:
         # Default to HS256 (legacy/shared secret)
         payload = jwt.decode(
             token,
-            settings.get_supabase_jwt_secret(),
+            _hs256_key(),
             algorithms=["HS256"],
             audience=audience,
             issuer=issuer,
         )
         return payload
+    except HTTPException:
+        raise
     except JWTError as e:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -142,7 +189,7 @@ def get_current_user(request: Request) -> User:
 
 
 def check_request_user_id(request: Request, user_id: str | None):
-    if settings.get_disable_auth():
+    if get_settings().get_disable_auth():
         return
     user = get_current_user(request)
 
@@ -1,12 +1,27 @@
-from typing import Optional
+import os
+import re
+from typing import Iterable, Optional
 
-from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
-from starlette.requests import Request
-from starlette.responses import Response
+from starlette.types import ASGIApp, Receive, Scope, Send
 
 from app.core.auth import decode_supabase_jwt, User
 
 
+# Routes that never look at the caller: no token handling at all. Entries ending in '/' are
+# prefixes. /screenings/{id}/hls/ is authorized by its signed query, /webrtc/metrics by its
+# own token.
+DEFAULT_PUBLIC_PATHS: tuple[str, ...] = (
+    "/health",
+    "/docs",
+    "/redoc",
+    "/openapi.json",
+    "/surveys/definitions",
+    "/surveys/definition/",
+    "/webrtc/metrics",
+)
+_PUBLIC_PATTERNS = (re.compile(r"^/screenings/[^/]+/hls/"),)
+
+
 def _extract_bearer_token(authorization_header: Optional[str]) -> Optional[str]:
     if not authorization_header:
         return None
@@ -16,22 +31,88 @@ def _extract_bearer_token(authorization_header: Optional[str]) -> Optional[str]:
     return None
 
 
-class AuthMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
-        token = _extract_bearer_token(request.headers.get("authorization"))
-        request.state.user = None
-        request.state.jwt = None
-        if token:
-            try:
-                payload = decode_supabase_jwt(token)
-                user_id = str(payload.get("sub") or payload.get("user_id") or "")
-                email = str(payload.get("email") or "")
-                if user_id:
-                    request.state.user = User(id=user_id, email=email)
-                    request.state.jwt = token
-            except Exception:
-                # Leave user as None on any failure; protected routes will enforce auth
-                pass
-        return await call_next(request)
+def _authorization_header(scope: Scope) -> Optional[str]:
+    for name, value in scope.get("headers") or ():
+        if name == b"authorization":
+            return value.decode("latin-1")
+    return None
+
+
+class _LazyAuthState(dict):
+    """Request state whose 'user' and 'jwt' are decoded from the bearer token on first access.
+
+    Starlette's `request.state` reads attributes from this dict, so routes that never touch
+    the user (or never call get_current_user) never pay for JWT verification. Any failure
+    leaves the user as None; protected routes enforce auth.
+    """
+
+    _AUTH_KEYS = ("user", "jwt")
+
+    def __init__(self, base: dict, token: Optional[str]) -> None:
+        super().__init__(base)
+        self._token = token
+        if token is None:
+            super().__setitem__("user", None)
+            super().__setitem__("jwt", None)
+
+    def _resolve(self) -> None:
+        token, self._token = self._token, None
+        user: Optional[User] = None
+        try:
+            payload = decode_supabase_jwt(token)  # type: ignore[arg-type]
+            user_id = str(payload.get("sub") or payload.get("user_id") or "")
+            if user_id:
+                user = User(id=user_id, email=str(payload.get("email") or ""))
+        except Exception:
+            pass
+        super().__setitem__("user", user)
+        super().__setitem__("jwt", token if user else None)
+
+    def __getitem__(self, key):
+        if self._token is not None and key in self._AUTH_KEYS:
+            self._resolve()
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        if self._token is not None and key in self._AUTH_KEYS:
+            self._resolve()
+        return super().get(key, default)
+
+    def __contains__(self, key) -> bool:
+        return key in self._AUTH_KEYS or super().__contains__(key)
+
+
+def _configured_public_paths() -> tuple[str, ...]:
+    extra = [p.strip() for p in (os.getenv("AUTH_PUBLIC_PATHS") or "").split(",") if p.strip()]
+    return DEFAULT_PUBLIC_PATHS + tuple(extra)
+
+
+class AuthMiddleware:
+    """Pure ASGI middleware that attaches the caller's bearer token to `request.state`.
+
+    Decoding is deferred to the first read of `request.state.user`; get_current_user is a
+    sync dependency, so verification (and a JWKS refresh for an unknown key) runs in the
+    threadpool rather than on the event loop. Public paths skip token handling entirely.
+    """
+
+    def __init__(self, app: ASGIApp, public_paths: Optional[Iterable[str]] = None) -> None:
+        self.app = app
+        paths = tuple(public_paths) if public_paths is not None else _configured_public_paths()
+        self._public_exact = frozenset(p for p in paths if not p.endswith("/"))
+        self._public_prefixes = tuple(p for p in paths if p.endswith("/"))
 
+    def is_public(self, path: str) -> bool:
+        return (
+            path in self._public_exact
+            or path.startswith(self._public_prefixes)
+            or any(p.match(path) for p in _PUBLIC_PATTERNS)
+        )
 
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+        path = scope.get("path") or ""
+        token = None if self.is_public(path) else _extract_bearer_token(_authorization_header(scope))
+        scope["state"] = _LazyAuthState(scope.get("state") or {}, token)
+        await self.app(scope, receive, send)
@@ -1,11 +1,24 @@
 import os
+import threading
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Optional
 
 import requests
 from dotenv import find_dotenv, load_dotenv
 
 
-class Settings:
-    def __init__(self) -> None:
+_dotenv_lock = threading.Lock()
+_dotenv_loaded = False
+
+
+def _load_env_files() -> None:
+    """Load the deployment's .env into os.environ once per process."""
+    global _dotenv_loaded
+    with _dotenv_lock:
+        if _dotenv_loaded:
+            return
+        _dotenv_loaded = True
         # Deterministic env loading based on ENVIRONMENT
         # - development: load repo-root .env (../.env relative to infra)
         # - production:  load infra/.env (used by docker compose on servers)
@@ -25,6 +38,28 @@ class Settings:
             # Non-fatal if not present or path resolution fails
             pass
 
+
+class Settings:
+    """Configuration snapshot taken from the environment when constructed.
+
+    Use `get_settings()` rather than constructing this directly: the snapshot is resolved
+    once per process, and PR-branch credentials are fetched from the Supabase API once per
+    snapshot. Instances are read-only; call `reload_settings()` after changing the
+    environment (tests, scripts).
+    """
+
+    def __init__(self) -> None:
+        _load_env_files()
+        object.__setattr__(self, "_env", MappingProxyType(dict(os.environ)))
+        # PR previews: three Supabase management API calls, made once per snapshot
+        object.__setattr__(self, "_branch_data", self._get_branch_data() if self.is_pull_request() else {})
+
+    def __setattr__(self, name: str, value: object) -> None:
+        raise AttributeError("Settings is read-only; use reload_settings() to pick up changes")
+
+    def _getenv(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        return self._env.get(name, default)
+
     def _get_branch_data(self) -> dict[str, dict[str, str | int]]:
         values = {}
         branch_list = requests.request(
@@ -63,11 +98,11 @@ class Settings:
         return values
 
     def get_supabase_project_url(self) -> str:
-        value = os.getenv("SUPABASE_PROJECT_URL")
+        value = self._getenv("SUPABASE_PROJECT_URL")
         if value is None:
             value = ""
         if self.is_pull_request():
-            branch_data = self._get_branch_data()
+            branch_data = self._branch_data
             value = "https://" + str(branch_data["branch"]["db_host"])[3:]
         # Reasonable local default if nothing provided and not production
         if not value and not self.is_production():
@@ -77,76 +112,76 @@ class Settings:
         return value
 
     def get_supabase_api_key(self) -> str:
-        value = os.getenv("SUPABASE_API_KEY")
+        value = self._getenv("SUPABASE_API_KEY")
         if value is None:
             value = ""
         if self.is_pull_request():
-            branch_data = self._get_branch_data()
+            branch_data = self._branch_data
             value = str(branch_data["key"]["api_key"])
         # Fallbacks for local development with Supabase CLI
         if not value:
-            value = os.getenv("SUPABASE_SERVICE_ROLE_KEY", "") or os.getenv("SUPABASE_ANON_KEY", "")
+            value = self._getenv("SUPABASE_SERVICE_ROLE_KEY", "") or self._getenv("SUPABASE_ANON_KEY", "")
         return value
 
     # Dependency helpers
     def provide_supabase_base_and_key(self) -> tuple[str, str]:
         base_url = self.get_supabase_project_url().rstrip("/")
-        service_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or self.get_supabase_api_key()
+        service_key = self._getenv("SUPABASE_SERVICE_ROLE_KEY") or self.get_supabase_api_key()
         return base_url, service_key
 
     def get_supabase_rest_key(self) -> str:
-        value = os.getenv("SUPABASE_REST_KEY")
+        value = self._getenv("SUPABASE_REST_KEY")
         if value is None:
             value = ""
         return value
 
     def get_supabase_jwt_secret(self) -> str:
-        value = os.getenv("SUPABASE_JWT_SECRET")
+        value = self._getenv("SUPABASE_JWT_SECRET")
         if value is None:
             # Fallback to generic JWT secret name used by Supabase CLI
-            value = os.getenv("JWT_SECRET")
+            value = self._getenv("JWT_SECRET")
         if value is None:
             raise ValueError("SUPABASE_JWT_SECRET (or JWT_SECRET) is not set. This is required for authentication.")
         return value
 
     def get_supabase_project_id(self) -> str:
-        value = os.getenv("SUPABASE_PROJECT_ID")
+        value = self._getenv("SUPABASE_PROJECT_ID")
         if value is None:
             value = ""
         return value
 
     def get_crawler_api_key(self) -> str:
-        value = os.getenv("CRAWLER_API_KEY")
+        value = self._getenv("CRAWLER_API_KEY")
         if value is None:
             value = ""
         return value
 
     def get_openai_api_key(self) -> str:
-        value = os.getenv("OPENAI_API_KEY")
+        value = self._getenv("OPENAI_API_KEY")
         if value is None:
             value = ""
         return value
 
     def get_brevo_api_key(self) -> str:
-        value = os.getenv("BREVO_API_KEY")
+        value = self._getenv("BREVO_API_KEY")
         if value is None:
             value = ""
         return value
 
     def get_email_sender_name(self) -> str:
-        return os.getenv("EMAIL_SENDER_NAME", "ANQA")
+        return self._getenv("EMAIL_SENDER_NAME", "ANQA")
 
     def get_email_sender_email(self) -> str:
-        return os.getenv("EMAIL_SENDER_EMAIL", "noreply@anqa.cloud")
+        return self._getenv("EMAIL_SENDER_EMAIL", "noreply@anqa.cloud")
 
     def get_frontend_public_url(self) -> str:
         # Preferred explicit override
-        value = os.getenv("FRONTEND_PUBLIC_URL")
+        value = self._getenv("FRONTEND_PUBLIC_URL")
         if value:
             return value.rstrip("/")
 
         # Project convention: domain saved in .env as DOMAIN_FRONTEND (without scheme)
-        domain_env = os.getenv("DOMAIN_FRONTEND")
+        domain_env = self._getenv("DOMAIN_FRONTEND")
         if domain_env:
             domain = domain_env.strip().strip('/')
             # If the value already includes a scheme, respect it
@@ -163,7 +198,7 @@ class Settings:
         return "https://anqa.cloud"
 
     def is_pull_request(self) -> bool:
-        value = os.getenv("IS_PULL_REQUEST")
+        value = self._getenv("IS_PULL_REQUEST")
         if value is None:
             value = ""
         return value == "true"
@@ -173,9 +208,9 @@ class Settings:
 
         Avoids hard dependency on pygit2 in environments where libgit2 is unavailable.
         """
-        render = os.getenv("RENDER")
+        render = self._getenv("RENDER")
         if render is not None:
-            value = os.getenv("RENDER_GIT_BRANCH")
+            value = self._getenv("RENDER_GIT_BRANCH")
             return value or ""
         try:
             from pygit2 import Repository  # type: ignore
@@ -185,13 +220,13 @@ class Settings:
             return ""
 
     def get_twitter_api_key(self) -> str:
-        value = os.getenv("TWITTER_API_KEY")
+        value = self._getenv("TWITTER_API_KEY")
         if value is None:
             value = ""
         return value
 
     def get_disable_auth(self) -> bool:
-        value = os.getenv("DISABLE_AUTH")
+        value = self._getenv("DISABLE_AUTH")
         if value is None:
             return False
         return value.lower() == "true"
@@ -201,11 +236,26 @@ class Settings:
         Check if the application is running in a production environment.
         :return: True if in production, False otherwise.
         """
-        env_value = os.getenv("ENVIRONMENT", "production")
+        env_value = self._getenv("ENVIRONMENT", "production")
         return (env_value or "").lower() != "development"
 
     def get_cohere_api_key(self) -> str:
-        value = os.getenv("COHERE_API_KEY")
+        value = self._getenv("COHERE_API_KEY")
         if value is None:
             value = ""
         return value
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Process-wide settings; also usable as a FastAPI dependency (`Depends(get_settings)`)."""
+    return Settings()
+
+
+def reload_settings() -> Settings:
+    """Drop the cached settings (and re-read .env) so the next `get_settings()` sees the current environment."""
+    global _dotenv_loaded
+    with _dotenv_lock:
+        _dotenv_loaded = False
+    get_settings.cache_clear()
+    return get_settings()
@@ -1,10 +1,9 @@
 import os
 import logging
+import threading
 from typing import Optional
 
-import brevo_python
-
-from app.core.config import Settings
+from app.core.config import get_settings
 
 import smtplib
 from email.message import EmailMessage
@@ -39,11 +38,23 @@ class Email:
 
 class EmailService:
     logger = logging.getLogger(__name__)
-    settings = Settings()
-    configuration = brevo_python.Configuration()
-    configuration.api_key["api-key"] = settings.get_brevo_api_key()
-    client = brevo_python.TransactionalEmailsApi(brevo_python.ApiClient(configuration))
+    settings = get_settings()
     prevent_email_sending = not settings.is_production()
+    # brevo_python is slow to import; the client is built on the first Brevo send
+    _client = None
+    _client_lock = threading.Lock()
+
+    @staticmethod
+    def client():
+        if EmailService._client is None:
+            with EmailService._client_lock:
+                if EmailService._client is None:
+                    import brevo_python
+
+                    configuration = brevo_python.Configuration()
+                    configuration.api_key["api-key"] = EmailService.settings.get_brevo_api_key()
+                    EmailService._client = brevo_python.TransactionalEmailsApi(brevo_python.ApiClient(configuration))
+        return EmailService._client
 
     @staticmethod
     def _anonymize_email(email: str) -> str:
@@ -89,9 +100,11 @@ class EmailService:
                 "name": os.getenv("EMAIL_SENDER_NAME", email.sender_name),
                 "email": os.getenv("EMAIL_SENDER_EMAIL", email.sender_email),
             }
+            from brevo_python import SendSmtpEmail
+
             for recipient in email.recipients:
                 to_field = [{"email": recipient}]
-                email_data = brevo_python.SendSmtpEmail(
+                email_data = SendSmtpEmail(
                     sender=sender_info,
                     to=to_field,
                     subject=email.subject,
@@ -101,7 +114,7 @@ class EmailService:
                     headers=email.headers or None,
                 )
                 try:
-                    EmailService.client.send_transac_email(email_data)
+                    EmailService.client().send_transac_email(email_data)
                 except Exception as e:
                     EmailService.logger.exception(f"Brevo send failed: {e}")
                     raise
@@ -119,9 +132,11 @@ class EmailService:
                 "name": os.getenv("EMAIL_SENDER_NAME", email.sender_name),
                 "email": os.getenv("EMAIL_SENDER_EMAIL", email.sender_email),
             }
+            from brevo_python import SendSmtpEmail
+
             for recipient in email.recipients:
                 to_field = [{"email": recipient}]
-                email_data = brevo_python.SendSmtpEmail(
+                email_data = SendSmtpEmail(
                     sender=sender_info,
                     to=to_field,
                     subject=email.subject,
@@ -131,7 +146,7 @@ class EmailService:
                     headers=email.headers or None,
                 )
                 try:
-                    EmailService.client.send_transac_email(email_data)
+                    EmailService.client().send_transac_email(email_data)
                 except Exception as e:
                     EmailService.logger.exception(f"Brevo send failed: {e}")
                     raise
@@ -0,0 +1,281 @@
+"""Supabase JWKS store for RS256 token verification.
+
+Request handling never waits on a routine JWKS refresh: a background task refetches the
+keys before they expire, and expired keys keep being served until a refresh succeeds
+(stale-while-revalidate). Only a key id the store has never seen blocks, and then only the
+requests that carry it. Refreshes are single-flight across coroutines and threads, so a
+burst of tokens with a new kid triggers one fetch. Unknown-kid refreshes are throttled so
+forged kids cannot hammer the auth server.
+
+The last good key set is persisted to JWKS_CACHE_PATH (default: a private directory under
+the user's cache dir), so a restart (or an auth outage during one) starts with keys already
+loaded. Keys from disk are trusted before revalidation, so a cache file that is not owned by
+the process user, or is writable by others, is ignored.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Callable, Optional
+
+import requests
+from jose import jwk
+from jose.backends.base import Key
+
+
+_log = logging.getLogger(__name__)
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return max(0.0, float(os.getenv(name, str(default))))
+    except ValueError:
+        return default
+
+
+def _build_key_objects(keys: list[dict]) -> dict[str, Key]:
+    """kid -> verification key for the RSA keys of a JWKS; parsed once per refresh."""
+    objects: dict[str, Key] = {}
+    for k in keys:
+        kid = k.get("kid")
+        if not kid or k.get("kty") != "RSA":
+            continue
+        try:
+            objects[str(kid)] = jwk.construct(k, algorithm="RS256")
+        except Exception:
+            # A malformed key only affects tokens signed with it
+            continue
+    return objects
+
+
+class JwksStore:
+    def __init__(
+        self,
+        url: Callable[[], str],
+        *,
+        ttl_seconds: float = 3600.0,
+        unknown_kid_min_interval: float = 30.0,
+        cache_path: Optional[str] = None,
+        fetch_timeout: float = 5.0,
+    ) -> None:
+        self._url = url
+        self.ttl = ttl_seconds
+        self.unknown_kid_min_interval = unknown_kid_min_interval
+        self.cache_path = cache_path
+        self.fetch_timeout = fetch_timeout
+        self.keys: list[dict] = []
+        self._key_objects: dict[str, Key] = {}
+        # Wall-clock time of the last successful fetch (also restored from disk)
+        self.fetched_at = 0.0
+        self._generation = 0
+        self._fetch_lock = threading.Lock()
+        self._last_unknown_kid_refresh = float("-inf")
+        self._inflight: Optional[asyncio.Task] = None
+        # Background refresh started by schedule_key_fetch (kept so it is not garbage collected)
+        self._kid_task: Optional[asyncio.Task] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._load_from_disk()
+
+    # --- Lookups -------------------------------------------------------------
+
+    @property
+    def stale(self) -> bool:
+        return time.time() - self.fetched_at >= self.ttl
+
+    def get_key(self, kid: str) -> Optional[Key]:
+        """Key for `kid` from memory, never blocking; stale keys nudge the background refresher."""
+        if self.stale and self._loop is not None and self._wake is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._wake.set)
+            except RuntimeError:
+                pass
+        return self._key_objects.get(kid)
+
+    async def ensure_key(self, kid: str) -> Optional[Key]:
+        """Key for `kid`, refreshing (single-flight, throttled) when the kid is unknown."""
+        key = self.get_key(kid)
+        if key is not None:
+            return key
+        # Join a refresh already in flight (rotation burst) even inside the throttle window
+        refreshing = self._inflight is not None and not self._inflight.done()
+        if not refreshing and not self._may_refresh_for_unknown_kid():
+            return None
+        await self.refresh()
+        return self._key_objects.get(kid)
+
+    def schedule_key_fetch(self, kid: str) -> None:
+        """Refresh in the background for an unknown `kid`, for sync callers on the event loop.
+
+        Nothing is scheduled while a refresh is already running or the unknown-kid throttle
+        is closed, so a burst of requests with a new kid starts at most one task.
+        """
+        if self.get_key(kid) is not None:
+            return
+        if self._kid_task is not None and not self._kid_task.done():
+            return
+        if self._inflight is not None and not self._inflight.done():
+            return
+        if not self._may_refresh_for_unknown_kid():
+            return
+        self._kid_task = asyncio.ensure_future(self.refresh())
+
+    def ensure_key_blocking(self, kid: str) -> Optional[Key]:
+        """`ensure_key` for callers outside the event loop (scripts, worker threads)."""
+        key = self.get_key(kid)
+        if key is not None or not self._may_refresh_for_unknown_kid():
+            return key
+        try:
+            self._refresh_sync(self._generation)
+        except Exception as e:
+            _log.warning("[auth] JWKS refresh failed: %s", e)
+        return self._key_objects.get(kid)
+
+    def _may_refresh_for_unknown_kid(self) -> bool:
+        # Until a key set was fetched (or restored) once every request would fail anyway. An
+        # empty JWKS that was fetched (HS256-only projects) is throttled like any other.
+        if not self.fetched_at:
+            return True
+        now = time.monotonic()
+        if now - self._last_unknown_kid_refresh < self.unknown_kid_min_interval:
+            return False
+        self._last_unknown_kid_refresh = now
+        return True
+
+    # --- Refresh -------------------------------------------------------------
+
+    async def refresh(self) -> bool:
+        """Fetch the JWKS once for all concurrent callers; False if the fetch failed."""
+        if self._inflight is None or self._inflight.done():
+            seen = self._generation
+            self._inflight = asyncio.ensure_future(asyncio.to_thread(self._refresh_sync, seen))
+        try:
+            await asyncio.shield(self._inflight)
+            return True
+        except Exception as e:
+            _log.warning("[auth] JWKS refresh failed: %s", e)
+            return False
+
+    def _refresh_sync(self, seen_generation: int) -> None:
+        with self._fetch_lock:
+            if self._generation != seen_generation:
+                # Another thread refreshed while this one waited
+                return
+            response = requests.get(self._url(), timeout=self.fetch_timeout)
+            response.raise_for_status()
+            data = response.json()
+            keys = data.get("keys", []) if isinstance(data, dict) else []
+            self._install(keys, time.time())
+            self._generation += 1
+        self._save_to_disk()
+
+    def _install(self, keys: list[dict], fetched_at: float) -> None:
+        # Swap whole objects so lock-free readers see either the old or the new set
+        self._key_objects = _build_key_objects(keys)
+        self.keys = keys
+        self.fetched_at = fetched_at
+
+    # --- Background refresher ------------------------------------------------
+
+    def start(self) -> None:
+        """Start the background refresher on the running event loop."""
+        if self._task is not None and not self._task.done():
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        self._loop = None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+
+    async def _run(self) -> None:
+        assert self._wake is not None
+        failures = 0
+        # Keys restored from disk are served right away but always revalidated at startup
+        due = True
+        while True:
+            if due or self.stale or not self._key_objects:
+                failures = 0 if await self.refresh() else failures + 1
+            if failures:
+                # Back off (up to 5 minutes) while the auth server is failing; stale keys keep
+                # serving, and readers' wake-ups are ignored so they cannot cause a retry storm
+                await asyncio.sleep(min(300.0, 5.0 * 2 ** (failures - 1)))
+                self._wake.clear()
+                due = True
+                continue
+            # Refresh ahead of expiry so readers never see stale keys in normal operation
+            delay = max(1.0, self.fetched_at + self.ttl * 0.8 - time.time())
+            try:
+                await asyncio.wait_for(self._wake.wait(), delay)
+                due = False
+            except asyncio.TimeoutError:
+                due = True
+            self._wake.clear()
+
+    # --- Disk persistence ----------------------------------------------------
+
+    def _load_from_disk(self) -> None:
+        if not self.cache_path:
+            return
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                if not _trusted_file(f.fileno()):
+                    _log.warning("[auth] ignoring JWKS cache %s: not owned by this user or writable by others", self.cache_path)
+                    return
+                data = json.load(f)
+            keys = data.get("keys") or []
+            # A cache written for another project (or an older file format) is ignored
+            if keys and data.get("url") == self._url():
+                # Served until the first background refresh replaces them
+                self._install(keys, float(data.get("fetched_at") or 0.0))
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            _log.warning("[auth] ignoring unreadable JWKS cache %s: %s", self.cache_path, e)
+
+    def _save_to_disk(self) -> None:
+        if not self.cache_path:
+            return
+        try:
+            directory = os.path.dirname(self.cache_path) or "."
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=directory, prefix=".jwks-")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"url": self._url(), "keys": self.keys, "fetched_at": self.fetched_at}, f)
+            os.replace(tmp, self.cache_path)
+        except Exception as e:
+            _log.warning("[auth] could not persist JWKS cache to %s: %s", self.cache_path, e)
+
+
+def _trusted_file(fd: int) -> bool:
+    """Whether an open file belongs to the process user and only that user can write it."""
+    st = os.fstat(fd)
+    if hasattr(os, "geteuid") and st.st_uid != os.geteuid():
+        return False
+    return not st.st_mode & 0o022
+
+
+def default_cache_path() -> str:
+    # Not the shared temp dir: any local user could plant keys there
+    cache_home = os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.getenv("JWKS_CACHE_PATH") or os.path.join(cache_home, "anqa", "jwks.json")
+
+
+def jwks_ttl_seconds() -> float:
+    return _env_float("JWKS_TTL_SECONDS", 3600.0) or 3600.0
+
+
+def unknown_kid_min_interval() -> float:
+    return _env_float("JWKS_UNKNOWN_KID_MIN_INTERVAL_SECONDS", 30.0)
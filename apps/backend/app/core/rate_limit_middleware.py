@@ -0,0 +1,233 @@
+"""Declarative per-route rate limiting as a pure ASGI middleware.
+
+Policies are matched on (method, path) with a dict lookup, so unlimited routes pay nothing.
+Limited requests are counted before routing, body validation or the handler run; a rejected
+request costs a header scan and a counter check. Only policies with an email rule read the
+(small, JSON) request body, which is then replayed to the app unchanged. Such a body must fit
+in _MAX_BODY_BYTES: anything larger is refused with 413, since an unread email cannot be
+counted and padding the body must not skip the per-email limit.
+
+Rule keys:
+- ip:    the client address, taken from X-Forwarded-For behind TRUSTED_PROXY_HOPS proxies
+- email: the lower-cased "email" field of the JSON body
+- user:  the authenticated user id (request.state.user from AuthMiddleware, verified in a
+         worker thread so an unknown signing key is fetched rather than failing the token)
+
+Must sit inside AuthMiddleware (for user keys) and CORSMiddleware (so 429s carry CORS headers).
+"""
+
+import asyncio
+import json
+import os
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.services.rate_limiter import SlidingWindowRateLimiter, get_rate_limiter
+
+
+# Largest body accepted on routes with an email rule (their JSON payloads are tiny)
+_MAX_BODY_BYTES = 64 * 1024
+
+KEY_IP = "ip"
+KEY_EMAIL = "email"
+KEY_USER = "user"
+
+
+@dataclass(frozen=True)
+class RateLimitRule:
+    key: str
+    max_events: int
+    window_seconds: int
+    detail: str = "Too many requests. Please try again later."
+
+
+@dataclass(frozen=True)
+class RoutePolicy:
+    method: str
+    path: str
+    # Limiter key prefix, e.g. "register" -> "register:ip:<addr>"
+    name: str
+    rules: tuple[RateLimitRule, ...]
+
+    @property
+    def needs_body(self) -> bool:
+        return any(r.key == KEY_EMAIL for r in self.rules)
+
+
+_DAY = 24 * 3600
+
+DEFAULT_POLICIES: tuple[RoutePolicy, ...] = (
+    RoutePolicy("POST", "/auth/register", "register", (
+        RateLimitRule(KEY_IP, 5, _DAY, "Too many signup attempts from this IP. Please try again later."),
+        RateLimitRule(KEY_EMAIL, 3, _DAY, "Too many signup attempts for this email. Please try again later."),
+    )),
+    RoutePolicy("POST", "/auth/send-magic-link", "magic", (
+        RateLimitRule(KEY_IP, 10, 3600, "Too many requests from this IP. Please try again later."),
+        RateLimitRule(KEY_EMAIL, 5, 3600, "Too many requests for this email. Please try again later."),
+    )),
+    RoutePolicy("POST", "/auth/password-reset", "reset", (
+        RateLimitRule(KEY_IP, 5, 3600, "Too many requests from this IP. Please try again later."),
+        RateLimitRule(KEY_EMAIL, 3, 3600, "Too many requests for this email. Please try again later."),
+    )),
+    RoutePolicy("POST", "/account/password-reset", "account-reset", (
+        RateLimitRule(KEY_USER, 3, 3600),
+    )),
+    # Each offer starts a peer connection and a recorder
+    RoutePolicy("POST", "/webrtc/offer", "offer", (
+        RateLimitRule(KEY_IP, 60, 60),
+        RateLimitRule(KEY_USER, 20, 60),
+    )),
+    RoutePolicy("POST", "/webrtc/client/start", "client-start", (
+        RateLimitRule(KEY_IP, 60, 60),
+        RateLimitRule(KEY_USER, 20, 60),
+    )),
+)
+
+
+def _trusted_proxy_hops() -> int:
+    try:
+        return max(0, int(os.getenv("TRUSTED_PROXY_HOPS", "1")))
+    except ValueError:
+        return 1
+
+
+def _header(scope: Scope, name: bytes) -> Optional[str]:
+    for key, value in scope.get("headers") or ():
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def client_ip_from_scope(scope: Scope, trusted_hops: Optional[int] = None) -> str:
+    """Client address as seen by the first untrusted hop.
+
+    Every trusted proxy appends the address it received the request from to X-Forwarded-For,
+    so with N trusted hops the client is the N-th entry from the right (the direct peer
+    counted as the last one). Entries further left are client-controlled and ignored.
+    """
+    hops = _trusted_proxy_hops() if trusted_hops is None else trusted_hops
+    client = scope.get("client")
+    peer = client[0] if client else ""
+    if not hops:
+        return peer
+    xff = _header(scope, b"x-forwarded-for")
+    chain = [p.strip() for p in xff.split(",") if p.strip()] if xff else []
+    chain.append(peer)
+    return chain[max(0, len(chain) - 1 - hops)]
+
+
+def _email_from_body(body: bytes) -> Optional[str]:
+    try:
+        data = json.loads(body)
+    except (ValueError, UnicodeDecodeError):
+        return None
+    email = data.get("email") if isinstance(data, dict) else None
+    return email.strip().lower() if isinstance(email, str) and email.strip() else None
+
+
+async def _user_id(scope: Scope) -> Optional[str]:
+    state = scope.get("state")
+    if not isinstance(state, dict):
+        return None
+    # The first read decodes the JWT; on the event loop a key rotation would make it fail
+    # without a JWKS refresh, and the failed decode would then stick for the handler too
+    user = await asyncio.to_thread(state.get, "user")
+    return getattr(user, "id", None) or None
+
+
+async def _read_body(receive: Receive) -> tuple[bytes, list[Message], bool]:
+    """Body, the messages consumed, and whether it was read completely within _MAX_BODY_BYTES."""
+    messages: list[Message] = []
+    body = b""
+    while True:
+        message = await receive()
+        messages.append(message)
+        if message["type"] != "http.request":
+            return body, messages, False
+        body += message.get("body", b"")
+        if len(body) > _MAX_BODY_BYTES:
+            return body, messages, False
+        if not message.get("more_body", False):
+            return body, messages, True
+
+
+def _replay(messages: list[Message], receive: Receive) -> Receive:
+    pending = list(messages)
+
+    async def replayed() -> Message:
+        if pending:
+            return pending.pop(0)
+        return await receive()
+
+    return replayed
+
+
+async def _respond(send: Send, status: int, detail: str, headers: Iterable[tuple[bytes, bytes]] = ()) -> None:
+    body = json.dumps({"detail": detail}).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            *headers,
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _reject(send: Send, detail: str, window_seconds: int) -> None:
+    # Retry-After is an upper bound; the sliding window usually frees up earlier
+    await _respond(send, 429, detail, [(b"retry-after", str(window_seconds).encode())])
+
+
+class RateLimitMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        policies: Optional[Iterable[RoutePolicy]] = None,
+        limiter: Optional[SlidingWindowRateLimiter] = None,
+    ) -> None:
+        self.app = app
+        self.limiter = limiter or get_rate_limiter()
+        self._policies = {(p.method, p.path): p for p in (DEFAULT_POLICIES if policies is None else policies)}
+
+    async def _allow(self, key: str, rule: RateLimitRule) -> bool:
+        if self.limiter.backend.blocking:
+            return await asyncio.to_thread(self.limiter.allow, key, rule.max_events, rule.window_seconds)
+        return self.limiter.allow(key, rule.max_events, rule.window_seconds)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        policy = self._policies.get((scope["method"], scope["path"]))
+        if policy is None:
+            await self.app(scope, receive, send)
+            return
+
+        email: Optional[str] = None
+        if policy.needs_body:
+            body, messages, complete = await _read_body(receive)
+            if not complete:
+                if messages[-1]["type"] == "http.request":
+                    await _respond(send, 413, "Request body too large")
+                # Otherwise the client disconnected; there is nobody to answer
+                return
+            receive = _replay(messages, receive)
+            email = _email_from_body(body)
+
+        for rule in policy.rules:
+            if rule.key == KEY_IP:
+                value: Optional[str] = client_ip_from_scope(scope) or "unknown"
+            elif rule.key == KEY_EMAIL:
+                value = email
+            else:
+                value = await _user_id(scope)
+            # Missing keys (no email, anonymous caller) are left to validation and auth
+            if value and not await self._allow(f"{policy.name}:{rule.key}:{value}", rule):
+                await _reject(send, rule.detail, rule.window_seconds)
+                return
+        await self.app(scope, receive, send)
@@ -0,0 +1,49 @@
+"""Startup warm-up: independent readiness tasks run concurrently under one deadline.
+
+Each warm-up is best-effort. A failure is logged and does not block startup. When the
+deadline passes, startup continues and the remaining warm-ups keep running in the background.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Optional
+
+
+_log = logging.getLogger(__name__)
+
+
+def warmup_timeout_seconds() -> float:
+    try:
+        return max(0.0, float(os.getenv("STARTUP_WARMUP_TIMEOUT_SECONDS", "10")))
+    except ValueError:
+        return 10.0
+
+
+async def _timed(name: str, warmup: Callable[[], Awaitable[object]]) -> Optional[float]:
+    started = time.perf_counter()
+    try:
+        await warmup()
+    except Exception as e:
+        _log.warning("[startup] warm-up %s failed after %.0f ms: %s", name, (time.perf_counter() - started) * 1000, e)
+        return None
+    elapsed = time.perf_counter() - started
+    _log.info("[startup] warm-up %s done in %.0f ms", name, elapsed * 1000)
+    return elapsed
+
+
+async def run_warmups(warmups: dict[str, Callable[[], Awaitable[object]]], timeout: Optional[float] = None) -> dict[str, Optional[float]]:
+    """Run warm-ups concurrently; returns seconds per warm-up (None: failed or still running)."""
+    timeout = warmup_timeout_seconds() if timeout is None else timeout
+    names = list(warmups)
+    started = time.perf_counter()
+    gathered = asyncio.gather(*(_timed(name, warmups[name]) for name in names))
+    try:
+        # Shielded: warm-ups that miss the deadline finish in the background
+        results = await asyncio.wait_for(asyncio.shield(gathered), timeout or None)
+    except asyncio.TimeoutError:
+        _log.warning("[startup] warm-ups still running after %.1f s; continuing startup", timeout)
+        return {name: None for name in names}
+    _log.info("[startup] warm-ups finished in %.0f ms", (time.perf_counter() - started) * 1000)
+    return dict(zip(names, results))
@@ -1,8 +1,8 @@
 import os
-from app.core.config import Settings
+from app.core.config import get_settings
 from supabase.client import Client, create_client
 
-settings = Settings()
+settings = get_settings()
 
 project_url = settings.get_supabase_project_url()
 # Prefer service role for server-side operations (uploads, admin)
@@ -1,9 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
 from datetime import datetime, timezone
 import requests
+from app.core.async_db import get_async_db
 from app.core.auth import get_current_user, User
-from app.core.config import Settings
+from app.core.config import Settings, get_settings
 from app.core.supabase_client import supabase
+from app.services.profile_cache import DEFAULT_ROLE, get_profile_async, invalidate_profile, is_privileged, remember_profile
+from postgrest.exceptions import APIError
 from pydantic import BaseModel
 
 
@@ -11,27 +14,23 @@ router = APIRouter(prefix="/account", tags=["account"])
 
 
 @router.get("/me")
-def get_me(user: User = Depends(get_current_user)) -> dict:
-    from app.core.supabase_client import supabase
+async def get_me(user: User = Depends(get_current_user)) -> dict:
     # Ensure a profile exists; if not, initialize with defaults
-    try:
-        resp = supabase.from_("profiles").select("id, role, prototype_enabled, deleted").eq("id", user.id).single().execute()
-        data = resp.data if hasattr(resp, "data") else resp.get("data")
-    except Exception:
-        data = None
-    role = "patient"
+    data = await get_profile_async(user.id)
+    role = DEFAULT_ROLE
     prototype_enabled = False
-    if data and isinstance(data, dict):
+    if data:
         role = data.get("role") or role
         prototype_enabled = bool(data.get("prototype_enabled") or False)
     else:
         # Create minimal profile row with defaults
         try:
-            supabase.from_("profiles").upsert({
+            await get_async_db().table("profiles").upsert({
                 "id": user.id,
                 "role": role,
                 "prototype_enabled": prototype_enabled,
             }, on_conflict="id").execute()
+            remember_profile(user.id, {"role": role, "prototype_enabled": prototype_enabled, "deleted": False})
         except Exception:
             pass
     return {
@@ -42,6 +41,15 @@ def get_me(user: User = Depends(get_current_user)) -> dict:
     }
 
 
+def _require_admin_or_moderator(user: User, *, fresh: bool = False) -> None:
+    # Served from the profile cache; writes re-check the role in the database, and `fresh`
+    # reads it from there for sensitive reads (a demoted caller must not keep access for a TTL)
+    if fresh:
+        invalidate_profile(user.id)
+    if not is_privileged(user.id):
+        raise HTTPException(status_code=403, detail="Admin or moderator role required")
+
+
 class PrototypeToggleRequest(BaseModel):
     user_id: str
     enabled: bool | None = None
@@ -50,66 +58,29 @@ class PrototypeToggleRequest(BaseModel):
 @router.post("/admin/prototype-enabled")
 def set_or_toggle_prototype_enabled(payload: PrototypeToggleRequest, user: User = Depends(get_current_user)) -> dict:
     # Only admins or moderators may call this
-    caller_role = "patient"
-    try:
-        resp = supabase.table("profiles").select("role").eq("id", user.id).single().execute()
-        data = getattr(resp, "data", None) if hasattr(resp, "data") else resp.get("data") if isinstance(resp, dict) else None
-        if data and isinstance(data, dict):
-            caller_role = (data.get("role") or "patient").lower()
-    except Exception:
-        caller_role = "patient"
-    if caller_role not in ("admin", "moderator"):
-        raise HTTPException(status_code=403, detail="Admin or moderator role required")
+    _require_admin_or_moderator(user)
 
     target_id = (payload.user_id or "").strip()
     if not target_id:
         raise HTTPException(status_code=400, detail="user_id is required")
 
-    # Determine new value
-    new_enabled: bool = False
-    if payload.enabled is None:
-        # Toggle based on current value
-        current_enabled = False
-        try:
-            r2 = supabase.table("profiles").select("prototype_enabled").eq("id", target_id).single().execute()
-            d2 = getattr(r2, "data", None) if hasattr(r2, "data") else r2.get("data") if isinstance(r2, dict) else None
-            current_enabled = bool((d2 or {}).get("prototype_enabled") or False)
-        except Exception:
-            current_enabled = False
-        new_enabled = not current_enabled
-    else:
-        new_enabled = bool(payload.enabled)
-
-    # Apply change (create row if missing)
-    try:
-        # Try update first
-        supabase.from_("profiles").update({"prototype_enabled": new_enabled}).eq("id", target_id).execute()
-    except Exception:
-        pass
-    # Ensure row exists with defaults if update didn't affect any row
+    # One round trip: role check, create-if-missing and set/toggle happen in the function
     try:
-        r3 = supabase.table("profiles").select("id").eq("id", target_id).single().execute()
-        d3 = getattr(r3, "data", None) if hasattr(r3, "data") else r3.get("data") if isinstance(r3, dict) else None
-        exists = bool(d3 and d3.get("id"))
-    except Exception:
-        exists = False
-    if not exists:
-        try:
-            supabase.from_("profiles").insert({
-                "id": target_id,
-                "role": "patient",
-                "prototype_enabled": new_enabled,
-            }).execute()
-        except Exception:
-            # Last resort: upsert to handle race conditions
-            try:
-                supabase.from_("profiles").upsert({
-                    "id": target_id,
-                    "role": "patient",
-                    "prototype_enabled": new_enabled,
-                }, on_conflict="id").execute()
-            except Exception as e:
-                raise HTTPException(status_code=500, detail=f"Failed to set prototype_enabled: {e}")
+        resp = supabase.rpc("set_prototype_enabled", {
+            "p_caller": user.id,
+            "p_target": target_id,
+            "p_enabled": payload.enabled,
+        }).execute()
+    except APIError as e:
+        if e.code == "42501":
+            # The cached role was stale (caller demoted)
+            invalidate_profile(user.id)
+            raise HTTPException(status_code=403, detail="Admin or moderator role required")
+        raise HTTPException(status_code=500, detail=f"Failed to set prototype_enabled: {e.message}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to set prototype_enabled: {e}")
+    new_enabled = bool(getattr(resp, "data", None))
+    invalidate_profile(target_id)
 
     return {"user_id": target_id, "prototype_enabled": new_enabled}
 
@@ -122,18 +93,9 @@ class AdminUser(BaseModel):
 
 
 @router.get("/admin/users")
-def list_users(user: User = Depends(get_current_user), settings: Settings = Depends(Settings)) -> dict:
-    # Authorization
-    caller_role = "patient"
-    try:
-        resp = supabase.table("profiles").select("role").eq("id", user.id).single().execute()
-        data = getattr(resp, "data", None) if hasattr(resp, "data") else resp.get("data") if isinstance(resp, dict) else None
-        if data and isinstance(data, dict):
-            caller_role = (data.get("role") or "patient").lower()
-    except Exception:
-        caller_role = "patient"
-    if caller_role not in ("admin", "moderator"):
-        raise HTTPException(status_code=403, detail="Admin or moderator role required")
+def list_users(user: User = Depends(get_current_user), settings: Settings = Depends(get_settings)) -> dict:
+    # Authorization; every user's email is returned, so the role is not taken from the cache
+    _require_admin_or_moderator(user, fresh=True)
 
     # Fetch all users from GoTrue
     base_url, service_key = settings.provide_supabase_base_and_key()
@@ -192,7 +154,7 @@ def list_users(user: User = Depends(get_current_user), settings: Settings = Depe
     return {"users": [r.dict() for r in result]}
 
 @router.post("/delete")
-def delete_account(request: Request, user: User = Depends(get_current_user), settings: Settings = Depends(Settings)) -> dict:
+def delete_account(request: Request, user: User = Depends(get_current_user), settings: Settings = Depends(get_settings)) -> dict:
     user_id = user.id
     # Mark profile as deleted and record timestamp (best effort)
     now = datetime.now(timezone.utc).isoformat()
@@ -207,6 +169,7 @@ def delete_account(request: Request, user: User = Depends(get_current_user), set
     except Exception:
         # If the table doesn't exist or the update fails, we will still proceed with auth.users tombstoning below
         pass
+    invalidate_profile(user_id)
 
     # Also tombstone the auth.users email and optionally ban the account to prevent accidental reuse.
     try:
@@ -253,7 +216,7 @@ def delete_account(request: Request, user: User = Depends(get_current_user), set
 
 
 @router.post("/password-reset")
-def send_password_reset(request: Request, user: User = Depends(get_current_user), settings: Settings = Depends(Settings)) -> dict:
+def send_password_reset(request: Request, user: User = Depends(get_current_user), settings: Settings = Depends(get_settings)) -> dict:
     """Send a password reset email via Brevo with a Supabase recovery verify link.
 
     We use the admin generate_link API with type=recovery and emailConfirm to produce
@@ -0,0 +1,318 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from pydantic import BaseModel, Field
+
+from app.core.auth import get_current_user, User
+from app.core.rate_limit_middleware import client_ip_from_scope
+from app.core.supabase_client import supabase
+from app.services.client_finalize import assemble_client_recording, join_chunks
+from app.services.client_ingest import (
+    INGEST_MODE_CLIENT,
+    chunk_extension,
+    chunks_prefix,
+    create_chunk_upload_targets,
+    delete_stored_chunks,
+    max_chunk_bytes,
+    max_chunks,
+    validate_manifest,
+    verify_stored_chunks,
+)
+from app.services.finalize_progress import open_progress, publish_progress
+
+
+# Browser-recorded sessions: an ingestion path next to /webrtc/offer without server-side decoding
+router = APIRouter(prefix="/webrtc/client", tags=["webrtc"])
+
+_log = logging.getLogger(__name__)
+
+_MAX_TARGETS_PER_REQUEST = 50
+
+
+class ClientStartBody(BaseModel):
+    mime_type: str
+    session_id: Optional[str] = None
+
+
+class ChunkEntry(BaseModel):
+    index: int = Field(ge=0)
+    bytes: int = Field(gt=0)
+    sha256: Optional[str] = None
+    duration_ms: Optional[int] = Field(default=None, ge=0)
+
+
+class ChunkTargetsBody(BaseModel):
+    indices: list[int] = Field(min_length=1, max_length=_MAX_TARGETS_PER_REQUEST)
+
+
+class ChunkManifestBody(BaseModel):
+    chunks: list[ChunkEntry]
+
+
+class ClientCloseBody(BaseModel):
+    # Optional final manifest; the last stored manifest is used when omitted
+    chunks: Optional[list[ChunkEntry]] = None
+
+
+def _load_session_row(session_id: str) -> Optional[dict]:
+    rows = (
+        supabase.table("screenings")
+        .select("id, user_id, status, ended_at, ingest_mode, ingest_manifest")
+        .eq("id", session_id)
+        .limit(1)
+        .execute()
+        .data
+        or []
+    )
+    return rows[0] if rows else None
+
+
+def _open_client_session(session_id: str, user: User) -> dict:
+    """Row of an in-progress client-ingested session owned by `user`, or an HTTP error."""
+    row = _load_session_row(session_id)
+    if not row:
+        raise HTTPException(status_code=404, detail="Not found")
+    if str(row.get("user_id") or "") != user.id:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    if not _is_open_client_upload(row):
+        raise HTTPException(status_code=409, detail="Session is not an open client upload")
+    return row
+
+
+def _is_open_client_upload(row: dict) -> bool:
+    # ended_at is set when /close claims the session (see _claim_session)
+    return row.get("ingest_mode") == INGEST_MODE_CLIENT and row.get("status") == "in_progress" and not row.get("ended_at")
+
+
+def _manifest_extension(row: dict) -> str:
+    extension = chunk_extension(str((row.get("ingest_manifest") or {}).get("mime_type") or ""))
+    if not extension:
+        raise HTTPException(status_code=409, detail="Session has no recording mime type")
+    return extension
+
+
+@router.post("/start")
+def start_client_session(
+    body: ClientStartBody,
+    request: Request,
+    user: User = Depends(get_current_user),
+) -> dict:
+    if not user or not user.id:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    if not chunk_extension(body.mime_type):
+        raise HTTPException(status_code=400, detail="Unsupported recording mime type")
+    session_id = body.session_id or str(uuid.uuid4())
+
+    existing = _load_session_row(session_id)
+    if existing:
+        # Resuming after a page reload keeps the manifest and start time
+        if str(existing.get("user_id") or "") != user.id:
+            raise HTTPException(status_code=403, detail="Forbidden")
+        if not _is_open_client_upload(existing):
+            raise HTTPException(status_code=409, detail="Session is not an open client upload")
+        if (existing.get("ingest_manifest") or {}).get("mime_type") != body.mime_type:
+            raise HTTPException(status_code=409, detail="Recording mime type changed")
+    else:
+        ua = request.headers.get("user-agent") or ""
+        ip = client_ip_from_scope(request.scope)
+        _log.info("[webrtc][%s] client ingest start user_id=%s ip=%s mime=%s", session_id, user.id, ip, body.mime_type)
+        supabase.table("screenings").insert({
+            "id": session_id,
+            "user_id": user.id,
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "client_ip": ip,
+            "user_agent": ua,
+            "status": "in_progress",
+            "ingest_mode": INGEST_MODE_CLIENT,
+            "ingest_manifest": {"mime_type": body.mime_type, "chunks": []},
+        }).execute()
+
+    return {
+        "session_id": session_id,
+        "chunks_prefix": chunks_prefix(session_id),
+        "max_chunks": max_chunks(),
+        "max_chunk_bytes": max_chunk_bytes(),
+        "max_targets_per_request": _MAX_TARGETS_PER_REQUEST,
+    }
+
+
+@router.post("/targets")
+def create_chunk_targets(
+    session_id: str,
+    body: ChunkTargetsBody,
+    user: User = Depends(get_current_user),
+) -> dict:
+    """Signed upload URLs for chunk indices; request a target again to retry a failed upload."""
+    if not user or not user.id:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    row = _open_client_session(session_id, user)
+    extension = _manifest_extension(row)
+    limit = max_chunks()
+    if any(i < 0 or i >= limit for i in body.indices):
+        raise HTTPException(status_code=400, detail=f"Chunk index must be between 0 and {limit - 1}")
+    try:
+        targets = create_chunk_upload_targets(session_id, extension, sorted(set(body.indices)))
+    except Exception as e:
+        _log.error("[webrtc][%s] signing chunk upload targets failed: %s", session_id, e)
+        raise HTTPException(status_code=502, detail="Could not create upload targets")
+    return {"targets": targets}
+
+
+@router.put("/manifest")
+def put_chunk_manifest(
+    session_id: str,
+    body: ChunkManifestBody,
+    user: User = Depends(get_current_user),
+) -> dict:
+    """Store the client's cumulative chunk manifest so an interrupted session can still be closed."""
+    if not user or not user.id:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    row = _open_client_session(session_id, user)
+    if len(body.chunks) > max_chunks():
+        raise HTTPException(status_code=400, detail=f"Manifest exceeds {max_chunks()} chunks")
+    manifest = {**(row.get("ingest_manifest") or {}), "chunks": [c.model_dump(exclude_none=True) for c in body.chunks]}
+    supabase.table("screenings").update({"ingest_manifest": manifest}).eq("id", session_id).execute()
+    return {"chunks": len(body.chunks)}
+
+
+def _claim_session(session_id: str) -> bool:
+    """Atomically mark an open client session as closing; False if another /close got there first."""
+    rows = (
+        supabase.table("screenings")
+        .update({"ended_at": datetime.now(timezone.utc).isoformat()})
+        .eq("id", session_id)
+        .eq("status", "in_progress")
+        .is_("ended_at", "null")
+        .execute()
+        .data
+        or []
+    )
+    return bool(rows)
+
+
+def _reopen_session(session_id: str, manifest: dict) -> None:
+    # Release the claim so the client can re-upload and close again
+    _update_session(session_id, {"ended_at": None, "ingest_manifest": manifest})
+
+
+def _update_session(session_id: str, fields: dict) -> None:
+    supabase.table("screenings").update(fields).eq("id", session_id).execute()
+
+
+def _verify_upload(session_id: str, extension: str, chunks: list[dict], joined_path: str) -> dict[str, list[int]]:
+    """Sizes from the storage listing, then SHA-256 while joining the chunks into `joined_path`."""
+    result = verify_stored_chunks(session_id, extension, chunks)
+    result["sha256_mismatch"] = []
+    if not (result["missing"] or result["size_mismatch"]):
+        result["sha256_mismatch"] = join_chunks(session_id, extension, chunks, joined_path)
+    return result
+
+
+_background_tasks: set[asyncio.Task] = set()
+
+
+async def _assemble_recording(session_id: str, extension: str, joined_path: str, work_dir: str) -> None:
+    """Background job after /close: remux, upload, point the screening at it, drop the chunks."""
+    uploaded: dict[str, int] = {}
+    last_upload_event = 0.0
+
+    def _upload_progress(key: str, sent: int, total: int) -> None:
+        # Called from the upload thread for every streamed chunk; events are rate limited
+        nonlocal last_upload_event
+        uploaded[key] = sent
+        now = time.monotonic()
+        if sent >= total or now - last_upload_event >= 0.25:
+            last_upload_event = now
+            publish_progress(session_id, "uploading", key=key, sent=sent, total=total, uploaded_bytes=sum(uploaded.values()))
+
+    try:
+        publish_progress(session_id, "transcoding", step="remux", percent=0.0)
+        artifacts = await asyncio.to_thread(
+            assemble_client_recording, session_id, extension, joined_path, work_dir, progress=_upload_progress
+        )
+        await asyncio.to_thread(_update_session, session_id, artifacts)
+    except Exception as e:
+        # The chunks are kept, so the recording can still be assembled from them
+        _log.error("[webrtc][%s] assembling client recording failed: %s", session_id, e)
+        publish_progress(session_id, "failed", error=str(e) or type(e).__name__)
+        return
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    try:
+        await asyncio.to_thread(delete_stored_chunks, session_id)
+    except Exception as e:
+        _log.warning("[storage][%s] removing uploaded chunks failed: %s", session_id, e)
+    keys = {k: v for k, v in artifacts.items() if k.startswith("storage_")}
+    _log.info("[webrtc][%s] client recording assembled: %s", session_id, keys.get("storage_recording_key"))
+    publish_progress(session_id, "done", **keys)
+
+
+@router.post("/close")
+async def close_client_session(
+    session_id: str,
+    body: Optional[ClientCloseBody] = None,
+    user: User = Depends(get_current_user),
+) -> dict:
+    """Verify the stored chunks against the manifest and complete the screening.
+
+    Sizes are checked against the storage listing and SHA-256 digests while the chunks are
+    joined. The recording is then remuxed and uploaded in the background; follow it on
+    /webrtc/progress. On a verification failure the session stays open so the client can
+    re-upload and close again; a concurrent /close for the same session gets 409.
+    """
+    if not user or not user.id:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    row = await asyncio.to_thread(_open_client_session, session_id, user)
+    extension = _manifest_extension(row)
+    manifest = dict(row.get("ingest_manifest") or {})
+    if body is not None and body.chunks is not None:
+        manifest["chunks"] = [c.model_dump(exclude_none=True) for c in body.chunks]
+    chunks: list[dict] = list(manifest.get("chunks") or [])
+
+    problem = validate_manifest(chunks)
+    if problem:
+        raise HTTPException(status_code=400, detail=problem)
+    if not await asyncio.to_thread(_claim_session, session_id):
+        raise HTTPException(status_code=409, detail="Session is already being closed")
+
+    work_dir = tempfile.mkdtemp(prefix=f"anqa-client-{session_id}-")
+    joined_path = os.path.join(work_dir, f"joined{extension}")
+    try:
+        result = await asyncio.to_thread(_verify_upload, session_id, extension, chunks, joined_path)
+    except Exception as e:
+        _log.error("[webrtc][%s] verifying uploaded chunks failed: %s", session_id, e)
+        shutil.rmtree(work_dir, ignore_errors=True)
+        await asyncio.to_thread(_reopen_session, session_id, manifest)
+        raise HTTPException(status_code=502, detail="Could not verify uploaded chunks")
+    if result["missing"] or result["size_mismatch"] or result["sha256_mismatch"]:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        await asyncio.to_thread(_reopen_session, session_id, manifest)
+        raise HTTPException(status_code=409, detail={"message": "Upload incomplete", **result})
+
+    total_bytes = sum(int(c["bytes"]) for c in chunks)
+    manifest["bytes"] = total_bytes
+    manifest["verified_at"] = datetime.now(timezone.utc).isoformat()
+    _log.info("[webrtc][%s] client ingest complete: %s chunks, %s bytes", session_id, len(chunks), total_bytes)
+    try:
+        await asyncio.to_thread(_update_session, session_id, {"status": "completed", "ingest_manifest": manifest})
+    except Exception as e:
+        _log.error("[webrtc][%s] completing client session failed: %s", session_id, e)
+        shutil.rmtree(work_dir, ignore_errors=True)
+        await asyncio.to_thread(_reopen_session, session_id, manifest)
+        raise HTTPException(status_code=502, detail="Could not complete the session")
+
+    open_progress(session_id, user.id)
+    task = asyncio.create_task(_assemble_recording(session_id, extension, joined_path, work_dir))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return {"status": "closed", "chunks": len(chunks), "bytes": total_bytes}
@@ -1,27 +1,20 @@
 from fastapi import APIRouter, HTTPException, Body, Depends, Request
 import requests
-from app.core.config import Settings
+from app.core.config import Settings, get_settings
 from app.core.email import Email, EmailService
 from app.services.email.signup_mail import render_signup_email
 from app.services.supabase_admin import SupabaseAdmin
 from app.schemas.auth import MagicLinkRequest, SimpleOkResponse, PasswordResetRequest
-from app.services.rate_limiter import SlidingWindowRateLimiter
 
 
 router = APIRouter(prefix="/auth", tags=["auth"])
-_limiter = SlidingWindowRateLimiter()
 
 
 @router.post("/send-magic-link", response_model=SimpleOkResponse)
-def send_magic_link(payload: MagicLinkRequest, request: Request, settings: Settings = Depends(Settings)) -> SimpleOkResponse:
+def send_magic_link(payload: MagicLinkRequest, request: Request, settings: Settings = Depends(get_settings)) -> SimpleOkResponse:
     email = str(payload.email)
     redirect_to = payload.redirectTo or "http://127.0.0.1:3000/auth/callback"
-    # Rate limit: 10 per IP and 5 per email per hour
-    ip = request.client.host if request.client else "unknown"
-    if not _limiter.allow(f"magic:ip:{ip}", max_events=10, window_seconds=3600):
-        raise HTTPException(status_code=429, detail="Too many requests from this IP. Please try again later.")
-    if not _limiter.allow(f"magic:email:{email}", max_events=5, window_seconds=3600):
-        raise HTTPException(status_code=429, detail="Too many requests for this email. Please try again later.")
+    # Rate limited per IP and email by RateLimitMiddleware (app/core/rate_limit_middleware.py)
 
     base_url, service_key = settings.provide_supabase_base_and_key()
     if not base_url or not service_key:
@@ -78,16 +71,11 @@ def send_magic_link(payload: MagicLinkRequest, request: Request, settings: Setti
 
 
 @router.post("/password-reset", response_model=SimpleOkResponse)
-def send_password_reset(payload: PasswordResetRequest, request: Request, settings: Settings = Depends(Settings)) -> SimpleOkResponse:
+def send_password_reset(payload: PasswordResetRequest, request: Request, settings: Settings = Depends(get_settings)) -> SimpleOkResponse:
     email = str(payload.email)
     redirect_to = payload.redirectTo or f"{settings.get_frontend_public_url().rstrip('/')}/auth/set-password"
 
-    # Rate limit: 5 per IP and 3 per email per hour
-    ip = request.client.host if request.client else "unknown"
-    if not _limiter.allow(f"reset:ip:{ip}", max_events=5, window_seconds=3600):
-        raise HTTPException(status_code=429, detail="Too many requests from this IP. Please try again later.")
-    if not _limiter.allow(f"reset:email:{email}", max_events=3, window_seconds=3600):
-        raise HTTPException(status_code=429, detail="Too many requests for this email. Please try again later.")
+    # Rate limited per IP and email by RateLimitMiddleware (app/core/rate_limit_middleware.py)
 
     base_url, service_key = settings.provide_supabase_base_and_key()
     if not base_url or not service_key:
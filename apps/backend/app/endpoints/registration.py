@@ -1,28 +1,23 @@
 from fastapi import APIRouter, HTTPException, Depends, Request
 import requests
-from app.core.config import Settings
+from app.core.config import Settings, get_settings
 from app.core.email import Email, EmailService
+from app.core.rate_limit_middleware import client_ip_from_scope
 from app.services.email.signup_mail import render_signup_email
 from app.services.supabase_admin import SupabaseAdmin
-from app.services.rate_limiter import SlidingWindowRateLimiter
 from app.schemas.auth import RegisterRequest, SimpleOkResponse
 
 
 router = APIRouter(prefix="/auth", tags=["auth"])
-_limiter = SlidingWindowRateLimiter()
 
 
 @router.post("/register", response_model=SimpleOkResponse)
-def register_user(payload: RegisterRequest, request: Request, settings: Settings = Depends(Settings)) -> SimpleOkResponse:
+def register_user(payload: RegisterRequest, request: Request, settings: Settings = Depends(get_settings)) -> SimpleOkResponse:
     email = payload.email
     password = payload.password
     redirect_to = payload.redirectTo or "http://127.0.0.1:3000/auth/callback"
-    # Rate limit: 5 signups per IP per 24h; 3 per email per 24h
-    ip = request.client.host if request.client else "unknown"
-    if not _limiter.allow(f"register:ip:{ip}", max_events=5, window_seconds=24*3600):
-        raise HTTPException(status_code=429, detail="Too many signup attempts from this IP. Please try again later.")
-    if not _limiter.allow(f"register:email:{email}", max_events=3, window_seconds=24*3600):
-        raise HTTPException(status_code=429, detail="Too many signup attempts for this email. Please try again later.")
+    # Rate limited per IP and email by RateLimitMiddleware (app/core/rate_limit_middleware.py)
+    ip = client_ip_from_scope(request.scope) or "unknown"
 
     base_url, service_key = settings.provide_supabase_base_and_key()
     if not base_url or not service_key:
@@ -109,6 +104,7 @@ def register_user(payload: RegisterRequest, request: Request, settings: Settings
 
             # Ensure profile row exists with defaults
             from app.core.supabase_client import supabase
+            from app.services.profile_cache import invalidate_profile
             try:
                 supabase.from_("profiles").upsert(
                     {
@@ -118,6 +114,7 @@ def register_user(payload: RegisterRequest, request: Request, settings: Settings
                     },
                     on_conflict="id",
                 ).execute()
+                invalidate_profile(user_id_final)
             except Exception:
                 pass
     except Exception:
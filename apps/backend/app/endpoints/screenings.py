@@ -1,67 +1,170 @@
 from __future__ import annotations
 
+import asyncio
+import posixpath
+import time
+from collections import OrderedDict
 from datetime import timedelta
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 
+from app.core.async_db import get_async_db
 from app.core.auth import get_current_user, User
-from app.core.supabase_client import supabase
+from app.services.artifact_storage import (
+    content_type_for_key,
+    download_artifact,
+    session_key_base,
+    sign_artifact_url,
+    sign_artifact_urls,
+)
+from app.services.derived_artifacts import THUMBNAILS_KEY_SUFFIX, THUMBNAILS_VTT_KEY_SUFFIX, rewrite_thumbnail_vtt
+from app.services.hls_packaging import (
+    HLS_DIRNAME,
+    hls_version,
+    is_safe_playlist_name,
+    playlist_path,
+    playlist_query,
+    playlist_segment_uris,
+    rewrite_playlist,
+    sign_playlist_access,
+    verify_playlist_access,
+)
 
 
 router = APIRouter(prefix="/screenings", tags=["screenings"])
 
 
 @router.get("")
-def list_my_screenings(user: User = Depends(get_current_user)) -> dict:
-    data = (
-        supabase.table("screenings")
+async def list_my_screenings(user: User = Depends(get_current_user)) -> dict:
+    data = await (
+        get_async_db().table("screenings")
         .select("*")
         .eq("user_id", user.id)
         .order("started_at", desc=True)
         .limit(25)
         .execute()
-        .data
-        or []
-    )
+    ) or []
     return {"items": data}
 
 
 @router.get("/{screening_id}/artifacts")
-def get_screening_artifacts(screening_id: str, user: User = Depends(get_current_user)) -> dict:
+async def get_screening_artifacts(screening_id: str, user: User = Depends(get_current_user)) -> dict:
     # Fetch row to ensure ownership and get storage keys
-    res = (
-        supabase.table("screenings")
-        .select("storage_recording_key, storage_audio_key, user_id")
+    res = await (
+        get_async_db().table("screenings")
+        .select(
+            "storage_recording_key, storage_audio_key, storage_analysis_key, storage_hls_key, "
+            "storage_peaks_key, storage_thumbnails_key, storage_thumbnails_vtt_key, artifact_digests, user_id"
+        )
         .eq("id", screening_id)
         .limit(1)
         .execute()
-        .data
-        or []
-    )
+    ) or []
     if not res:
         raise HTTPException(status_code=404, detail="Not found")
     row = res[0]
     if str(row.get("user_id") or "") != user.id:
         raise HTTPException(status_code=403, detail="Forbidden")
 
-    bucket = "recordings"
     recording_key: Optional[str] = row.get("storage_recording_key")
     audio_key: Optional[str] = row.get("storage_audio_key")
-
-    def sign(key: Optional[str]) -> Optional[str]:
-        if not key:
-            return None
-        # one hour expiry
-        try:
-            signed = supabase.storage.from_(bucket).create_signed_url(key, int(timedelta(hours=1).total_seconds()))
-            return (signed or {}).get("signedURL") or (signed or {}).get("signed_url") or None
-        except Exception:
-            return None
-
+    url_fields = {
+        "recording_url": recording_key,
+        "audio_url": audio_key,
+        "analysis_url": row.get("storage_analysis_key"),
+        "peaks_url": row.get("storage_peaks_key"),
+        "thumbnails_url": row.get("storage_thumbnails_key"),
+    }
+    # One Storage API round trip for every artifact of the screening
+    signed = await asyncio.to_thread(sign_artifact_urls, [k for k in url_fields.values() if k])
     return {
-        "recording_url": sign(recording_key),
-        "audio_url": sign(audio_key),
+        **{field: signed.get(key) if key else None for field, key in url_fields.items()},
+        "recording_content_type": content_type_for_key(recording_key) if recording_key else None,
+        "audio_content_type": content_type_for_key(audio_key) if audio_key else None,
+        # Served by the API so the cues can reference the sprite by a signed URL
+        "thumbnails_vtt_url": thumbnails_vtt_path(screening_id) if row.get("storage_thumbnails_vtt_key") else None,
+        # Relative to the API base; the playlist and its variants are signed for one hour
+        "hls_playlist_url": (
+            playlist_path(screening_id, version=hls_version(row.get("artifact_digests") or {}))
+            if row.get("storage_hls_key")
+            else None
+        ),
     }
 
 
+# Signature scope of thumbnail VTT URLs, so they cannot be replayed as playlist URLs
+_THUMBNAILS_VTT_SCOPE = "thumbnails.vtt"
+
+
+def thumbnails_vtt_path(screening_id: str, ttl_seconds: int = 3600) -> str:
+    expires, sig = sign_playlist_access(screening_id, ttl_seconds, _THUMBNAILS_VTT_SCOPE)
+    return f"/screenings/{screening_id}/thumbnails.vtt?expires={expires}&sig={sig}"
+
+
+@router.get("/{screening_id}/thumbnails.vtt")
+def get_screening_thumbnails_vtt(screening_id: str, expires: int = 0, sig: str = "") -> Response:
+    # Authorized by the signed query (<track> elements cannot send bearer tokens)
+    if not verify_playlist_access(screening_id, expires, sig, _THUMBNAILS_VTT_SCOPE):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    base = session_key_base(screening_id)
+    try:
+        text = download_artifact(f"{base}/{THUMBNAILS_VTT_KEY_SUFFIX}").decode("utf-8")
+    except Exception:
+        raise HTTPException(status_code=404, detail="Not found")
+    remaining = max(60, expires - int(time.time()))
+    sprite_url = sign_artifact_url(f"{base}/{THUMBNAILS_KEY_SUFFIX}", expires_in=timedelta(seconds=remaining))
+    if not sprite_url:
+        raise HTTPException(status_code=502, detail="Could not sign the thumbnail sprite")
+    return Response(
+        content=rewrite_thumbnail_vtt(text, sprite_url),
+        media_type="text/vtt",
+        headers={"Cache-Control": "private, max-age=60"},
+    )
+
+
+_PLAYLIST_CACHE_MAX = 256
+# (key, hls version) -> playlist text
+_playlist_cache: OrderedDict[tuple[str, str], str] = OrderedDict()
+
+
+def _stored_playlist(key: str, version: str) -> str:
+    # A finalize run's playlists never change; a re-finalize changes the version in the URL
+    cache_key = (key, version)
+    text = _playlist_cache.get(cache_key)
+    if text is not None:
+        _playlist_cache.move_to_end(cache_key)
+        return text
+    text = download_artifact(key).decode("utf-8")
+    if version:
+        _playlist_cache[cache_key] = text
+        if len(_playlist_cache) > _PLAYLIST_CACHE_MAX:
+            _playlist_cache.popitem(last=False)
+    return text
+
+
+@router.get("/{screening_id}/hls/{name:path}")
+def get_screening_hls_playlist(screening_id: str, name: str, expires: int = 0, sig: str = "", v: str = "") -> Response:
+    # Authorized by the signed query (players cannot send bearer tokens for nested playlists)
+    if not is_safe_playlist_name(name) or not verify_playlist_access(screening_id, expires, sig, v):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    key = f"{session_key_base(screening_id)}/{HLS_DIRNAME}/{name}"
+    try:
+        text = _stored_playlist(key, v)
+    except Exception:
+        raise HTTPException(status_code=404, detail="Not found")
+
+    base_dir = posixpath.dirname(key)
+    segment_keys = {uri: posixpath.join(base_dir, uri) for uri in playlist_segment_uris(text)}
+    remaining = max(60, expires - int(time.time()))
+    signed = sign_artifact_urls(list(segment_keys.values()), expires_in=timedelta(seconds=remaining))
+    body = rewrite_playlist(
+        text,
+        query=playlist_query(expires, sig, v),
+        sign_segment=lambda uri: signed.get(segment_keys.get(uri, ""), uri),
+    )
+    return Response(
+        content=body,
+        media_type="application/vnd.apple.mpegurl",
+        headers={"Cache-Control": "private, max-age=60"},
+    )
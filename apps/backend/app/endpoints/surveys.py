@@ -1,8 +1,11 @@
 from fastapi import APIRouter, Request, Depends, HTTPException, Query
 from pydantic import BaseModel
 from typing import Any, Optional, Dict, List
+from postgrest.exceptions import APIError
 from app.core.auth import get_optional_user, User
-from app.core import supabase
+from app.core.async_db import get_async_db
+from app.core.rate_limit_middleware import client_ip_from_scope
+from app.services.survey_catalog import forget_survey, is_known_survey, remember_survey
 
 router = APIRouter(prefix="/surveys", tags=["surveys"])
 
@@ -16,14 +19,13 @@ class SaveSurveyPayload(BaseModel):
 
 
 @router.post("/clinician")
-def save_clinician_survey(
+async def save_clinician_survey(
     payload: SaveSurveyPayload,
     request: Request,
     user: Optional[User] = Depends(get_optional_user),
 ):
-    # Extract client IP; consider X-Forwarded-For if behind reverse proxy
-    xff = request.headers.get("x-forwarded-for")
-    ip = (xff.split(",")[0].strip() if xff else request.client.host) if request.client else None
+    # Client IP behind TRUSTED_PROXY_HOPS proxies; left-most X-Forwarded-For entries are client-controlled
+    ip = client_ip_from_scope(request.scope) or None
 
     try:
         data = {
@@ -37,27 +39,26 @@ def save_clinician_survey(
             data["survey_version"] = payload.survey_version
         if payload.question_catalog:
             data["question_catalog"] = payload.question_catalog
-        result = supabase.table("clinician_survey_responses").insert(data).execute()
-        inserted = (result.data or [None])[0]
+        rows = await get_async_db().table("clinician_survey_responses").insert(data).execute()
+        inserted = (rows or [None])[0]
         return {"status": "ok", "id": inserted.get("id") if inserted else None}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/clinician")
-def get_latest_clinician_survey(client_session_id: str):
+async def get_latest_clinician_survey(client_session_id: str):
     """Return the most recent saved answers for a client session (autosave or submit)."""
     try:
-        result = (
-            supabase
+        rows = await (
+            get_async_db()
             .table("clinician_survey_responses")
             .select("answers,is_autosave,created_at")
             .eq("client_session_id", client_session_id)
             .order("created_at", desc=True)
             .limit(1)
             .execute()
-        )
-        rows = result.data or []
+        ) or []
         if not rows:
             return {"answers": {}, "is_autosave": True, "created_at": None}
         row = rows[0]
@@ -82,21 +83,20 @@ class UpsertSurveyResponsePayload(BaseModel):
 
 
 @router.get("/definitions")
-def get_survey_definitions(
+async def get_survey_definitions(
     survey_type: Optional[str] = Query(None),
     version: Optional[str] = Query(None),
     status: str = Query("active"),
 ):
     try:
-        q = supabase.table("surveys").select("id,survey_type,survey_version,title,description,definition,status,updated_at")
+        q = get_async_db().table("surveys").select("id,survey_type,survey_version,title,description,definition,status,updated_at")
         if survey_type:
             q = q.eq("survey_type", survey_type)
         if version:
             q = q.eq("survey_version", version)
         if status:
             q = q.eq("status", status)
-        res = q.execute()
-        rows: List[Dict[str, Any]] = res.data or []
+        rows: List[Dict[str, Any]] = await q.execute() or []
         if version and survey_type and not rows:
             raise HTTPException(status_code=404, detail="Survey not found")
         return {"surveys": rows}
@@ -107,17 +107,16 @@ def get_survey_definitions(
 
 
 @router.get("/definition/{survey_id}")
-def get_survey_definition(survey_id: str):
+async def get_survey_definition(survey_id: str):
     try:
-        res = (
-            supabase
+        data = await (
+            get_async_db()
             .table("surveys")
             .select("id,survey_type,survey_version,title,description,definition,status,updated_at")
             .eq("id", survey_id)
             .single()
             .execute()
         )
-        data = res.data
         if not data:
             raise HTTPException(status_code=404, detail="Survey not found")
         return data
@@ -128,11 +127,11 @@ def get_survey_definition(survey_id: str):
 
 
 @router.get("/responses")
-def get_saved_answers(survey_id: str, client_session_id: str):
+async def get_saved_answers(survey_id: str, client_session_id: str):
     """Return the most recent saved answers for survey+session."""
     try:
-        result = (
-            supabase
+        rows = await (
+            get_async_db()
             .table("survey_responses")
             .select("answers,is_autosave,updated_at,submitted_at,finalized")
             .eq("survey_id", survey_id)
@@ -140,8 +139,7 @@ def get_saved_answers(survey_id: str, client_session_id: str):
             .order("updated_at", desc=True)
             .limit(1)
             .execute()
-        )
-        rows = result.data or []
+        ) or []
         if not rows:
             return {"answers": {}, "is_autosave": True, "updated_at": None, "submitted_at": None, "finalized": False, "submitted": False, "allow_restore": True}
         row = rows[0]
@@ -160,93 +158,50 @@ def get_saved_answers(survey_id: str, client_session_id: str):
 
 
 @router.post("/responses")
-def upsert_survey_response(
+async def upsert_survey_response(
     payload: UpsertSurveyResponsePayload,
     request: Request,
     user: Optional[User] = Depends(get_optional_user),
 ):
     try:
-        xff = request.headers.get("x-forwarded-for")
-        ip = (xff.split(",")[0].strip() if xff else request.client.host) if request.client else None
+        ip = client_ip_from_scope(request.scope) or None
         user_agent = request.headers.get("user-agent")
 
-        # Ensure the referenced survey exists to satisfy FK constraint.
         # Accept survey_id in format "{survey_type}:{survey_version}" (e.g., "patient:v1").
         survey_id = payload.survey_id
         if ":" not in survey_id:
             raise HTTPException(status_code=400, detail="Invalid survey_id format. Expected 'type:version', e.g., 'patient:v1'.")
         survey_type, survey_version = survey_id.split(":", 1)
 
-        try:
-            # Upsert minimal survey catalog entry. Using on_conflict=id aligns with PK.
-            _ = (
-                supabase
-                .table("surveys")
-                .upsert(
-                    {
-                        "id": survey_id,
-                        "survey_type": survey_type,
-                        "survey_version": survey_version,
-                        # Keep status active so the definition (if later added) is selectable
-                        "status": "active",
-                    },
-                    on_conflict="id",
-                )
-                .execute()
-            )
-        except Exception:
-            # Non-fatal: if it already exists or races, continue to response upsert
-            pass
-
-        data = {
-            # Prefer explicit columns if present (post-migration). survey_id will be generated.
-            "survey_type": survey_type,
-            "survey_version": survey_version,
-            "survey_id": survey_id,  # compatibility if generated column not present yet
-            "client_session_id": payload.client_session_id,
-            "answers": payload.answers,
-            "is_autosave": payload.is_autosave,
-            "ip_address": ip,
-            "user_agent": user_agent,
-            "auth_user_id": getattr(user, "id", None) if user else None,
+        # One round trip: catalog entry (FK), insert-or-update by (survey_id, client_session_id)
+        # and submit stamping happen atomically in the function
+        params = {
+            "p_survey_type": survey_type,
+            "p_survey_version": survey_version,
+            "p_client_session_id": payload.client_session_id,
+            "p_answers": payload.answers,
+            "p_is_autosave": payload.is_autosave,
+            "p_submit": bool(payload.submit),
+            "p_answers_text": payload.answers_text,
+            "p_ip_address": ip,
+            "p_user_agent": user_agent,
+            "p_auth_user_id": getattr(user, "id", None) if user else None,
+            # The catalog row is only written the first time this process sees the survey
+            "p_ensure_survey": not await is_known_survey(survey_id),
         }
-        if payload.answers_text is not None:
-            data["answers_text"] = payload.answers_text
-
-        # Manual upsert by (survey_id, client_session_id) to avoid PostgREST 409s.
-        update_res = (
-            supabase
-            .table("survey_responses")
-            .update(data)
-            .eq("survey_id", survey_id)
-            .eq("client_session_id", payload.client_session_id)
-            .execute()
-        )
-        rows = update_res.data or []
-        if not rows:
-            insert_res = supabase.table("survey_responses").insert(data).execute()
-            inserted = (insert_res.data or [None])[0]
-        else:
-            inserted = rows[0]
-
-        # If this call is a final submission (not autosave), mark record as submitted
-        if payload.submit or (not payload.is_autosave):
-            try:
-                submit_update = (
-                    supabase
-                    .table("survey_responses")
-                    .update({"submitted_at": "now()", "finalized": True})
-                    .eq("survey_id", survey_id)
-                    .eq("client_session_id", payload.client_session_id)
-                    .execute()
-                )
-                if submit_update.data:
-                    inserted = submit_update.data[0]
-            except Exception:
-                pass
-        return {"status": "ok", "id": inserted.get("id") if inserted else None}
+        try:
+            # Replaying a save converges to the same row
+            response_id = await get_async_db().rpc("upsert_survey_response", params).idempotent().execute()
+        except APIError as e:
+            if e.code != "23503" or params["p_ensure_survey"]:
+                raise
+            # The survey was removed since the catalog was loaded
+            forget_survey(survey_id)
+            params["p_ensure_survey"] = True
+            response_id = await get_async_db().rpc("upsert_survey_response", params).idempotent().execute()
+        remember_survey(survey_id)
+        return {"status": "ok", "id": response_id}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-
-
-
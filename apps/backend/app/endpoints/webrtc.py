@@ -6,25 +6,56 @@ import hashlib
 import hmac
 import json
 import os
+import shutil
 import tempfile
 import uuid
 from datetime import datetime, timezone
 import logging
 import time
-from typing import Optional
+from typing import TYPE_CHECKING, Any, Optional
 from urllib.parse import urlparse
 
 from fastapi import APIRouter, Depends, HTTPException, Request, Response
-from fastapi.responses import PlainTextResponse
-from pydantic import BaseModel
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
 
-from aiortc import RTCPeerConnection, RTCSessionDescription, MediaStreamTrack, RTCConfiguration, RTCIceServer
-from aiortc.contrib.media import MediaRecorder, MediaRelay
 import subprocess
 
 from app.core.auth import get_current_user, User
-from app.core.config import Settings
+from app.core.config import get_settings
+from app.core.rate_limit_middleware import client_ip_from_scope
 from app.core.supabase_client import supabase
+from app.services.analysis_artifacts import ARTIFACT_KEY_SUFFIX as ANALYSIS_ARTIFACT_KEY_SUFFIX
+from app.services.analysis_artifacts import artifact_path_for, write_analysis_artifact
+from app.services.artifact_storage import load_artifact_digests, upload_session_artifact
+from app.services.audio_artifacts import audio_artifact_codec, audio_artifact_suffix, extract_audio
+from app.services.derived_artifacts import (
+    PEAKS_KEY_SUFFIX,
+    THUMBNAILS_KEY_SUFFIX,
+    THUMBNAILS_VTT_KEY_SUFFIX,
+    write_thumbnail_sprite,
+    write_waveform_peaks,
+)
+from app.services.finalize_progress import (
+    format_sse,
+    last_progress,
+    open_progress,
+    progress_events,
+    progress_owner,
+    publish_progress,
+)
+from app.services.hls_packaging import HLS_DIRNAME, hls_enabled, package_hls, upload_hls
+from app.services.hls_packaging import keyframe_args as hls_keyframe_args
+from app.services.rtc_stats import RtcStatsSampler, render_prometheus
+from app.services.screening_writer import enqueue_screening_update, enqueue_screening_upsert, flush_screening_writes
+from app.services.upload_scheduler import get_upload_scheduler, run_upload
+from app.services.video_artifacts import media_duration_seconds, mp4_transcode_args, run_ffmpeg_with_progress, transcoded_path_for
+
+if TYPE_CHECKING:
+    # aiortc (with PyAV) is the most expensive import of the app; it is loaded on the first
+    # offer (or by the startup preload), not when the router is imported
+    from aiortc import RTCConfiguration, RTCPeerConnection, RTCSessionDescription, MediaStreamTrack
+    from aiortc.contrib.media import MediaRelay
 
 
 router = APIRouter(prefix="/webrtc", tags=["webrtc"])
@@ -45,32 +76,86 @@ class TurnCredentialsResponse(BaseModel):
 
 class _SessionState(BaseModel):
     session_id: str
+    # Current peer connection; replaced when the client reconnects
     pc_id: str
+    user_id: Optional[str] = None
     started_at: datetime
     tmp_mp4_path: str
     format_name: str = "mp4"
     recorder_started: bool = False
-    recorder: Optional[MediaRecorder] = None
+    # aiortc MediaRecorder
+    recorder: Optional[Any] = None
     recorder_start_task: Optional[asyncio.Task] = None
+    # Persistent per-kind recorder inputs; reconnects splice new remote tracks into them
+    splice_tracks: dict[str, Any] = {}
     analysis_tasks: list[asyncio.Task] = []
+    # Per-window analysis outputs: series name -> (values, sample_rate_hz)
+    analysis_series: dict[str, tuple[list[float], float]] = {}
+    frames_decoded: int = 0
+    stats_sampler: Optional[RtcStatsSampler] = None
     # Finalization state
+    closing: bool = False
+    grace_task: Optional[asyncio.Task] = None
+    finalize_lock: asyncio.Lock = Field(default_factory=asyncio.Lock)
     is_finalized: bool = False
     uploaded_webm_key: Optional[str] = None
-    uploaded_wav_key: Optional[str] = None
+    uploaded_audio_key: Optional[str] = None
+    uploaded_analysis_key: Optional[str] = None
+    uploaded_hls_key: Optional[str] = None
+    uploaded_peaks_key: Optional[str] = None
+    uploaded_thumbnails_key: Optional[str] = None
+    uploaded_thumbnails_vtt_key: Optional[str] = None
     # Pydantic v2: allow non-pydantic types like MediaRecorder
     model_config = {"arbitrary_types_allowed": True}
 
 
 _sessions: dict[str, _SessionState] = {}
 _pcs: dict[str, RTCPeerConnection] = {}
-_relay = MediaRelay()
+_relay: Optional[MediaRelay] = None
 _log = logging.getLogger(__name__)
+# Sessions in _sessions that are still streaming. The upload scheduler reads it from upload
+# threads, so it is a plain int recomputed on the loop instead of a walk over _sessions.
+_live_session_count = 0
+
+
+def _refresh_live_sessions() -> None:
+    """Call on the event loop after adding, closing or removing a session."""
+    global _live_session_count
+    _live_session_count = sum(1 for s in _sessions.values() if not s.closing)
+
+
+# Upload bandwidth keeps headroom for every session that is still streaming
+get_upload_scheduler().set_live_sessions_provider(lambda: _live_session_count)
 
 
 def _recordings_bucket() -> str:
     return os.getenv("SUPABASE_RECORDINGS_BUCKET", "recordings")
 
 
+_ANALYSIS_WINDOW_SECONDS = 5.0
+
+
+def _record_analysis_value(state: _SessionState, name: str, value: float) -> None:
+    values, _rate = state.analysis_series.setdefault(name, ([], 1.0 / _ANALYSIS_WINDOW_SECONDS))
+    values.append(float(value))
+
+
+def _write_analysis_artifact(state: _SessionState) -> str:
+    """Write collected analysis series next to the recording; returns '' when there is nothing to write."""
+    series = {name: (values, rate) for name, (values, rate) in state.analysis_series.items() if values}
+    if not series:
+        return ""
+    try:
+        return write_analysis_artifact(
+            artifact_path_for(state.tmp_mp4_path),
+            series,
+            metadata={"session_id": state.session_id, "started_at": state.started_at.isoformat()},
+        )
+    except Exception as e:
+        _log.warning("[webrtc][%s] analysis artifact write failed: %s", state.session_id, e)
+        return ""
+
+
 def _recorder_formats() -> tuple[str, str]:
     """Select primary and fallback container formats for MediaRecorder.
 
@@ -99,20 +184,14 @@ def _recording_extension(format_name: str) -> str:
 
 
 def _client_ip(request: Request) -> str:
-    xff = request.headers.get("x-forwarded-for") or request.headers.get("X-Forwarded-For")
-    if xff:
-        # take first IP
-        return xff.split(",")[0].strip()
-    try:
-        return request.client.host if request.client else ""
-    except Exception:
-        return ""
+    # Rightmost untrusted X-Forwarded-For entry; the leftmost one is client-controlled
+    return client_ip_from_scope(request.scope)
 
 
 def _frontend_host() -> str:
     """Resolve the frontend host (domain) without scheme for building TURN host.
 
-    Prefers DOMAIN_FRONTEND if set; otherwise falls back to Settings().get_frontend_public_url().
+    Prefers DOMAIN_FRONTEND if set; otherwise falls back to get_settings().get_frontend_public_url().
     """
     domain_env = (os.getenv("DOMAIN_FRONTEND") or "").strip().strip("/")
     if domain_env:
@@ -121,7 +200,7 @@ def _frontend_host() -> str:
             return parsed.netloc
         return domain_env
     try:
-        url = Settings().get_frontend_public_url()
+        url = get_settings().get_frontend_public_url()
         parsed = urlparse(url)
         return parsed.netloc or url.replace("http://", "").replace("https://", "")
     except Exception:
@@ -168,6 +247,23 @@ def _mint_turn_credentials(ttl_seconds: int = 3600) -> tuple[list[str], str, str
     return urls, username, password, ttl_seconds
 
 
+def _get_relay() -> MediaRelay:
+    global _relay
+    if _relay is None:
+        from aiortc.contrib.media import MediaRelay
+
+        _relay = MediaRelay()
+    return _relay
+
+
+def preload_media_stack() -> None:
+    """Import aiortc/PyAV and the recorder plumbing ahead of the first offer (run in a thread)."""
+    import aiortc  # noqa: F401
+    from aiortc.contrib.media import MediaRecorder  # noqa: F401
+
+    from app.services.track_splice import SpliceTrack  # noqa: F401
+
+
 def _server_rtc_configuration() -> Optional[RTCConfiguration]:
     """Build RTCConfiguration for the server peer using the same TURN.
 
@@ -179,6 +275,8 @@ def _server_rtc_configuration() -> Optional[RTCConfiguration]:
         return None
     except Exception:
         return None
+    from aiortc import RTCConfiguration, RTCIceServer
+
     # Build config without unsupported kwargs; set relay-only if attribute exists
     cfg = RTCConfiguration(
         iceServers=[RTCIceServer(urls=urls, username=username, credential=credential)]
@@ -193,11 +291,40 @@ def _server_rtc_configuration() -> Optional[RTCConfiguration]:
     return cfg
 
 
+async def warm_turn_config() -> None:
+    """Startup check of the TURN setup: the secret is set and the TURN host resolves."""
+    if not os.getenv("TURN_STATIC_AUTH_SECRET"):
+        _log.warning("[webrtc] TURN is not configured (TURN_STATIC_AUTH_SECRET unset); no relay candidates")
+        return
+    # Also primes the resolver cache for the first offers
+    await asyncio.get_running_loop().getaddrinfo(_turn_host(), 3478)
+
+
 async def _finalize_and_upload(state: _SessionState) -> tuple[Optional[str], Optional[str]]:
+    # Serialize concurrent callers (explicit close vs. connection-state handler): finalize runs once
+    async with state.finalize_lock:
+        if not state.is_finalized:
+            open_progress(state.session_id, state.user_id)
+        try:
+            keys = await _finalize_recording(state)
+        except Exception as e:
+            publish_progress(state.session_id, "failed", error=str(e) or type(e).__name__)
+            raise
+    for track in state.splice_tracks.values():
+        track.stop()
+    return keys
+
+
+async def _finalize_recording(state: _SessionState) -> tuple[Optional[str], Optional[str]]:
     # Idempotency guard
     if state.is_finalized:
-        _log.info("[webrtc][%s] finalize: already finalized webm=%s wav=%s", state.session_id, state.uploaded_webm_key, state.uploaded_wav_key)
-        return state.uploaded_webm_key, state.uploaded_wav_key
+        _log.info("[webrtc][%s] finalize: already finalized webm=%s audio=%s", state.session_id, state.uploaded_webm_key, state.uploaded_audio_key)
+        return state.uploaded_webm_key, state.uploaded_audio_key
+    publish_progress(state.session_id, "stopping")
+    if state.stats_sampler:
+        # Connection stats time series go into the same analysis container
+        await state.stats_sampler.stop()
+        state.analysis_series.update(state.stats_sampler.analysis_series())
     try:
         # Ensure recorder has actually started before stopping
         if state.recorder_start_task and not state.recorder_start_task.done():
@@ -217,86 +344,56 @@ async def _finalize_and_upload(state: _SessionState) -> tuple[Optional[str], Opt
     except Exception as e:
         _log.warning("[webrtc][%s] recorder finalize block error: %s", state.session_id, e)
 
-    # Extract audio-only WAV using ffmpeg
-    wav_path = state.tmp_mp4_path.rsplit(".", 1)[0] + ".wav"
-    try:
-        subprocess.run(
-            [
-                "ffmpeg",
-                "-y",
-                "-i",
-                state.tmp_mp4_path,
-                "-vn",
-                "-acodec",
-                "pcm_s16le",
-                "-ar",
-                "48000",
-                "-ac",
-                "1",
-                wav_path,
-            ],
-            check=True,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-        )
-    except Exception:
-        wav_path = ""
+    # Extract the audio-only artifact (FLAC/Opus/WAV per AUDIO_ARTIFACT_CODEC) using ffmpeg.
+    # Media work runs off the event loop so signaling and progress streams stay responsive.
+    publish_progress(state.session_id, "transcoding", step="audio", percent=0.0)
+    audio_codec = audio_artifact_codec()
+    audio_path = await asyncio.to_thread(extract_audio, state.tmp_mp4_path, audio_codec)
 
     # Always produce a browser-friendly MP4 via ffmpeg (yuv420p, faststart)
-    # Never transcode to the same input path to avoid ffmpeg clobbering/183 exit
-    in_dir, in_name = os.path.dirname(state.tmp_mp4_path), os.path.basename(state.tmp_mp4_path)
-    in_root, in_ext = os.path.splitext(in_name)
-    # If input already ends with .mp4, place transcoded file next to it with a suffix
-    out_name = f"{in_root}.transcoded.mp4" if in_ext.lower() == ".mp4" else f"{in_root}.mp4"
-    mp4_transcoded_path = os.path.join(in_dir, out_name)
+    in_dir = os.path.dirname(state.tmp_mp4_path)
+    mp4_transcoded_path = transcoded_path_for(state.tmp_mp4_path)
     mp4_ready_path = state.tmp_mp4_path
     try:
-        subprocess.run(
-            [
-                "ffmpeg",
-                "-y",
-                # Generate missing/monotonic PTS to fix non-monotonic DTS from real-time recording
-                "-fflags", "+genpts",
-                "-i",
+        duration = await asyncio.to_thread(media_duration_seconds, state.tmp_mp4_path)
+        if duration <= 0:
+            duration = (datetime.now(timezone.utc) - state.started_at).total_seconds()
+        last_percent = -1.0
+
+        def _on_transcode_progress(percent: float) -> None:
+            nonlocal last_percent
+            # Whole percent steps are plenty for a progress bar
+            if int(percent) != int(last_percent):
+                last_percent = percent
+                publish_progress(state.session_id, "transcoding", step="video", percent=round(percent, 1))
+
+        returncode = await run_ffmpeg_with_progress(
+            mp4_transcode_args(
                 state.tmp_mp4_path,
-                # Select first video/audio streams if present, optionally (the '?' avoids failure if missing)
-                "-map", "0:v:0?", "-map", "0:a:0?",
-                # Enforce constant frame rate on output
-                "-r", os.getenv("FFMPEG_FPS", "30"),
-                "-c:v",
-                "libx264",
-                "-pix_fmt",
-                "yuv420p",
-                "-preset",
-                os.getenv("FFMPEG_PRESET", "veryfast"),
-                "-crf",
-                os.getenv("FFMPEG_CRF", "23"),
-                # Force CFR output; duplicate/drop frames to match -r
-                "-vsync", "cfr",
-                "-movflags",
-                "+faststart",
-                "-c:a",
-                "aac",
-                "-b:a",
-                "128k",
-                "-ar",
-                "48000",
-                "-ac",
-                "2",
-                # Align output duration to the shortest stream to avoid trailing black/silence
-                "-shortest",
                 mp4_transcoded_path,
-            ],
-            check=True,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
+                # Keyframes on HLS segment boundaries so packaging can stream-copy
+                extra_video_args=hls_keyframe_args() if hls_enabled() else (),
+            ),
+            duration_seconds=duration,
+            on_progress=_on_transcode_progress,
         )
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, "ffmpeg")
         # If the transcoded file exists and is non-empty, use it
         if os.path.exists(mp4_transcoded_path) and os.path.getsize(mp4_transcoded_path) > 0:
             mp4_ready_path = mp4_transcoded_path
     except Exception as e:
         _log.warning("[webrtc][%s] mp4 transcode failed, will upload original container: %s", state.session_id, e)
 
+    # Optional HLS packaging (fMP4 segments + playlists) of the browser-ready MP4
+    hls_dir = ""
+    if hls_enabled() and mp4_ready_path == mp4_transcoded_path:
+        hls_dir = os.path.join(in_dir, HLS_DIRNAME)
+        publish_progress(state.session_id, "transcoding", step="hls", percent=100.0)
+        if not await asyncio.to_thread(package_hls, mp4_ready_path, hls_dir):
+            _log.warning("[webrtc][%s] hls packaging produced no renditions", state.session_id)
+            hls_dir = ""
+
     # Mid-stream and post-stop file presence/growth probe (extended flush window)
     try:
         max_checks = 20  # ~4s total at 200ms
@@ -321,61 +418,28 @@ async def _finalize_and_upload(state: _SessionState) -> tuple[Optional[str], Opt
     except Exception as e:
         _log.warning("[webrtc][%s] finalize file stat failed: %s", state.session_id, e)
 
-    # Upload artifacts to Supabase Storage (idempotent: remove if exists)
-    bucket = _recordings_bucket()
-    session_key_base = f"sessions/{state.session_id}"
-
-    def _upload(path: str, key_suffix: str) -> Optional[str]:
-        if not path or not os.path.exists(path):
-            _log.info("[webrtc][%s] upload skipped (missing): %s", state.session_id, path)
-            return None
-        try:
-            size = os.path.getsize(path)
-        except Exception:
-            size = -1
-        _log.info("[webrtc][%s] upload candidate exists=%s size=%s path=%s", state.session_id, True, size, path)
-        # Always honor the provided key suffix; choose content-type from extension
-        key = f"{session_key_base}/{key_suffix}"
-        try:
-            supabase.storage.from_(bucket).remove([key])
-        except Exception:
-            pass
-        with open(path, "rb") as f:
-            # supabase-py v2 (storage3): pass structured options, avoid booleans in headers
-            if key.endswith(".mkv"):
-                file_options = {"content_type": "video/x-matroska"}
-            elif key.endswith(".webm"):
-                file_options = {"content_type": "video/webm"}
-            elif key.endswith(".mp4"):
-                file_options = {"content_type": "video/mp4"}
-            else:
-                file_options = {"content_type": "audio/wav"}
-            try:
-                _log.info("[webrtc][%s] uploading %s bytes to %s/%s", state.session_id, os.path.getsize(path), bucket, key)
-                res = supabase.storage.from_(bucket).upload(key, f, file_options=file_options)
-                _log.info("[webrtc][%s] upload response: %s", state.session_id, res)
-            except Exception as e:
-                _log.error("[webrtc][%s] upload failed for %s: %s", state.session_id, key, e)
-                raise
-            # Try to extract a path-like value from various possible response shapes; fallback to key
-            try:
-                if isinstance(res, dict):
-                    return res.get("path") or res.get("Key") or res.get("fullPath") or res.get("name") or key
-                # Some clients return an HTTPX/Requests Response
-                if hasattr(res, "json"):
-                    try:
-                        j = res.json()
-                        if isinstance(j, dict):
-                            return j.get("path") or j.get("Key") or j.get("fullPath") or j.get("name") or key
-                    except Exception:
-                        pass
-                # Some clients wrap data in a .data attribute
-                data_attr = getattr(res, "data", None)
-                if isinstance(data_attr, dict):
-                    return data_attr.get("path") or data_attr.get("Key") or data_attr.get("fullPath") or data_attr.get("name") or key
-            except Exception:
-                pass
-            return key
+    # Upload artifacts to Supabase Storage; objects whose stored SHA-256 matches are not re-sent
+    digests = await asyncio.to_thread(load_artifact_digests, state.session_id)
+
+    uploaded: dict[str, int] = {}
+    last_upload_event = 0.0
+
+    def _upload_progress(key: str, sent: int, total: int) -> None:
+        # Called from the upload thread for every streamed chunk; events are rate limited
+        nonlocal last_upload_event
+        uploaded[key] = sent
+        now = time.monotonic()
+        if sent >= total or now - last_upload_event >= 0.25:
+            last_upload_event = now
+            publish_progress(
+                state.session_id, "uploading", key=key, sent=sent, total=total, uploaded_bytes=sum(uploaded.values())
+            )
+
+    async def _upload(path: str, key_suffix: str) -> Optional[str]:
+        # Throttled by the shared upload scheduler; runs off the event loop
+        return await run_upload(
+            upload_session_artifact, state.session_id, path, key_suffix, digests=digests, progress=_upload_progress
+        )
 
     # Decide which recording file to upload and suffix
     if mp4_ready_path.endswith(".mp4") and os.path.exists(mp4_ready_path):
@@ -390,13 +454,57 @@ async def _finalize_and_upload(state: _SessionState) -> tuple[Optional[str], Opt
             recording_suffix = "recording.webm"
         else:
             recording_suffix = os.path.basename(recording_path)
-    mp4_key = _upload(recording_path, recording_suffix)
-    wav_key = _upload(wav_path, "audio.wav") if wav_path else None
+    try:
+        # Audio first: it is small and is what downstream analysis needs
+        audio_key = await _upload(audio_path, audio_artifact_suffix(audio_codec)) if audio_path else None
+        mp4_key = await _upload(recording_path, recording_suffix)
+        hls_key: Optional[str] = None
+        if hls_dir:
+            try:
+                hls_key = await run_upload(upload_hls, state.session_id, hls_dir, digests=digests, progress=_upload_progress)
+            except Exception as e:
+                _log.warning("[webrtc][%s] hls upload failed: %s", state.session_id, e)
+        analysis_path = await asyncio.to_thread(_write_analysis_artifact, state)
+        analysis_key: Optional[str] = None
+        if analysis_path:
+            try:
+                analysis_key = await _upload(analysis_path, ANALYSIS_ARTIFACT_KEY_SUFFIX)
+            except Exception as e:
+                _log.warning("[webrtc][%s] analysis artifact upload failed: %s", state.session_id, e)
+
+        # Small derived artifacts for the review timeline (waveform peaks, thumbnail sprite + VTT)
+        peaks_path = await asyncio.to_thread(write_waveform_peaks, audio_path, os.path.join(in_dir, PEAKS_KEY_SUFFIX)) if audio_path else ""
+        sprite_path = os.path.join(in_dir, THUMBNAILS_KEY_SUFFIX)
+        vtt_path = os.path.join(in_dir, THUMBNAILS_VTT_KEY_SUFFIX)
+        has_sprite = (
+            await asyncio.to_thread(write_thumbnail_sprite, recording_path, sprite_path, vtt_path)
+            if os.path.exists(recording_path)
+            else False
+        )
+        peaks_key: Optional[str] = None
+        thumbnails_key: Optional[str] = None
+        thumbnails_vtt_key: Optional[str] = None
+        try:
+            if peaks_path:
+                peaks_key = await _upload(peaks_path, PEAKS_KEY_SUFFIX)
+            if has_sprite:
+                thumbnails_key = await _upload(sprite_path, THUMBNAILS_KEY_SUFFIX)
+                thumbnails_vtt_key = await _upload(vtt_path, THUMBNAILS_VTT_KEY_SUFFIX)
+        except Exception as e:
+            _log.warning("[webrtc][%s] derived artifact upload failed: %s", state.session_id, e)
+    finally:
+        # Persist what was uploaded even if a later upload failed, so a retry skips it
+        enqueue_screening_update(state.session_id, {"artifact_digests": digests})
 
     # Save results on state before cleanup
     state.is_finalized = True
     state.uploaded_webm_key = mp4_key
-    state.uploaded_wav_key = wav_key
+    state.uploaded_audio_key = audio_key
+    state.uploaded_analysis_key = analysis_key
+    state.uploaded_hls_key = hls_key
+    state.uploaded_peaks_key = peaks_key
+    state.uploaded_thumbnails_key = thumbnails_key
+    state.uploaded_thumbnails_vtt_key = thumbnails_vtt_key
 
     # Optionally: write metadata table row here
     # For MVP, skip DB row; rely on object keys.
@@ -410,113 +518,166 @@ async def _finalize_and_upload(state: _SessionState) -> tuple[Optional[str], Opt
                 os.remove(mp4_transcoded_path)
             except Exception:
                 pass
-        if wav_path and os.path.exists(wav_path):
-            os.remove(wav_path)
+        if audio_path and os.path.exists(audio_path):
+            os.remove(audio_path)
+        if analysis_path and os.path.exists(analysis_path):
+            os.remove(analysis_path)
+        for derived_path in (peaks_path, sprite_path, vtt_path):
+            if derived_path and os.path.exists(derived_path):
+                os.remove(derived_path)
+        if hls_dir:
+            shutil.rmtree(hls_dir, ignore_errors=True)
     except Exception:
         pass
 
-    return mp4_key, wav_key
+    return mp4_key, audio_key
 
 
-@router.post("/offer", response_class=PlainTextResponse)
-async def handle_offer(
-    request: Request,
-    user: User = Depends(get_current_user),
-) -> Response:
-    if not user or not user.id:
-        raise HTTPException(status_code=401, detail="Unauthorized")
+_background_tasks: set[asyncio.Task] = set()
+
+
+async def _announce_done(session_id: str, keys: dict) -> None:
+    # The artifacts endpoint reads the screenings row; announce completion once it is written
+    await flush_screening_writes(timeout=10, session_id=session_id)
+    publish_progress(session_id, "done", **keys)
 
-    session_id = request.query_params.get("session_id") or str(uuid.uuid4())
 
-    # If a session with the same id already exists, close and finalize it to avoid zombies
+def _schedule_done(session_id: str, keys: dict) -> None:
+    task = asyncio.create_task(_announce_done(session_id, keys))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+def _reconnect_grace_seconds() -> float:
+    """How long a dropped session waits for the client to re-offer before it is finalized."""
     try:
-        existing_state = _sessions.get(session_id)
-        if existing_state:
-            old_pc = _pcs.get(existing_state.pc_id)
-            try:
-                if old_pc:
-                    await old_pc.close()
-            except Exception:
-                pass
-            try:
-                await _finalize_and_upload(existing_state)
-            except Exception:
-                pass
-            _pcs.pop(existing_state.pc_id, None)
-            _sessions.pop(session_id, None)
-    except Exception:
-        pass
+        return max(0.0, float(os.getenv("WEBRTC_RECONNECT_GRACE_SECONDS", "30")))
+    except ValueError:
+        return 30.0
 
-    # Read body as text if content-type is application/sdp; otherwise parse json
-    content_type = request.headers.get("content-type", "").lower()
-    if "application/sdp" in content_type:
-        offer_sdp = await request.body()
-        offer_text = offer_sdp.decode("utf-8") if isinstance(offer_sdp, (bytes, bytearray)) else str(offer_sdp)
-        offer = RTCSessionDescription(sdp=offer_text, type="offer")
-    else:
-        data = await request.json()
-        model = OfferBody(**data)
-        offer = RTCSessionDescription(sdp=model.sdp, type=model.type)
 
-    cfg = _server_rtc_configuration()
-    pc = RTCPeerConnection(cfg) if cfg else RTCPeerConnection()
-    pc_id = str(uuid.uuid4())
-    _pcs[pc_id] = pc
+def _ice_ufrag(sdp: str) -> Optional[str]:
+    for line in sdp.splitlines():
+        if line.startswith("a=ice-ufrag:"):
+            return line.split(":", 1)[1].strip()
+    return None
 
-    tmp_dir = tempfile.mkdtemp(prefix="webrtc_")
-    primary_fmt, fallback_fmt = _recorder_formats()
-    # Workaround: aiortc/PyAV can produce non-monotonic DTS when writing MP4 directly.
-    # Record to Matroska for stability when primary is mp4, then transcode to MP4 on finalize.
-    internal_fmt = "matroska" if primary_fmt == "mp4" else primary_fmt
-    tmp_mp4_path = os.path.join(tmp_dir, f"{session_id}{_recording_extension(internal_fmt)}")
-    recorder = MediaRecorder(tmp_mp4_path, format=internal_fmt)
 
-    state = _SessionState(
-        session_id=session_id,
-        pc_id=pc_id,
-        started_at=datetime.now(timezone.utc),
-        tmp_mp4_path=tmp_mp4_path,
-        format_name=internal_fmt,
-        recorder=recorder,
-    )
-    _sessions[session_id] = state
+async def _answer_offer(pc: RTCPeerConnection, offer: RTCSessionDescription) -> str:
+    """Apply the remote offer, create the answer and wait for ICE gathering (no trickle)."""
+    await pc.setRemoteDescription(offer)
 
-    # Insert or upsert a screenings row at start
+    # Create and set local description (answer)
+    answer = await pc.createAnswer()
+    await pc.setLocalDescription(answer)
+    # Wait for ICE gathering to complete before returning SDP (no trickle)
+    async def _wait_ice_complete() -> None:
+        if pc.iceGatheringState == "complete":
+            return
+        done = asyncio.get_event_loop().create_future()
+        def _on_change() -> None:
+            if pc.iceGatheringState == "complete" and not done.done():
+                done.set_result(None)
+        pc.on("icegatheringstatechange", _on_change)  # type: ignore
+        try:
+            await asyncio.wait_for(done, timeout=2.0)
+        except Exception:
+            pass
     try:
-        headers = request.headers
-        ua = headers.get("user-agent") or headers.get("User-Agent") or ""
-        ip = _client_ip(request)
-        _log.info("[webrtc][%s] screenings.upsert begin user_id=%s ip=%s ua_len=%s", session_id, user.id, ip, len(ua or ""))
-        res = supabase.table("screenings").upsert({
-            "id": session_id,
-            "user_id": user.id,
-            "started_at": state.started_at.isoformat(),
-            "client_ip": ip,
-            "user_agent": ua,
-            "status": "in_progress",
-        }, on_conflict="id").execute()
-        _log.info("[webrtc][%s] screenings.upsert done resp=%s", session_id, getattr(res, "data", None) or getattr(res, "__dict__", None))
-    except Exception as e:
-        _log.error("[webrtc][%s] screenings upsert failed: %s", session_id, e)
+        await _wait_ice_complete()
+    except Exception:
+        pass
+    return pc.localDescription.sdp
 
-    analysis_tasks: list[asyncio.Task] = []
+
+async def _finalize_session(state: _SessionState) -> None:
+    """Finalize a session that ended without an explicit /close and mark the screening completed."""
+    session_id = state.session_id
+    mp4_key, audio_key = await _finalize_and_upload(state)
+    pc = _pcs.pop(state.pc_id, None)
+    try:
+        if pc:
+            await pc.close()
+    except Exception:
+        pass
+    if _sessions.get(session_id) is state:
+        _sessions.pop(session_id, None)
+        _refresh_live_sessions()
+    for t in state.analysis_tasks:
+        t.cancel()
+    # Update screenings row (write-behind; never blocks the event loop)
+    _log.info("[webrtc][%s] screenings.update(auto) webm=%s audio=%s", session_id, mp4_key, audio_key)
+    keys = {
+        "storage_recording_key": mp4_key,
+        "storage_audio_key": audio_key,
+        "storage_analysis_key": state.uploaded_analysis_key,
+        "storage_hls_key": state.uploaded_hls_key,
+        "storage_peaks_key": state.uploaded_peaks_key,
+        "storage_thumbnails_key": state.uploaded_thumbnails_key,
+        "storage_thumbnails_vtt_key": state.uploaded_thumbnails_vtt_key,
+    }
+    enqueue_screening_update(session_id, {
+        "ended_at": datetime.now(timezone.utc).isoformat(),
+        "status": "completed",
+        **keys,
+        "rtc_stats": state.stats_sampler.summary() if state.stats_sampler else None,
+    })
+    _schedule_done(session_id, keys)
+    _log.info("[webrtc][%s] finalized recording: webm=%s audio=%s", session_id, mp4_key, audio_key)
+
+
+async def _finalize_after_grace(state: _SessionState, pc_id: str) -> None:
+    grace = _reconnect_grace_seconds()
+    if grace > 0:
+        _log.info("[webrtc][%s] connection lost; waiting %.0fs for a reconnect", state.session_id, grace)
+        await asyncio.sleep(grace)
+    # A re-offer swapped in a new peer connection, or /close took over
+    if state.pc_id != pc_id or state.closing or state.is_finalized:
+        return
+    state.closing = True
+    _refresh_live_sessions()
+    await _finalize_session(state)
+
+
+def _attach_peer(pc: RTCPeerConnection, pc_id: str, state: _SessionState) -> None:
+    """Wire track and connection-state handlers of one peer connection into a session.
+
+    A session may be served by several peer connections over its lifetime (reconnects);
+    incoming tracks are spliced into the session's persistent recorder tracks.
+    """
+    from app.services.track_splice import SpliceTrack
+
+    session_id = state.session_id
+    relay = _get_relay()
+    if state.stats_sampler:
+        state.stats_sampler.attach(pc)
 
     @pc.on("track")
     def on_track(track: MediaStreamTrack) -> None:
         # Tee incoming tracks: create distinct relay subscriptions for recorder and analysis
-        recorder_relayed = _relay.subscribe(track)
-        analysis_relayed = _relay.subscribe(track)
+        recorder_relayed = relay.subscribe(track)
+        analysis_relayed = relay.subscribe(track)
         _log.info("[webrtc][%s] on_track kind=%s -> relayed", session_id, track.kind)
-        try:
-            if state.recorder:
-                state.recorder.addTrack(recorder_relayed)
-                _log.info("[webrtc][%s] recorder.addTrack kind=%s started=%s path=%s", session_id, track.kind, state.recorder_started, state.tmp_mp4_path)
-        except Exception:
-            pass
+        splice = state.splice_tracks.get(track.kind)
+        if splice is not None:
+            # Reconnect: keep the running recorder and feed it from the new connection
+            splice.set_source(recorder_relayed)
+            _log.info("[webrtc][%s] reconnect: spliced new %s track into recorder", session_id, track.kind)
+        else:
+            splice = SpliceTrack(track.kind)
+            splice.set_source(recorder_relayed)
+            state.splice_tracks[track.kind] = splice
+            try:
+                if state.recorder:
+                    state.recorder.addTrack(splice)
+                    _log.info("[webrtc][%s] recorder.addTrack kind=%s started=%s path=%s", session_id, track.kind, state.recorder_started, state.tmp_mp4_path)
+            except Exception:
+                pass
 
         # Ensure the recorder is started once when the first track arrives
         if state.recorder and not state.recorder_started and not state.recorder_start_task:
             async def _start_recorder() -> None:
+                _primary_fmt, fallback_fmt = _recorder_formats()
                 try:
                     _log.info("[webrtc][%s] recorder.start begin fmt=%s path=%s", state.session_id, state.format_name, state.tmp_mp4_path)
                     await state.recorder.start()
@@ -536,11 +697,14 @@ async def handle_offer(
                                 pass
                             state.tmp_mp4_path = new_path
                             state.format_name = fallback_fmt
+                            from aiortc.contrib.media import MediaRecorder
+
                             state.recorder = MediaRecorder(new_path, format=fallback_fmt)
-                            try:
-                                state.recorder.addTrack(recorder_relayed)
-                            except Exception:
-                                pass
+                            for spliced in state.splice_tracks.values():
+                                try:
+                                    state.recorder.addTrack(spliced)
+                                except Exception:
+                                    pass
                             await state.recorder.start()
                             state.recorder_started = True
                             _log.info("[webrtc][%s] recorder.fallback started -> %s", state.session_id, state.tmp_mp4_path)
@@ -560,11 +724,13 @@ async def handle_offer(
                     except Exception:
                         break
                     frame_count += 1
+                    state.frames_decoded += 1
                     now = asyncio.get_event_loop().time()
                     if now - start >= 5.0:
                         fps = frame_count / (now - start)
                         # Placeholder: emit to logs or future websocket
                         print(f"[analysis][{session_id}] video fps ~ {fps:.1f}")
+                        _record_analysis_value(state, "video_fps", fps)
                         # Probe file existence mid-stream (infrequent)
                         try:
                             exists = os.path.exists(state.tmp_mp4_path)
@@ -574,9 +740,7 @@ async def handle_offer(
                             pass
                         start = now
                         frame_count = 0
-            task = asyncio.create_task(video_worker())
-            analysis_tasks.append(task)
-            state.analysis_tasks.append(task)
+            state.analysis_tasks.append(asyncio.create_task(video_worker()))
 
         elif track.kind == "audio":
             async def audio_worker() -> None:
@@ -592,67 +756,154 @@ async def handle_offer(
                     now = asyncio.get_event_loop().time()
                     if now - start >= 5.0:
                         print(f"[analysis][{session_id}] audio frames in 5s: {sample_frames}")
+                        _record_analysis_value(state, "audio_samples", sample_frames)
                         sample_frames = 0
                         start = now
-            task = asyncio.create_task(audio_worker())
-            analysis_tasks.append(task)
-            state.analysis_tasks.append(task)
+            state.analysis_tasks.append(asyncio.create_task(audio_worker()))
 
     @pc.on("connectionstatechange")
     async def on_state_change() -> None:
-        _log.info("[webrtc][%s] connectionstate=%s", session_id, pc.connectionState)
-        if pc.connectionState in ("failed", "closed"):
-            mp4_key, wav_key = await _finalize_and_upload(state)
-            try:
-                await pc.close()
-            except Exception:
-                pass
+        _log.info("[webrtc][%s] connectionstate=%s pc=%s", session_id, pc.connectionState, pc_id)
+        if pc.connectionState not in ("failed", "closed"):
+            return
+        if state.pc_id != pc_id:
+            # Superseded by a reconnect; the session lives on in the new connection
             _pcs.pop(pc_id, None)
-            _sessions.pop(session_id, None)
-            for t in analysis_tasks:
-                t.cancel()
-            # Update screenings row
-            try:
-                _log.info("[webrtc][%s] screenings.update(auto) webm=%s wav=%s", session_id, mp4_key, wav_key)
-                r = supabase.table("screenings").update({
-                    "ended_at": datetime.now(timezone.utc).isoformat(),
-                    "status": "completed",
-                    "storage_recording_key": mp4_key,
-                    "storage_audio_key": wav_key,
-                }).eq("id", session_id).execute()
-                _log.info("[webrtc][%s] screenings.update(auto) resp=%s", session_id, getattr(r, "data", None) or getattr(r, "__dict__", None))
-            except Exception as e:
-                _log.error("[webrtc][%s] screenings update failed: %s", session_id, e)
-            _log.info("[webrtc][%s] finalized recording: webm=%s wav=%s", session_id, mp4_key, wav_key)
+            return
+        if state.closing or state.is_finalized:
+            return
+        # Give the client a chance to re-offer before finalizing the recording
+        if state.grace_task is None or state.grace_task.done():
+            state.grace_task = asyncio.create_task(_finalize_after_grace(state, pc_id))
+
+
+async def _resume_session(state: _SessionState, offer: RTCSessionDescription) -> Response:
+    """Handle a re-offer for a live session without restarting the recording."""
+    session_id = state.session_id
+    old_pc_id = state.pc_id
+    old_pc = _pcs.get(old_pc_id)
+    same_ice = bool(
+        old_pc
+        and old_pc.remoteDescription
+        and _ice_ufrag(old_pc.remoteDescription.sdp) == _ice_ufrag(offer.sdp)
+    )
+    if old_pc and same_ice and old_pc.connectionState not in ("failed", "closed"):
+        # Plain renegotiation: same ICE credentials, transport still usable
+        try:
+            sdp = await _answer_offer(old_pc, offer)
+            _log.info("[webrtc][%s] re-offer renegotiated on existing pc=%s", session_id, old_pc_id)
+            return PlainTextResponse(sdp)
+        except Exception as e:
+            _log.warning("[webrtc][%s] renegotiation failed, replacing peer connection: %s", session_id, e)
 
-    # Apply remote description
-    await pc.setRemoteDescription(offer)
+    from aiortc import RTCPeerConnection
 
-    # Recorder is started lazily on first incoming track to avoid empty files
+    # ICE restart or dead transport. aiortc cannot restart ICE on an existing transport, so a new
+    # peer connection is spliced into the running recorder instead of starting a new recording.
+    cfg = _server_rtc_configuration()
+    pc = RTCPeerConnection(cfg) if cfg else RTCPeerConnection()
+    pc_id = str(uuid.uuid4())
+    _pcs[pc_id] = pc
+    # From here on the old connection's handlers see themselves as superseded
+    state.pc_id = pc_id
+    if state.grace_task and not state.grace_task.done():
+        state.grace_task.cancel()
+    state.grace_task = None
+    _attach_peer(pc, pc_id, state)
+    if old_pc:
+        try:
+            await old_pc.close()
+        except Exception:
+            pass
+    _pcs.pop(old_pc_id, None)
+    _log.info("[webrtc][%s] reconnect: pc %s -> %s", session_id, old_pc_id, pc_id)
+    return PlainTextResponse(await _answer_offer(pc, offer))
 
-    # Create and set local description (answer)
-    answer = await pc.createAnswer()
-    await pc.setLocalDescription(answer)
-    # Wait for ICE gathering to complete before returning SDP (no trickle)
-    async def _wait_ice_complete() -> None:
-        if pc.iceGatheringState == "complete":
-            return
-        done = asyncio.get_event_loop().create_future()
-        def _on_change() -> None:
-            if pc.iceGatheringState == "complete" and not done.done():
-                done.set_result(None)
-        pc.on("icegatheringstatechange", _on_change)  # type: ignore
+
+@router.post("/offer", response_class=PlainTextResponse)
+async def handle_offer(
+    request: Request,
+    user: User = Depends(get_current_user),
+) -> Response:
+    if not user or not user.id:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+
+    session_id = request.query_params.get("session_id") or str(uuid.uuid4())
+    # First offer of the process pays the aiortc import in a thread, not on the event loop
+    await asyncio.to_thread(preload_media_stack)
+    from aiortc import RTCPeerConnection, RTCSessionDescription
+    from aiortc.contrib.media import MediaRecorder
+
+    # Read body as text if content-type is application/sdp; otherwise parse json
+    content_type = request.headers.get("content-type", "").lower()
+    if "application/sdp" in content_type:
+        offer_sdp = await request.body()
+        offer_text = offer_sdp.decode("utf-8") if isinstance(offer_sdp, (bytes, bytearray)) else str(offer_sdp)
+        offer = RTCSessionDescription(sdp=offer_text, type="offer")
+    else:
+        data = await request.json()
+        model = OfferBody(**data)
+        offer = RTCSessionDescription(sdp=model.sdp, type=model.type)
+
+    existing_state = _sessions.get(session_id)
+    if existing_state:
+        if existing_state.user_id and existing_state.user_id != user.id:
+            raise HTTPException(status_code=403, detail="Forbidden")
+        if not existing_state.closing and not existing_state.is_finalized:
+            # Re-offer for a live session (network blip, page reload): keep the same recording
+            return await _resume_session(existing_state, offer)
+        # Session is already ending: let its finalize complete, then start a fresh recording
         try:
-            await asyncio.wait_for(done, timeout=2.0)
+            await _finalize_and_upload(existing_state)
         except Exception:
             pass
-    try:
-        await _wait_ice_complete()
-    except Exception:
-        pass
+        _pcs.pop(existing_state.pc_id, None)
+        _sessions.pop(session_id, None)
+        _refresh_live_sessions()
+
+    cfg = _server_rtc_configuration()
+    pc = RTCPeerConnection(cfg) if cfg else RTCPeerConnection()
+    pc_id = str(uuid.uuid4())
+    _pcs[pc_id] = pc
+
+    tmp_dir = tempfile.mkdtemp(prefix="webrtc_")
+    primary_fmt, _fallback_fmt = _recorder_formats()
+    # Workaround: aiortc/PyAV can produce non-monotonic DTS when writing MP4 directly.
+    # Record to Matroska for stability when primary is mp4, then transcode to MP4 on finalize.
+    internal_fmt = "matroska" if primary_fmt == "mp4" else primary_fmt
+    tmp_mp4_path = os.path.join(tmp_dir, f"{session_id}{_recording_extension(internal_fmt)}")
+    recorder = MediaRecorder(tmp_mp4_path, format=internal_fmt)
 
-    # Return SDP answer as plain text
-    return PlainTextResponse(pc.localDescription.sdp)
+    state = _SessionState(
+        session_id=session_id,
+        pc_id=pc_id,
+        user_id=user.id,
+        started_at=datetime.now(timezone.utc),
+        tmp_mp4_path=tmp_mp4_path,
+        format_name=internal_fmt,
+        recorder=recorder,
+    )
+    _sessions[session_id] = state
+    _refresh_live_sessions()
+
+    # Insert or upsert a screenings row at start (write-behind; the answer does not wait for it)
+    headers = request.headers
+    ua = headers.get("user-agent") or headers.get("User-Agent") or ""
+    ip = _client_ip(request)
+    _log.info("[webrtc][%s] screenings.upsert queued user_id=%s ip=%s ua_len=%s", session_id, user.id, ip, len(ua or ""))
+    enqueue_screening_upsert({
+        "id": session_id,
+        "user_id": user.id,
+        "started_at": state.started_at.isoformat(),
+        "client_ip": ip,
+        "user_agent": ua,
+        "status": "in_progress",
+    })
+
+    state.stats_sampler = RtcStatsSampler(session_id, frames_decoded=lambda: state.frames_decoded)
+    _attach_peer(pc, pc_id, state)
+    state.stats_sampler.start()
+    return PlainTextResponse(await _answer_offer(pc, offer))
 
 
 @router.post("/close")
@@ -665,9 +916,22 @@ async def close_session(
 
     state = _sessions.get(session_id)
     mp4_key: Optional[str] = None
-    wav_key: Optional[str] = None
+    audio_key: Optional[str] = None
+    analysis_key: Optional[str] = None
+    hls_key: Optional[str] = None
+    peaks_key: Optional[str] = None
+    thumbnails_key: Optional[str] = None
+    thumbnails_vtt_key: Optional[str] = None
+    rtc_stats: Optional[dict] = None
 
     if state:
+        if state.user_id and state.user_id != user.id:
+            raise HTTPException(status_code=403, detail="Forbidden")
+        # A grace task that already reached finalize must not be cancelled mid-upload
+        if not state.closing and state.grace_task and not state.grace_task.done():
+            state.grace_task.cancel()
+        state.closing = True
+        _refresh_live_sessions()
         pc = _pcs.get(state.pc_id)
         try:
             if pc:
@@ -680,29 +944,45 @@ async def close_session(
                 t.cancel()
             except Exception:
                 pass
-        mp4_key, wav_key = await _finalize_and_upload(state)
+        mp4_key, audio_key = await _finalize_and_upload(state)
+        analysis_key = state.uploaded_analysis_key
+        hls_key = state.uploaded_hls_key
+        peaks_key = state.uploaded_peaks_key
+        thumbnails_key = state.uploaded_thumbnails_key
+        thumbnails_vtt_key = state.uploaded_thumbnails_vtt_key
+        rtc_stats = state.stats_sampler.summary() if state.stats_sampler else None
         _pcs.pop(state.pc_id, None)
         _sessions.pop(session_id, None)
+        _refresh_live_sessions()
+
+    keys = {
+        "storage_recording_key": mp4_key,
+        "storage_audio_key": audio_key,
+        "storage_analysis_key": analysis_key,
+        "storage_hls_key": hls_key,
+        "storage_peaks_key": peaks_key,
+        "storage_thumbnails_key": thumbnails_key,
+        "storage_thumbnails_vtt_key": thumbnails_vtt_key,
+    }
+    update: dict = {"ended_at": datetime.now(timezone.utc).isoformat(), "status": "completed"}
+    if state:
+        _log.info("[webrtc][%s] screenings.update(explicit close) webm=%s audio=%s", session_id, mp4_key, audio_key)
+        update.update(keys, rtc_stats=rtc_stats)
+    else:
+        # Finalized already (auto-finalize, or another worker owns the session): its artifact
+        # keys are in the row or on their way, so only the close itself is recorded
+        _log.info("[webrtc][%s] screenings.update(explicit close) without session state", session_id)
+    enqueue_screening_update(session_id, update)
+    if state:
+        _schedule_done(session_id, keys)
 
-    # Update screenings row on explicit close even if state is missing
-    try:
-        _log.info("[webrtc][%s] screenings.update(explicit close) webm=%s wav=%s", session_id, mp4_key, wav_key)
-        rr = supabase.table("screenings").update({
-            "ended_at": datetime.now(timezone.utc).isoformat(),
-            "status": "completed",
-            "storage_recording_key": mp4_key,
-            "storage_audio_key": wav_key,
-        }).eq("id", session_id).execute()
-        _log.info("[webrtc][%s] screenings.update(explicit close) resp=%s", session_id, getattr(rr, "data", None) or getattr(rr, "__dict__", None))
-    except Exception as e:
-        _log.error("[webrtc][%s] screenings update failed: %s", session_id, e)
-
-    return {"status": "closed", "storage_recording_key": mp4_key, "storage_audio_key": wav_key, "had_state": bool(state)}
+    return {"status": "closed", **keys, "had_state": bool(state)}
 
 
 @router.get("/debug")
 async def debug_session(
     session_id: str,
+    list_objects: bool = False,
     user: User = Depends(get_current_user),
 ) -> dict:
     if not user or not user.id:
@@ -717,12 +997,14 @@ async def debug_session(
             tmp_size = os.path.getsize(state.tmp_mp4_path) if tmp_exists else 0
         except Exception:
             tmp_size = 0
-    # List any uploaded objects for this session
-    objects = []
-    try:
-        objects = supabase.storage.from_(bucket).list(path=f"sessions/{session_id}") or []
-    except Exception as e:
-        _log.warning("[webrtc][%s] list failed: %s", session_id, e)
+    # Listing the bucket is a Storage API round trip; only on request (progress has its own stream)
+    objects = None
+    if list_objects:
+        try:
+            objects = await asyncio.to_thread(lambda: supabase.storage.from_(bucket).list(path=f"sessions/{session_id}") or [])
+        except Exception as e:
+            _log.warning("[webrtc][%s] list failed: %s", session_id, e)
+            objects = []
     return {
         "active": bool(state is not None),
         "pc_id": getattr(state, "pc_id", None),
@@ -731,9 +1013,63 @@ async def debug_session(
         "tmp_size": tmp_size,
         "bucket": bucket,
         "objects": objects,
+        "progress": last_progress(session_id),
     }
 
 
+def _screening_owner_status(session_id: str) -> Optional[dict]:
+    rows = supabase.table("screenings").select("user_id, status").eq("id", session_id).limit(1).execute().data or []
+    return rows[0] if rows else None
+
+
+@router.get("/progress")
+async def finalize_progress(
+    session_id: str,
+    user: User = Depends(get_current_user),
+) -> StreamingResponse:
+    """Server-sent finalize events: stopping, transcoding (percent), uploading (bytes), done | failed."""
+    if not user or not user.id:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    state = _sessions.get(session_id)
+    owner = (state.user_id if state else None) or progress_owner(session_id)
+    events = progress_events(session_id)
+    if owner is None:
+        row = await asyncio.to_thread(_screening_owner_status, session_id)
+        if not row:
+            raise HTTPException(status_code=404, detail="Not found")
+        owner = str(row.get("user_id") or "")
+        if owner == user.id and row.get("status") == "completed" and last_progress(session_id) is None:
+            # Finished before this process saw it (restart, other worker): nothing left to stream
+
+            async def _done():
+                yield {"phase": "done"}
+
+            events = _done()
+    if owner != user.id:
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+    async def _stream():
+        async for event in events:
+            yield format_sse(event)
+
+    return StreamingResponse(
+        _stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics(request: Request) -> Response:
+    """Prometheus scrape endpoint for WebRTC connection stats (METRICS_TOKEN bearer if configured)."""
+    token = (os.getenv("METRICS_TOKEN") or "").strip()
+    if token:
+        provided = (request.headers.get("authorization") or "").removeprefix("Bearer ").strip()
+        if not hmac.compare_digest(provided, token):
+            raise HTTPException(status_code=401, detail="Unauthorized")
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
 @router.get("/turn-credentials", response_model=TurnCredentialsResponse)
 async def get_turn_credentials(
     user: User = Depends(get_current_user),
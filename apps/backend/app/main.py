@@ -1,25 +1,41 @@
 # apps/backend/app/main.py
 
+import time
+
+_import_started = time.perf_counter()
+
+import asyncio
 from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from datetime import datetime, timezone
 import logging
 import os
 from app.core import supabase
-from app.core.config import Settings
+from app.core.config import get_settings
+from app.core.async_db import close_async_db
 from app.core.auth_middleware import AuthMiddleware
-from app.core.auth import get_current_user, User
+from app.core.rate_limit_middleware import RateLimitMiddleware
+from app.core.auth import get_current_user, get_jwks_store, User
 from app.endpoints.registration import router as registration_router
 from app.endpoints.magic_link import router as magic_link_router
 from app.endpoints.account import router as account_router
 from app.endpoints.surveys import router as surveys_router
+from app.endpoints.webrtc import preload_media_stack, warm_turn_config
 from app.endpoints.webrtc import router as webrtc_router
+from app.endpoints.client_recording import router as client_recording_router
 from app.endpoints.screenings import router as screenings_router
+from app.services.rate_limiter import get_rate_limiter
+from app.services.screening_writer import flush_screening_writes
+from app.core.startup import run_warmups
+from app.services.email.templates import preload_templates
 from app.services.storage_bootstrap import ensure_bucket_exists
+from app.services.survey_catalog import refresh_known_surveys
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+# Media (aiortc/PyAV) is imported in the background after startup rather than on first offer
+_media_preload: "asyncio.Future | None" = None
 
 # Initialize FastAPI app
 app = FastAPI(title="ANQA ADHD API")
@@ -29,7 +45,7 @@ _raw_allowed = os.getenv("ALLOWED_ORIGINS")
 if _raw_allowed and _raw_allowed.strip():
     allowed_origins = [origin.strip() for origin in _raw_allowed.split(",") if origin.strip()]
 else:
-    settings = Settings()
+    settings = get_settings()
     # If no ALLOWED_ORIGINS provided, allow the configured frontend public URL
     allowed_origins = [settings.get_frontend_public_url()]
     # In development, also allow localhost and 127.0.0.1 to avoid CORS issues
@@ -39,6 +55,9 @@ else:
             if extra not in allowed_origins:
                 allowed_origins.append(extra)
 
+# Per-route rate limits; added first so it runs inside CORS (429s keep CORS headers) and auth
+app.add_middleware(RateLimitMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=allowed_origins,
@@ -47,23 +66,43 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Attach auth middleware to decode JWT and set request.state.user
+# Attach auth middleware; request.state.user is decoded from the bearer token on first use
 app.add_middleware(AuthMiddleware)
 
 
+async def _prefetch_jwks() -> None:
+    if not await get_jwks_store().refresh():
+        raise RuntimeError("JWKS fetch failed; serving cached keys if any")
+
+
 @app.on_event("startup")
 async def on_startup():
-    logger.info("🚀 ANQA ADHD API has started.")
-    # Ensure recordings bucket exists at boot
-    try:
-        ensure_bucket_exists()
-    except Exception as e:
-        logger.warning("Failed to ensure recordings bucket: %s", e)
+    global _media_preload
+    logger.info("🚀 ANQA ADHD API has started (imports took %.0f ms).", _app_import_seconds * 1000)
+    # JWKS is refreshed in the background; requests never wait on a routine refresh
+    get_jwks_store().start()
+    get_rate_limiter().start()
+    # Independent readiness checks run concurrently under STARTUP_WARMUP_TIMEOUT_SECONDS
+    await run_warmups({
+        "recordings_bucket": lambda: asyncio.to_thread(ensure_bucket_exists),
+        "jwks": _prefetch_jwks,
+        "email_templates": lambda: asyncio.to_thread(preload_templates),
+        "turn": warm_turn_config,
+        "survey_catalog": refresh_known_surveys,
+    })
+    if os.getenv("PRELOAD_MEDIA_STACK", "true").lower() not in ("0", "false", "no"):
+        _media_preload = asyncio.ensure_future(asyncio.to_thread(preload_media_stack))
 
 
 @app.on_event("shutdown")
 async def on_shutdown():
     logger.info("🛑 ANQA ADHD API is shutting down.")
+    await get_jwks_store().stop()
+    await get_rate_limiter().stop()
+    await close_async_db()
+    # Screening rows are written behind the signaling path; do not lose queued transitions
+    if not await flush_screening_writes(timeout=10):
+        logger.warning("Screening writes still pending at shutdown")
 
 
 @app.get("/health")
@@ -84,4 +123,7 @@ app.include_router(magic_link_router)
 app.include_router(account_router)
 app.include_router(surveys_router)
 app.include_router(webrtc_router)
+app.include_router(client_recording_router)
 app.include_router(screenings_router)
+
+_app_import_seconds = time.perf_counter() - _import_started
@@ -0,0 +1,335 @@
+"""Chunked columnar container for per-screening analysis time series (``analysis.anqts``).
+
+Layout (all integers little-endian):
+
+    preamble   32 bytes  magic b"ANQATS\\0\\0", version u16, flags u16, index_offset u64,
+                         index_length u32, reserved u32, reserved u32
+    chunks     each chunk starts on a 64-byte boundary; zlib-compressed or raw array bytes
+    index      UTF-8 JSON describing every series and the byte range of each chunk
+
+The index sits at the end so the writer can stream chunks with constant memory. A remote
+reader fetches the 32-byte preamble, then the index range, then only the chunk ranges
+that overlap the requested time window (HTTP Range requests against a signed URL).
+"""
+
+import json
+import mmap
+import os
+import struct
+import zlib
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import numpy as np
+
+
+MAGIC = b"ANQATS\x00\x00"
+FORMAT_VERSION = 1
+PREAMBLE = struct.Struct("<8sHHQIII")
+PREAMBLE_SIZE = PREAMBLE.size  # 32
+CHUNK_ALIGNMENT = 64
+DEFAULT_CHUNK_FRAMES = 4096
+ARTIFACT_KEY_SUFFIX = "analysis.anqts"
+
+_DTYPES = {"float32": np.dtype("<f4"), "int16": np.dtype("<i2")}
+
+
+class AnalysisArtifactError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class ChunkInfo:
+    offset: int
+    nbytes: int
+    raw_nbytes: int
+    start: int
+    frames: int
+    codec: str
+    shuffle: bool
+
+
+@dataclass(frozen=True)
+class SeriesInfo:
+    name: str
+    dtype: str
+    sample_rate: float
+    channels: int
+    length: int
+    scale: Optional[float]
+    chunks: tuple[ChunkInfo, ...]
+
+    @property
+    def duration_seconds(self) -> float:
+        return self.length / self.sample_rate if self.sample_rate > 0 else 0.0
+
+    def frame_range(self, start_seconds: float, end_seconds: Optional[float]) -> tuple[int, int]:
+        start = max(0, int(np.floor(start_seconds * self.sample_rate)))
+        end = self.length if end_seconds is None else min(self.length, int(np.ceil(end_seconds * self.sample_rate)))
+        return start, max(start, end)
+
+    def chunks_for_frames(self, start: int, end: int) -> list[ChunkInfo]:
+        return [c for c in self.chunks if c.start < end and c.start + c.frames > start]
+
+
+def _shuffle_bytes(raw: bytes, itemsize: int) -> bytes:
+    # Byte-plane shuffle (as in blosc/HDF5): groups the n-th byte of every element together,
+    # which makes slowly varying float/int series far more compressible for zlib.
+    if itemsize <= 1:
+        return raw
+    return np.frombuffer(raw, dtype=np.uint8).reshape(-1, itemsize).T.tobytes()
+
+
+def _unshuffle_bytes(buf: bytes, itemsize: int) -> bytes:
+    if itemsize <= 1:
+        return buf
+    return np.frombuffer(buf, dtype=np.uint8).reshape(itemsize, -1).T.tobytes()
+
+
+def parse_preamble(data: bytes) -> tuple[int, int, int]:
+    """Return (version, index_offset, index_length) from the first 32 bytes of an artifact."""
+    if len(data) < PREAMBLE_SIZE:
+        raise AnalysisArtifactError("Truncated analysis artifact preamble")
+    magic, version, _flags, index_offset, index_length, _r1, _r2 = PREAMBLE.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise AnalysisArtifactError("Not an analysis artifact (bad magic)")
+    if version > FORMAT_VERSION:
+        raise AnalysisArtifactError(f"Unsupported analysis artifact version {version}")
+    return version, index_offset, index_length
+
+
+def parse_index(data: bytes) -> tuple[dict[str, Any], dict[str, SeriesInfo]]:
+    """Parse the JSON index into (metadata, series-by-name)."""
+    doc = json.loads(data.decode("utf-8"))
+    series: dict[str, SeriesInfo] = {}
+    for name, s in (doc.get("series") or {}).items():
+        series[name] = SeriesInfo(
+            name=name,
+            dtype=s["dtype"],
+            sample_rate=float(s["sample_rate"]),
+            channels=int(s["channels"]),
+            length=int(s["length"]),
+            scale=s.get("scale"),
+            chunks=tuple(ChunkInfo(**c) for c in s.get("chunks") or []),
+        )
+    return doc.get("metadata") or {}, series
+
+
+def decode_chunk(info: SeriesInfo, chunk: ChunkInfo, data: bytes) -> np.ndarray:
+    """Decode one chunk's bytes (as fetched from its byte range) into a (frames, channels) array."""
+    dtype = _DTYPES[info.dtype]
+    raw = zlib.decompress(data) if chunk.codec == "zlib" else data
+    if chunk.shuffle:
+        raw = _unshuffle_bytes(raw, dtype.itemsize)
+    if len(raw) != chunk.raw_nbytes:
+        raise AnalysisArtifactError(f"Corrupt chunk in series '{info.name}' at frame {chunk.start}")
+    return np.frombuffer(raw, dtype=dtype).reshape(chunk.frames, info.channels)
+
+
+class AnalysisArtifactWriter:
+    """Stream series into an analysis artifact file.
+
+    Usage:
+        with AnalysisArtifactWriter(path, metadata={"session_id": sid}) as w:
+            w.add_series("audio_rms", rms, sample_rate=100.0)
+    """
+
+    def __init__(self, path: str, *, metadata: Optional[dict[str, Any]] = None, compress: bool = True, level: int = 6) -> None:
+        self.path = path
+        self._metadata = dict(metadata or {})
+        self._compress = compress
+        self._level = level
+        self._series: dict[str, dict[str, Any]] = {}
+        self._f = open(path, "wb")
+        self._f.write(b"\x00" * PREAMBLE_SIZE)
+        self._closed = False
+
+    def __enter__(self) -> "AnalysisArtifactWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self._f.close()
+            self._closed = True
+
+    def _align(self) -> None:
+        pad = (-self._f.tell()) % CHUNK_ALIGNMENT
+        if pad:
+            self._f.write(b"\x00" * pad)
+
+    def add_series(
+        self,
+        name: str,
+        values: Any,
+        *,
+        sample_rate: float,
+        dtype: str = "float32",
+        scale: Optional[float] = None,
+        chunk_frames: int = DEFAULT_CHUNK_FRAMES,
+    ) -> None:
+        """Append a series of shape (frames,) or (frames, channels).
+
+        For dtype='int16', pass float values plus `scale`: stored = round(value / scale), and
+        readers multiply back by `scale`.
+        """
+        if self._closed:
+            raise AnalysisArtifactError("Writer is closed")
+        if name in self._series:
+            raise AnalysisArtifactError(f"Series '{name}' already written")
+        if dtype not in _DTYPES:
+            raise AnalysisArtifactError(f"Unsupported dtype '{dtype}' (use float32 or int16)")
+        arr = np.asarray(values)
+        if arr.ndim == 1:
+            arr = arr.reshape(-1, 1)
+        if arr.ndim != 2:
+            raise AnalysisArtifactError("Series must be 1-D or 2-D (frames, channels)")
+        if dtype == "int16" and scale:
+            arr = np.clip(np.rint(arr / scale), -32768, 32767)
+        arr = np.ascontiguousarray(arr, dtype=_DTYPES[dtype])
+        frames, channels = arr.shape
+        itemsize = _DTYPES[dtype].itemsize
+
+        chunks: list[dict[str, Any]] = []
+        step = max(1, int(chunk_frames))
+        for start in range(0, frames, step):
+            block = arr[start:start + step]
+            raw = block.tobytes()
+            if self._compress:
+                payload = zlib.compress(_shuffle_bytes(raw, itemsize), self._level)
+                codec, shuffle = "zlib", True
+                # Keep incompressible chunks raw so local readers can map them zero-copy
+                if len(payload) >= len(raw):
+                    payload, codec, shuffle = raw, "none", False
+            else:
+                payload, codec, shuffle = raw, "none", False
+            self._align()
+            offset = self._f.tell()
+            self._f.write(payload)
+            chunks.append({
+                "offset": offset,
+                "nbytes": len(payload),
+                "raw_nbytes": len(raw),
+                "start": start,
+                "frames": int(block.shape[0]),
+                "codec": codec,
+                "shuffle": shuffle,
+            })
+
+        self._series[name] = {
+            "dtype": dtype,
+            "sample_rate": float(sample_rate),
+            "channels": int(channels),
+            "length": int(frames),
+            "scale": float(scale) if scale else None,
+            "chunks": chunks,
+        }
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._align()
+        index_offset = self._f.tell()
+        index = json.dumps(
+            {"version": FORMAT_VERSION, "metadata": self._metadata, "series": self._series},
+            separators=(",", ":"),
+        ).encode("utf-8")
+        self._f.write(index)
+        self._f.seek(0)
+        self._f.write(PREAMBLE.pack(MAGIC, FORMAT_VERSION, 0, index_offset, len(index), 0, 0))
+        self._f.close()
+        self._closed = True
+
+
+class AnalysisArtifactReader:
+    """Memory-mapped reader for a local analysis artifact.
+
+    Only chunks overlapping the requested window are touched; raw (uncompressed) chunks are
+    returned as zero-copy views into the mapping.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._f = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._f.close()
+            raise
+        _version, index_offset, index_length = parse_preamble(self._mm[:PREAMBLE_SIZE])
+        if index_offset + index_length > len(self._mm):
+            self.close()
+            raise AnalysisArtifactError("Truncated analysis artifact index")
+        self.metadata, self.series = parse_index(self._mm[index_offset:index_offset + index_length])
+
+    def __enter__(self) -> "AnalysisArtifactReader":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def close(self) -> None:
+        try:
+            self._mm.close()
+        except BufferError:
+            # Zero-copy views are still alive; the mapping is released once they are collected
+            pass
+        finally:
+            self._f.close()
+
+    def _chunk_array(self, info: SeriesInfo, chunk: ChunkInfo) -> np.ndarray:
+        if chunk.codec == "none" and not chunk.shuffle:
+            dtype = _DTYPES[info.dtype]
+            return np.frombuffer(self._mm, dtype=dtype, count=chunk.frames * info.channels, offset=chunk.offset).reshape(
+                chunk.frames, info.channels
+            )
+        return decode_chunk(info, chunk, self._mm[chunk.offset:chunk.offset + chunk.nbytes])
+
+    def read(self, name: str, start_seconds: float = 0.0, end_seconds: Optional[float] = None) -> np.ndarray:
+        """Return frames of `name` within [start_seconds, end_seconds) as a (frames, channels) array.
+
+        int16 series stored with a scale are returned as float32 in original units.
+        """
+        info = self.series.get(name)
+        if info is None:
+            raise KeyError(name)
+        start, end = info.frame_range(start_seconds, end_seconds)
+        parts: list[np.ndarray] = []
+        for chunk in info.chunks_for_frames(start, end):
+            arr = self._chunk_array(info, chunk)
+            lo = max(start, chunk.start) - chunk.start
+            hi = min(end, chunk.start + chunk.frames) - chunk.start
+            parts.append(arr[lo:hi])
+        if not parts:
+            out = np.empty((0, info.channels), dtype=_DTYPES[info.dtype])
+        elif len(parts) == 1:
+            out = parts[0]
+        else:
+            out = np.concatenate(parts, axis=0)
+        if info.scale:
+            return out.astype(np.float32) * np.float32(info.scale)
+        return out
+
+    def byte_ranges(self, name: str, start_seconds: float = 0.0, end_seconds: Optional[float] = None) -> list[tuple[int, int]]:
+        """Inclusive (first, last) byte ranges a remote client must fetch for a time window."""
+        info = self.series[name]
+        start, end = info.frame_range(start_seconds, end_seconds)
+        return [(c.offset, c.offset + c.nbytes - 1) for c in info.chunks_for_frames(start, end)]
+
+
+def write_analysis_artifact(
+    path: str,
+    series: dict[str, tuple[Any, float]],
+    *,
+    metadata: Optional[dict[str, Any]] = None,
+) -> str:
+    """Convenience: write {name: (values, sample_rate)} as float32 series and return `path`."""
+    with AnalysisArtifactWriter(path, metadata=metadata) as writer:
+        for name, (values, sample_rate) in series.items():
+            writer.add_series(name, values, sample_rate=sample_rate)
+    return path
+
+
+def artifact_path_for(recording_path: str) -> str:
+    return os.path.join(os.path.dirname(recording_path), ARTIFACT_KEY_SUFFIX)
@@ -0,0 +1,178 @@
+"""Offline analyzers over stored screening artifacts.
+
+Pure NumPy/PyAV code with no Supabase access so it can run inside worker processes.
+"""
+
+import os
+import struct
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import numpy as np
+
+from app.services.analysis_artifacts import AnalysisArtifactWriter
+from app.services.audio_artifacts import decode_audio_to_wav
+
+
+ANALYZER_VERSION = "features/1"
+FEATURE_RATE_HZ = 100.0  # one feature frame per 10 ms
+BLOCK_SECONDS = 10.0
+
+_WAVE_FORMAT_PCM = 1
+_WAVE_FORMAT_IEEE_FLOAT = 3
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+@dataclass(frozen=True)
+class WavInfo:
+    sample_rate: int
+    channels: int
+    dtype: str
+    data_offset: int
+    frames: int
+
+
+def read_wav_info(path: str) -> WavInfo:
+    """Parse RIFF/WAVE chunk headers without reading sample data.
+
+    Streams written to a non-seekable output carry a 0 or 0xFFFFFFFF data size; those are
+    treated as "until end of file".
+    """
+    file_size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        riff, _size, wave = struct.unpack("<4sI4s", f.read(12))
+        if riff not in (b"RIFF", b"RF64") or wave != b"WAVE":
+            raise ValueError(f"Not a WAV file: {path}")
+        fmt: Optional[tuple[int, int, int, int]] = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError(f"WAV data chunk not found: {path}")
+            chunk_id, chunk_size = struct.unpack("<4sI", header)
+            if chunk_id == b"fmt ":
+                body = f.read(chunk_size)
+                tag, channels, sample_rate, _byte_rate, _align, bits = struct.unpack("<HHIIHH", body[:16])
+                if tag == _WAVE_FORMAT_EXTENSIBLE and len(body) >= 26:
+                    tag = struct.unpack("<H", body[24:26])[0]
+                fmt = (tag, channels, sample_rate, bits)
+                if chunk_size % 2:
+                    f.seek(1, os.SEEK_CUR)
+            elif chunk_id == b"data":
+                if fmt is None:
+                    raise ValueError(f"WAV fmt chunk missing before data: {path}")
+                tag, channels, sample_rate, bits = fmt
+                if tag == _WAVE_FORMAT_PCM and bits == 16:
+                    dtype = "<i2"
+                elif tag == _WAVE_FORMAT_PCM and bits == 32:
+                    dtype = "<i4"
+                elif tag == _WAVE_FORMAT_IEEE_FLOAT and bits == 32:
+                    dtype = "<f4"
+                else:
+                    raise ValueError(f"Unsupported WAV sample format tag={tag} bits={bits}")
+                data_offset = f.tell()
+                available = file_size - data_offset
+                data_size = available if chunk_size in (0, 0xFFFFFFFF) else min(chunk_size, available)
+                frame_bytes = np.dtype(dtype).itemsize * channels
+                return WavInfo(sample_rate, channels, dtype, data_offset, data_size // frame_bytes)
+            else:
+                f.seek(chunk_size + (chunk_size % 2), os.SEEK_CUR)
+
+
+def open_wav_memmap(path: str) -> tuple[np.memmap, WavInfo]:
+    """Map the WAV sample data as a read-only (frames, channels) array; nothing is loaded eagerly."""
+    info = read_wav_info(path)
+    samples = np.memmap(path, dtype=info.dtype, mode="r", offset=info.data_offset, shape=(info.frames, info.channels))
+    return samples, info
+
+
+def _to_float(block: np.ndarray) -> np.ndarray:
+    if block.dtype.kind == "f":
+        return block.astype(np.float32, copy=False)
+    scale = float(np.iinfo(block.dtype).max)
+    return block.astype(np.float32) / scale
+
+
+def compute_audio_features(samples: np.ndarray, sample_rate: int) -> dict[str, np.ndarray]:
+    """Per-10ms RMS level (dBFS), peak and zero-crossing rate of a (frames, channels) signal.
+
+    Walks the input in fixed blocks so a memory-mapped recording is paged in incrementally.
+    """
+    hop = max(1, int(round(sample_rate / FEATURE_RATE_HZ)))
+    block_frames = hop * max(1, int(BLOCK_SECONDS * FEATURE_RATE_HZ))
+    n_windows = samples.shape[0] // hop
+    rms_db = np.empty(n_windows, dtype=np.float32)
+    peak = np.empty(n_windows, dtype=np.float32)
+    zcr = np.empty(n_windows, dtype=np.float32)
+    w = 0
+    for start in range(0, n_windows * hop, block_frames):
+        block = _to_float(np.asarray(samples[start:min(start + block_frames, n_windows * hop)]))
+        mono = block.mean(axis=1) if block.ndim == 2 else block
+        windows = mono.reshape(-1, hop)
+        k = windows.shape[0]
+        rms = np.sqrt(np.mean(np.square(windows), axis=1))
+        rms_db[w:w + k] = 20.0 * np.log10(np.maximum(rms, 1e-6))
+        peak[w:w + k] = np.max(np.abs(windows), axis=1)
+        signs = np.signbit(windows)
+        zcr[w:w + k] = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / float(hop)
+        w += k
+    return {"audio_rms_dbfs": rms_db, "audio_peak": peak, "audio_zcr": zcr}
+
+
+def compute_video_features(path: str, *, sample_fps: float = 5.0) -> dict[str, np.ndarray]:
+    """Motion energy (mean absolute luma difference of downscaled frames) sampled at `sample_fps`."""
+    import av  # heavy; only needed when video analysis is requested
+
+    motion: list[float] = []
+    brightness: list[float] = []
+    prev: Optional[np.ndarray] = None
+    next_t = 0.0
+    with av.open(path) as container:
+        if not container.streams.video:
+            return {}
+        stream = container.streams.video[0]
+        stream.thread_type = "AUTO"
+        for frame in container.decode(stream):
+            t = float(frame.time or 0.0)
+            if t + 1e-6 < next_t:
+                continue
+            next_t = t + 1.0 / sample_fps
+            gray = frame.reformat(width=160, height=90, format="gray").to_ndarray().astype(np.float32)
+            brightness.append(float(gray.mean()))
+            motion.append(float(np.abs(gray - prev).mean()) if prev is not None else 0.0)
+            prev = gray
+    return {
+        "video_motion": np.asarray(motion, dtype=np.float32),
+        "video_brightness": np.asarray(brightness, dtype=np.float32),
+    }
+
+
+def analyze_session_artifacts(
+    *,
+    audio_path: Optional[str],
+    recording_path: Optional[str],
+    output_path: str,
+    metadata: Optional[dict[str, Any]] = None,
+    sample_fps: float = 5.0,
+) -> Optional[str]:
+    """Run all analyzers over local artifacts and write one analysis container to `output_path`."""
+    series: dict[str, tuple[np.ndarray, float]] = {}
+    if audio_path and not audio_path.lower().endswith(".wav"):
+        # FLAC/Opus artifacts are decoded once to PCM on local disk so they can be memory-mapped
+        audio_path = decode_audio_to_wav(audio_path, os.path.splitext(audio_path)[0] + ".decoded.wav")
+    if audio_path:
+        samples, info = open_wav_memmap(audio_path)
+        try:
+            for name, values in compute_audio_features(samples, info.sample_rate).items():
+                series[name] = (values, FEATURE_RATE_HZ)
+        finally:
+            del samples
+    if recording_path:
+        for name, values in compute_video_features(recording_path, sample_fps=sample_fps).items():
+            series[name] = (values, sample_fps)
+    if not series:
+        return None
+    meta = {"analyzer_version": ANALYZER_VERSION, **(metadata or {})}
+    with AnalysisArtifactWriter(output_path, metadata=meta) as writer:
+        for name, (values, rate) in series.items():
+            writer.add_series(name, values, sample_rate=rate)
+    return output_path
@@ -0,0 +1,240 @@
+import hashlib
+import io
+import logging
+import os
+from datetime import timedelta
+from typing import Callable, Optional
+
+from app.core.supabase_client import supabase
+from app.services.storage_bootstrap import get_recordings_bucket_name
+from app.services.upload_scheduler import acquire_upload_bandwidth, priority_for_key
+
+
+_log = logging.getLogger(__name__)
+
+# Content types by artifact extension; unknown extensions are uploaded as opaque binary
+_CONTENT_TYPES: dict[str, str] = {
+    ".mp4": "video/mp4",
+    ".mkv": "video/x-matroska",
+    ".webm": "video/webm",
+    ".wav": "audio/wav",
+    ".flac": "audio/flac",
+    ".opus": "audio/ogg; codecs=opus",
+    ".anqts": "application/vnd.anqa.timeseries",
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".m4s": "video/iso.segment",
+    ".json": "application/json",
+    ".jpg": "image/jpeg",
+    ".vtt": "text/vtt",
+}
+
+
+_HASH_CHUNK_BYTES = 1024 * 1024
+
+
+class _HashingReader(io.BufferedReader):
+    """BufferedReader that SHA-256 hashes the bytes as the storage client streams them.
+
+    Rewinding to the start resets the digest, so a client that re-reads the body still ends
+    up with the hash of exactly one copy of the file. An optional `throttle(nbytes)` is called
+    before each chunk is handed out (upload bandwidth scheduling), and `progress(bytes_read)` after.
+    """
+
+    def __init__(
+        self,
+        raw: io.RawIOBase,
+        throttle: Optional[Callable[[int], None]] = None,
+        progress: Optional[Callable[[int], None]] = None,
+    ) -> None:
+        super().__init__(raw, buffer_size=_HASH_CHUNK_BYTES)
+        self.sha256 = hashlib.sha256()
+        self.bytes_read = 0
+        self._throttle = throttle
+        self._progress = progress
+
+    def _update(self, data: bytes) -> None:
+        self.sha256.update(data)
+        self.bytes_read += len(data)
+        if self._progress and len(data):
+            self._progress(self.bytes_read)
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        pos = super().seek(offset, whence)
+        if pos == 0:
+            self.sha256 = hashlib.sha256()
+            self.bytes_read = 0
+        return pos
+
+    def _before_read(self, size: Optional[int]) -> None:
+        if self._throttle and size is not None and size > 0:
+            self._throttle(size)
+
+    def _after_read(self, size: Optional[int], n: int) -> None:
+        # Unbounded reads can only be accounted for once their length is known
+        if self._throttle and (size is None or size < 0) and n:
+            self._throttle(n)
+
+    def read(self, size: Optional[int] = -1) -> bytes:
+        self._before_read(size)
+        data = super().read(size)
+        self._after_read(size, len(data))
+        self._update(data)
+        return data
+
+    def read1(self, size: int = -1) -> bytes:
+        self._before_read(size)
+        data = super().read1(size)
+        self._after_read(size, len(data))
+        self._update(data)
+        return data
+
+    def readinto(self, b) -> int:
+        self._before_read(len(b))
+        n = super().readinto(b)
+        self._update(memoryview(b)[:n])
+        return n
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_BYTES), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def load_artifact_digests(session_id: str) -> dict[str, dict]:
+    """Stored {key: {"sha256", "bytes"}} of a screening's uploaded artifacts; {} when unknown."""
+    try:
+        rows = (
+            supabase.table("screenings")
+            .select("artifact_digests")
+            .eq("id", session_id)
+            .limit(1)
+            .execute()
+            .data
+            or []
+        )
+        return dict((rows[0] or {}).get("artifact_digests") or {}) if rows else {}
+    except Exception as e:
+        _log.warning("[storage][%s] loading artifact digests failed: %s", session_id, e)
+        return {}
+
+
+def session_key_base(session_id: str) -> str:
+    return f"sessions/{session_id}"
+
+
+def content_type_for_key(key: str) -> str:
+    _root, ext = os.path.splitext(key.lower())
+    return _CONTENT_TYPES.get(ext, "application/octet-stream")
+
+
+def _path_from_upload_response(res: object, key: str) -> str:
+    """Extract a path-like value from the various storage client response shapes; fallback to key."""
+    try:
+        if isinstance(res, dict):
+            return res.get("path") or res.get("Key") or res.get("fullPath") or res.get("name") or key
+        # Some clients return an HTTPX/Requests Response
+        if hasattr(res, "json"):
+            try:
+                j = res.json()  # type: ignore[attr-defined]
+                if isinstance(j, dict):
+                    return j.get("path") or j.get("Key") or j.get("fullPath") or j.get("name") or key
+            except Exception:
+                pass
+        # Some clients wrap data in a .data attribute
+        data_attr = getattr(res, "data", None)
+        if isinstance(data_attr, dict):
+            return data_attr.get("path") or data_attr.get("Key") or data_attr.get("fullPath") or data_attr.get("name") or key
+    except Exception:
+        pass
+    return key
+
+
+def upload_session_artifact(
+    session_id: str,
+    path: str,
+    key_suffix: str,
+    *,
+    digests: Optional[dict[str, dict]] = None,
+    progress: Optional[Callable[[str, int, int], None]] = None,
+) -> Optional[str]:
+    """Upload a local file to sessions/{session_id}/{key_suffix} in the recordings bucket.
+
+    With `digests` (as loaded by `load_artifact_digests`), the upload is skipped when the stored
+    object has the same size and SHA-256, and the entry for the key is updated after uploading.
+    The hash of an uploaded file is computed from the bytes streamed to storage, so a first
+    upload reads the file once. `progress(key, sent, total)` is called from the uploading thread
+    as the body is streamed (and once with sent == total for a skipped upload).
+
+    Returns the stored object key, or None if the local file is missing. Upload errors are raised.
+    """
+    if not path or not os.path.exists(path):
+        _log.info("[storage][%s] upload skipped (missing): %s", session_id, path)
+        return None
+    bucket = get_recordings_bucket_name()
+    key = f"{session_key_base(session_id)}/{key_suffix}"
+    size = os.path.getsize(path)
+    if digests is not None:
+        stored = digests.get(key) or {}
+        # Size is compared first so a changed file is not hashed twice
+        if stored.get("bytes") == size and stored.get("sha256") == file_sha256(path):
+            _log.info("[storage][%s] upload skipped (unchanged): %s", session_id, key)
+            if progress:
+                progress(key, size, size)
+            return key
+    priority = priority_for_key(key)
+
+    def _throttle(nbytes: int) -> None:
+        acquire_upload_bandwidth(session_id, nbytes, priority=priority)
+
+    def _progress(sent: int) -> None:
+        if progress:
+            progress(key, sent, size)
+
+    with _HashingReader(io.FileIO(path, "rb"), throttle=_throttle, progress=_progress) as f:
+        # storage3 merges file_options into request headers; the header name is 'content-type'.
+        # 'upsert' overwrites in place instead of a separate remove round trip.
+        file_options = {"content-type": content_type_for_key(key), "upsert": "true"}
+        try:
+            _log.info("[storage][%s] uploading %s bytes to %s/%s", session_id, size, bucket, key)
+            res = supabase.storage.from_(bucket).upload(key, f, file_options=file_options)
+            _log.info("[storage][%s] upload response: %s", session_id, res)
+        except Exception as e:
+            _log.error("[storage][%s] upload failed for %s: %s", session_id, key, e)
+            raise
+        if digests is not None and f.bytes_read == size:
+            digests[key] = {"sha256": f.sha256.hexdigest(), "bytes": size}
+    return _path_from_upload_response(res, key)
+
+
+def sign_artifact_url(key: Optional[str], expires_in: timedelta = timedelta(hours=1)) -> Optional[str]:
+    if not key:
+        return None
+    try:
+        signed = supabase.storage.from_(get_recordings_bucket_name()).create_signed_url(key, int(expires_in.total_seconds()))
+        return (signed or {}).get("signedURL") or (signed or {}).get("signed_url") or None
+    except Exception:
+        return None
+
+
+def sign_artifact_urls(keys: list[str], expires_in: timedelta = timedelta(hours=1)) -> dict[str, str]:
+    """Sign many keys in one Storage API call; keys that fail to sign are omitted."""
+    if not keys:
+        return {}
+    try:
+        items = supabase.storage.from_(get_recordings_bucket_name()).create_signed_urls(keys, int(expires_in.total_seconds()))
+    except Exception as e:
+        _log.warning("[storage] batch signing of %s keys failed: %s", len(keys), e)
+        return {}
+    signed: dict[str, str] = {}
+    for item in items or []:
+        url = (item or {}).get("signedURL") or (item or {}).get("signed_url")
+        if url and not (item or {}).get("error"):
+            signed[str(item.get("path"))] = url
+    return signed
+
+
+def download_artifact(key: str) -> bytes:
+    return supabase.storage.from_(get_recordings_bucket_name()).download(key)
@@ -0,0 +1,95 @@
+import logging
+import os
+import subprocess
+from typing import Optional
+
+import numpy as np
+
+
+_log = logging.getLogger(__name__)
+
+AUDIO_SAMPLE_RATE = 48000
+
+# codec -> file extension. FLAC is lossless (analysis fidelity), Opus is lossy and meant for
+# playback-only deployments, WAV keeps raw PCM.
+_CODECS: dict[str, str] = {"wav": ".wav", "flac": ".flac", "opus": ".opus"}
+
+
+def _encoder_args(codec: str) -> list[str]:
+    if codec == "flac":
+        return ["-acodec", "flac", "-sample_fmt", "s16", "-compression_level", "5"]
+    if codec == "opus":
+        return ["-acodec", "libopus", "-b:a", os.getenv("AUDIO_OPUS_BITRATE", "48k"), "-application", "voip"]
+    return ["-acodec", "pcm_s16le"]
+
+
+def audio_artifact_codec() -> str:
+    """Codec for the uploaded audio artifact from AUDIO_ARTIFACT_CODEC (wav|flac|opus), default flac."""
+    codec = (os.getenv("AUDIO_ARTIFACT_CODEC") or "flac").strip().lower()
+    if codec not in _CODECS:
+        _log.warning("Unknown AUDIO_ARTIFACT_CODEC=%s, falling back to flac", codec)
+        return "flac"
+    return codec
+
+
+def audio_artifact_suffix(codec: Optional[str] = None) -> str:
+    return f"audio{_CODECS[codec or audio_artifact_codec()]}"
+
+
+def extract_audio(input_path: str, codec: Optional[str] = None) -> str:
+    """Extract the first audio stream as mono 48 kHz in the configured codec.
+
+    Returns the output path next to the input, or '' if extraction failed.
+    """
+    codec = codec or audio_artifact_codec()
+    out_path = input_path.rsplit(".", 1)[0] + _CODECS[codec]
+    try:
+        subprocess.run(
+            ["ffmpeg", "-y", "-i", input_path, "-vn", *_encoder_args(codec), "-ar", str(AUDIO_SAMPLE_RATE), "-ac", "1", out_path],
+            check=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+    except Exception as e:
+        _log.warning("audio extraction (%s) failed for %s: %s", codec, input_path, e)
+        return ""
+    return out_path
+
+
+def native_sample_rate(path: str) -> int:
+    """Sample rate of the first audio stream via PyAV; 0 when unknown or unreadable."""
+    try:
+        import av
+
+        with av.open(path) as container:
+            for stream in container.streams.audio:
+                if stream.rate:
+                    return int(stream.rate)
+    except Exception:
+        pass
+    return 0
+
+
+def decode_audio(path: str, *, sample_rate: Optional[int] = AUDIO_SAMPLE_RATE, channels: int = 1) -> tuple[np.ndarray, int]:
+    """Decode any audio artifact (wav/flac/opus) into a float32 array of shape (frames, channels).
+
+    `sample_rate=None` keeps the stream's native rate, which is probed and returned. Loads the
+    whole signal; for long recordings prefer `decode_audio_to_wav` + memmap.
+    """
+    # When the native rate cannot be probed, resample so the returned rate is still the real one
+    rate = sample_rate or native_sample_rate(path) or AUDIO_SAMPLE_RATE
+    args = ["ffmpeg", "-v", "error", "-i", path, "-vn", "-f", "f32le", "-acodec", "pcm_f32le", "-ac", str(channels), "-ar", str(rate)]
+    proc = subprocess.run([*args, "pipe:1"], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    samples = np.frombuffer(proc.stdout, dtype="<f4").reshape(-1, channels)
+    return samples, int(rate)
+
+
+def decode_audio_to_wav(path: str, dest: str) -> str:
+    """Decode an audio artifact to 16-bit PCM WAV at `dest` so it can be memory-mapped."""
+    subprocess.run(
+        ["ffmpeg", "-v", "error", "-y", "-i", path, "-vn", "-acodec", "pcm_s16le", dest],
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+    )
+    return dest
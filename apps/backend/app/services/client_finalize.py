@@ -0,0 +1,153 @@
+"""Server-side assembly of client-ingested recordings.
+
+MediaRecorder timeslices are continuation fragments of one stream: only chunk 0 carries the
+container header (WebM EBML / MP4 init segment), so no chunk but the first plays on its own.
+At close the chunks are downloaded in index order, checked against the manifest's SHA-256 and
+joined byte for byte into a local file (`join_chunks`). A background job then remuxes it with
+a stream copy into sessions/{id}/recording.<ext> (`assemble_client_recording`); nothing is
+decoded, so the server cost stays at I/O.
+
+The derived artifacts of a WebRTC finalize (audio, analysis, waveform peaks, thumbnails) need
+a full decode and are only built when CLIENT_UPLOAD_DERIVED_ARTIFACTS is enabled.
+"""
+
+import hashlib
+import logging
+import os
+import subprocess
+from typing import Callable, Optional
+
+import requests
+
+from app.services.analysis_artifacts import ARTIFACT_KEY_SUFFIX as ANALYSIS_ARTIFACT_KEY_SUFFIX
+from app.services.analyzers import analyze_session_artifacts
+from app.services.artifact_storage import load_artifact_digests, sign_artifact_urls, upload_session_artifact
+from app.services.audio_artifacts import audio_artifact_codec, audio_artifact_suffix, extract_audio
+from app.services.client_ingest import chunk_key
+from app.services.derived_artifacts import (
+    PEAKS_KEY_SUFFIX,
+    THUMBNAILS_KEY_SUFFIX,
+    THUMBNAILS_VTT_KEY_SUFFIX,
+    write_thumbnail_sprite,
+    write_waveform_peaks,
+)
+from app.services.video_artifacts import stream_copy_args
+
+
+_log = logging.getLogger(__name__)
+
+_DOWNLOAD_CHUNK_BYTES = 1024 * 1024
+
+
+def derived_artifacts_enabled() -> bool:
+    return (os.getenv("CLIENT_UPLOAD_DERIVED_ARTIFACTS") or "").strip().lower() in ("1", "true", "yes")
+
+
+def join_chunks(session_id: str, extension: str, chunks: list[dict], dest: str) -> list[int]:
+    """Append the stored chunks to `dest` in index order, hashing each one on the way.
+
+    Returns the indices whose SHA-256 does not match the manifest entry (chunks without a
+    declared digest are not checked). Signing and download errors are raised.
+    """
+    ordered = sorted(chunks, key=lambda c: int(c["index"]))
+    keys = [chunk_key(session_id, int(c["index"]), extension) for c in ordered]
+    signed = sign_artifact_urls(keys)
+    mismatched: list[int] = []
+    with open(dest, "wb") as out:
+        for c, key in zip(ordered, keys):
+            url = signed.get(key)
+            if not url:
+                raise RuntimeError(f"Unable to sign {key}")
+            digest = hashlib.sha256()
+            with requests.get(url, stream=True, timeout=60) as resp:
+                resp.raise_for_status()
+                for block in resp.iter_content(chunk_size=_DOWNLOAD_CHUNK_BYTES):
+                    digest.update(block)
+                    out.write(block)
+            expected = c.get("sha256")
+            if expected and digest.hexdigest() != expected:
+                mismatched.append(int(c["index"]))
+    if mismatched:
+        _log.info("[storage][%s] chunk verification: sha256_mismatch=%s", session_id, mismatched[:20])
+    return mismatched
+
+
+def assemble_client_recording(
+    session_id: str,
+    extension: str,
+    joined_path: str,
+    work_dir: str,
+    *,
+    progress: Optional[Callable[[str, int, int], None]] = None,
+) -> dict:
+    """Remux joined chunks into the session's recording and upload it (blocking; run in a thread).
+
+    Returns the screenings columns to write (storage_* keys and artifact_digests). Remux and
+    recording upload errors are raised; failures of the optional derived artifacts are logged
+    and skipped. `progress` is passed to the uploads. Files are written under `work_dir`,
+    which the caller removes.
+    """
+    recording_suffix = f"recording{extension}"
+    recording_path = os.path.join(work_dir, recording_suffix)
+    subprocess.run(
+        stream_copy_args(joined_path, recording_path),
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+    )
+    os.remove(joined_path)
+
+    digests = load_artifact_digests(session_id)
+    keys: dict[str, Optional[str]] = {
+        "storage_recording_key": upload_session_artifact(
+            session_id, recording_path, recording_suffix, digests=digests, progress=progress
+        ),
+    }
+    if derived_artifacts_enabled():
+        try:
+            # Fills `keys` as it goes, so artifacts uploaded before a failure are kept
+            _derived_artifacts(session_id, recording_path, work_dir, digests, progress, keys)
+        except Exception as e:
+            _log.warning("[webrtc][%s] client derived artifacts failed: %s", session_id, e)
+    return {**keys, "artifact_digests": digests}
+
+
+def _derived_artifacts(
+    session_id: str,
+    recording_path: str,
+    work_dir: str,
+    digests: dict[str, dict],
+    progress: Optional[Callable[[str, int, int], None]],
+    keys: dict[str, Optional[str]],
+) -> None:
+    """Build and upload audio, analysis, peaks and thumbnails as in a WebRTC finalize."""
+    audio_codec = audio_artifact_codec()
+    audio_path = extract_audio(recording_path, audio_codec)
+    analysis_path: Optional[str] = None
+    if audio_path:
+        try:
+            analysis_path = analyze_session_artifacts(
+                audio_path=audio_path,
+                recording_path=None,
+                output_path=os.path.join(work_dir, ANALYSIS_ARTIFACT_KEY_SUFFIX),
+                metadata={"session_id": session_id},
+            )
+        except Exception as e:
+            _log.warning("[webrtc][%s] client analysis failed: %s", session_id, e)
+    peaks_path = write_waveform_peaks(audio_path, os.path.join(work_dir, PEAKS_KEY_SUFFIX)) if audio_path else ""
+    sprite_path = os.path.join(work_dir, THUMBNAILS_KEY_SUFFIX)
+    vtt_path = os.path.join(work_dir, THUMBNAILS_VTT_KEY_SUFFIX)
+    has_sprite = write_thumbnail_sprite(recording_path, sprite_path, vtt_path)
+
+    def _upload(path: str, key_suffix: str) -> Optional[str]:
+        return upload_session_artifact(session_id, path, key_suffix, digests=digests, progress=progress)
+
+    if audio_path:
+        keys["storage_audio_key"] = _upload(audio_path, audio_artifact_suffix(audio_codec))
+    if analysis_path:
+        keys["storage_analysis_key"] = _upload(analysis_path, ANALYSIS_ARTIFACT_KEY_SUFFIX)
+    if peaks_path:
+        keys["storage_peaks_key"] = _upload(peaks_path, PEAKS_KEY_SUFFIX)
+    if has_sprite:
+        keys["storage_thumbnails_key"] = _upload(sprite_path, THUMBNAILS_KEY_SUFFIX)
+        keys["storage_thumbnails_vtt_key"] = _upload(vtt_path, THUMBNAILS_VTT_KEY_SUFFIX)
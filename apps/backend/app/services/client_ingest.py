@@ -0,0 +1,161 @@
+"""Client-side recording ingestion.
+
+Sessions that need no live server analysis are recorded by the browser's MediaRecorder and
+uploaded straight to the recordings bucket as numbered chunks under
+sessions/{session_id}/chunks/. The server signs upload targets and, at close, checks the
+stored objects against the client's chunk manifest; `client_finalize` then joins them into
+sessions/{session_id}/recording.<ext> in the background and the chunks are removed. Uploads
+never pass through the API.
+
+Storage uploads are atomic, so a chunk object either exists completely or not at all. A client
+that lost the response to an upload may retry with a fresh target; a "duplicate" rejection
+means the earlier attempt was stored.
+"""
+
+import logging
+import os
+import re
+from typing import Optional
+
+from app.core.supabase_client import supabase
+from app.services.artifact_storage import session_key_base
+from app.services.storage_bootstrap import get_recordings_bucket_name
+
+
+_log = logging.getLogger(__name__)
+
+INGEST_MODE_CLIENT = "client"
+CHUNKS_DIRNAME = "chunks"
+
+# Container types browsers' MediaRecorder produce, by chunk file extension
+_CHUNK_EXTENSIONS: dict[str, str] = {
+    "video/webm": ".webm",
+    "video/mp4": ".mp4",
+    "video/x-matroska": ".mkv",
+}
+
+_SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+_LIST_PAGE_SIZE = 1000
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(1, int(os.getenv(name, str(default))))
+    except ValueError:
+        return default
+
+
+def max_chunks() -> int:
+    return _env_int("CLIENT_UPLOAD_MAX_CHUNKS", 3600)
+
+
+def max_chunk_bytes() -> int:
+    return _env_int("CLIENT_UPLOAD_MAX_CHUNK_BYTES", 50 * 1024 * 1024)
+
+
+def chunk_extension(mime_type: str) -> Optional[str]:
+    """File extension for a MediaRecorder mime type (codec parameters ignored); None if unsupported."""
+    base = (mime_type or "").split(";", 1)[0].strip().lower()
+    return _CHUNK_EXTENSIONS.get(base)
+
+
+def chunks_prefix(session_id: str) -> str:
+    return f"{session_key_base(session_id)}/{CHUNKS_DIRNAME}"
+
+
+def chunk_key(session_id: str, index: int, extension: str) -> str:
+    # Zero padded so storage listings sort in playback order
+    return f"{chunks_prefix(session_id)}/{index:06d}{extension}"
+
+
+def create_chunk_upload_targets(session_id: str, extension: str, indices: list[int]) -> list[dict]:
+    """Signed single-object upload targets for the given chunk indices.
+
+    Each target is {"index", "key", "signed_url", "token"}; the client PUTs the chunk body to
+    `signed_url`. Signing errors are raised.
+    """
+    bucket = supabase.storage.from_(get_recordings_bucket_name())
+    targets: list[dict] = []
+    for index in indices:
+        key = chunk_key(session_id, index, extension)
+        signed = bucket.create_signed_upload_url(key)
+        targets.append({"index": index, "key": key, "signed_url": signed["signed_url"], "token": signed["token"]})
+    return targets
+
+
+def validate_manifest(chunks: list[dict]) -> Optional[str]:
+    """Problem with a client chunk manifest, or None when it is well formed.
+
+    Chunks must be numbered 0..n-1 without gaps or duplicates, each within the size limit.
+    """
+    if not chunks:
+        return "manifest has no chunks"
+    if len(chunks) > max_chunks():
+        return f"manifest exceeds {max_chunks()} chunks"
+    indices = sorted(int(c["index"]) for c in chunks)
+    if indices != list(range(len(chunks))):
+        return "chunk indices must be 0..n-1 without gaps or duplicates"
+    limit = max_chunk_bytes()
+    for c in chunks:
+        if not 0 < int(c["bytes"]) <= limit:
+            return f"chunk {c['index']} size must be between 1 and {limit} bytes"
+        sha = c.get("sha256")
+        if sha is not None and not _SHA256_RE.match(str(sha)):
+            return f"chunk {c['index']} sha256 must be 64 lowercase hex characters"
+    return None
+
+
+def _stored_chunk_sizes(session_id: str) -> dict[str, int]:
+    """Object name -> size of everything stored under the session's chunk prefix."""
+    bucket = supabase.storage.from_(get_recordings_bucket_name())
+    sizes: dict[str, int] = {}
+    offset = 0
+    while True:
+        page = bucket.list(
+            chunks_prefix(session_id),
+            {"limit": _LIST_PAGE_SIZE, "offset": offset, "sortBy": {"column": "name", "order": "asc"}},
+        ) or []
+        for item in page:
+            metadata = (item or {}).get("metadata") or {}
+            if item.get("name") and metadata.get("size") is not None:
+                sizes[str(item["name"])] = int(metadata["size"])
+        if len(page) < _LIST_PAGE_SIZE:
+            return sizes
+        offset += _LIST_PAGE_SIZE
+
+
+def verify_stored_chunks(session_id: str, extension: str, chunks: list[dict]) -> dict[str, list[int]]:
+    """Compare a validated manifest with the chunk objects in storage.
+
+    Returns {"missing": [...], "size_mismatch": [...]} chunk indices; both empty when every chunk
+    is stored with the declared size. Listing errors are raised.
+    """
+    stored = _stored_chunk_sizes(session_id)
+    missing: list[int] = []
+    mismatched: list[int] = []
+    for c in sorted(chunks, key=lambda c: int(c["index"])):
+        index = int(c["index"])
+        size = stored.get(os.path.basename(chunk_key(session_id, index, extension)))
+        if size is None:
+            missing.append(index)
+        elif size != int(c["bytes"]):
+            mismatched.append(index)
+    if missing or mismatched:
+        _log.info("[storage][%s] chunk verification: missing=%s size_mismatch=%s", session_id, missing[:20], mismatched[:20])
+    return {"missing": missing, "size_mismatch": mismatched}
+
+
+def delete_stored_chunks(session_id: str) -> int:
+    """Remove every object under the session's chunk prefix; returns how many were removed.
+
+    Called once the joined recording is stored and the screening row points at it. Storage
+    errors are raised.
+    """
+    names = list(_stored_chunk_sizes(session_id))
+    bucket = supabase.storage.from_(get_recordings_bucket_name())
+    prefix = chunks_prefix(session_id)
+    for start in range(0, len(names), _LIST_PAGE_SIZE):
+        bucket.remove([f"{prefix}/{name}" for name in names[start:start + _LIST_PAGE_SIZE]])
+    if names:
+        _log.info("[storage][%s] removed %s uploaded chunks", session_id, len(names))
+    return len(names)
@@ -0,0 +1,192 @@
+"""Small derived artifacts for the screening review timeline.
+
+- peaks.json: multi-resolution min/max waveform peaks (int8, base64) computed with NumPy
+- thumbnails.jpg + thumbnails.vtt: a single sprite sheet of evenly spaced video frames and a
+  WebVTT index whose cues point at `thumbnails.jpg#xywh=x,y,w,h`. A relative reference from a
+  signed storage URL would not carry the token, so the VTT is served through the API with the
+  sprite reference rewritten to a signed URL (`rewrite_thumbnail_vtt`)
+
+Together they are a few KB to a few tens of KB, so the UI can draw a timeline without
+downloading the recording.
+"""
+
+import base64
+import json
+import logging
+import math
+import os
+import subprocess
+from typing import Optional
+
+import numpy as np
+
+from app.services.analyzers import open_wav_memmap
+from app.services.audio_artifacts import decode_audio_to_wav
+
+
+_log = logging.getLogger(__name__)
+
+PEAKS_KEY_SUFFIX = "peaks.json"
+THUMBNAILS_KEY_SUFFIX = "thumbnails.jpg"
+THUMBNAILS_VTT_KEY_SUFFIX = "thumbnails.vtt"
+
+# Peak counts per level, finest last; each level divides the next so coarser levels are exact
+# reductions of the finest one
+PEAK_LEVELS = (200, 800, 3200)
+_BLOCK_PEAKS = 256
+
+SPRITE_COLUMNS = 10
+SPRITE_ROWS = 10
+THUMB_WIDTH = 160
+MIN_THUMB_INTERVAL_SECONDS = 2.0
+
+
+def _finest_peaks(samples: np.ndarray, samples_per_peak: int, n_peaks: int) -> tuple[np.ndarray, np.ndarray]:
+    mins = np.zeros(n_peaks, dtype=np.float32)
+    maxs = np.zeros(n_peaks, dtype=np.float32)
+    total = samples.shape[0]
+    scale = float(np.iinfo(samples.dtype).max) if samples.dtype.kind == "i" else 1.0
+    for p0 in range(0, n_peaks, _BLOCK_PEAKS):
+        p1 = min(n_peaks, p0 + _BLOCK_PEAKS)
+        s0, s1 = p0 * samples_per_peak, min(total, p1 * samples_per_peak)
+        if s0 >= s1:
+            break
+        block = np.asarray(samples[s0:s1], dtype=np.float32)
+        mono = block.mean(axis=1) if block.ndim == 2 else block
+        pad = (-mono.shape[0]) % samples_per_peak
+        if pad:
+            mono = np.concatenate([mono, np.zeros(pad, dtype=np.float32)])
+        windows = mono.reshape(-1, samples_per_peak) / scale
+        k = windows.shape[0]
+        mins[p0:p0 + k] = windows.min(axis=1)
+        maxs[p0:p0 + k] = windows.max(axis=1)
+    return mins, maxs
+
+
+def compute_waveform_peaks(wav_path: str) -> dict:
+    """Return the peaks document for a PCM WAV (memory-mapped, read block by block)."""
+    samples, info = open_wav_memmap(wav_path)
+    finest = PEAK_LEVELS[-1]
+    samples_per_peak = max(1, math.ceil(info.frames / finest))
+    mins, maxs = _finest_peaks(samples, samples_per_peak, finest)
+    del samples
+    levels = []
+    for points in PEAK_LEVELS:
+        factor = finest // points
+        lo = mins.reshape(points, factor).min(axis=1)
+        hi = maxs.reshape(points, factor).max(axis=1)
+        pairs = np.empty(points * 2, dtype=np.int8)
+        pairs[0::2] = np.clip(np.round(lo * 127), -128, 127)
+        pairs[1::2] = np.clip(np.round(hi * 127), -128, 127)
+        levels.append({
+            "points": points,
+            "samples_per_peak": samples_per_peak * factor,
+            # Interleaved [min0, max0, min1, max1, ...] as int8, base64 encoded
+            "data": base64.b64encode(pairs.tobytes()).decode("ascii"),
+        })
+    return {
+        "version": 1,
+        "sample_rate": info.sample_rate,
+        "duration": info.frames / float(info.sample_rate) if info.sample_rate else 0.0,
+        "bits": 8,
+        "levels": levels,
+    }
+
+
+def write_waveform_peaks(audio_path: str, out_path: str) -> str:
+    """Write peaks.json for any audio artifact; returns '' on failure."""
+    tmp_wav = ""
+    try:
+        wav_path = audio_path
+        if not audio_path.lower().endswith(".wav"):
+            tmp_wav = os.path.splitext(audio_path)[0] + ".peaks.wav"
+            wav_path = decode_audio_to_wav(audio_path, tmp_wav)
+        doc = compute_waveform_peaks(wav_path)
+        with open(out_path, "w", encoding="utf-8") as f:
+            json.dump(doc, f, separators=(",", ":"))
+        return out_path
+    except Exception as e:
+        _log.warning("waveform peaks failed for %s: %s", audio_path, e)
+        return ""
+    finally:
+        if tmp_wav and os.path.exists(tmp_wav):
+            os.remove(tmp_wav)
+
+
+def _video_geometry(path: str) -> Optional[tuple[float, int, int]]:
+    import av  # PyAV is already a runtime dependency via aiortc
+
+    with av.open(path) as container:
+        if not container.streams.video:
+            return None
+        stream = container.streams.video[0]
+        duration = float(container.duration) / av.time_base if container.duration else 0.0
+        if not duration and stream.duration and stream.time_base:
+            duration = float(stream.duration * stream.time_base)
+        return duration, int(stream.codec_context.width or 0), int(stream.codec_context.height or 0)
+
+
+def _vtt_timestamp(seconds: float) -> str:
+    ms = int(round(seconds * 1000))
+    h, rem = divmod(ms, 3_600_000)
+    m, rem = divmod(rem, 60_000)
+    s, ms = divmod(rem, 1000)
+    return f"{h:02d}:{m:02d}:{s:02d}.{ms:03d}"
+
+
+def write_thumbnail_sprite(video_path: str, sprite_path: str, vtt_path: str) -> bool:
+    """Sample up to SPRITE_COLUMNS x SPRITE_ROWS frames into one JPEG sprite plus a WebVTT index."""
+    try:
+        geometry = _video_geometry(video_path)
+        if not geometry:
+            return False
+        duration, width, height = geometry
+        if duration <= 0 or width <= 0 or height <= 0:
+            return False
+        capacity = SPRITE_COLUMNS * SPRITE_ROWS
+        interval = max(MIN_THUMB_INTERVAL_SECONDS, duration / capacity)
+        count = min(capacity, max(1, math.ceil(duration / interval)))
+        thumb_h = max(2, int(round(THUMB_WIDTH * height / width / 2)) * 2)
+        rows = math.ceil(count / SPRITE_COLUMNS)
+        subprocess.run(
+            [
+                "ffmpeg",
+                "-y",
+                "-i",
+                video_path,
+                "-an",
+                "-vf", f"fps=1/{interval:.3f},scale={THUMB_WIDTH}:{thumb_h},tile={SPRITE_COLUMNS}x{rows}",
+                "-frames:v", "1",
+                "-q:v", "5",
+                sprite_path,
+            ],
+            check=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        sprite_name = os.path.basename(sprite_path)
+        lines = ["WEBVTT", ""]
+        for i in range(count):
+            start = i * interval
+            end = min(duration, (i + 1) * interval)
+            x, y = (i % SPRITE_COLUMNS) * THUMB_WIDTH, (i // SPRITE_COLUMNS) * thumb_h
+            lines += [
+                f"{_vtt_timestamp(start)} --> {_vtt_timestamp(end)}",
+                f"{sprite_name}#xywh={x},{y},{THUMB_WIDTH},{thumb_h}",
+                "",
+            ]
+        with open(vtt_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines))
+        return True
+    except Exception as e:
+        _log.warning("thumbnail sprite failed for %s: %s", video_path, e)
+        return False
+
+
+def rewrite_thumbnail_vtt(text: str, sprite_url: str) -> str:
+    """Point the cues of a stored thumbnails.vtt at `sprite_url` (keeping each #xywh fragment)."""
+    prefix = f"{THUMBNAILS_KEY_SUFFIX}#"
+    return "\n".join(
+        sprite_url + line[len(THUMBNAILS_KEY_SUFFIX):] if line.startswith(prefix) else line
+        for line in text.split("\n")
+    )
@@ -0,0 +1,20 @@
+import os
+from functools import lru_cache
+
+
+_TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "email_templates")
+
+
+@lru_cache(maxsize=None)
+def load_template(name: str) -> str:
+    """HTML of an email template; read from disk once per process."""
+    with open(os.path.join(_TEMPLATES_DIR, name), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def preload_templates() -> int:
+    """Read every template into the cache (startup warm-up); returns how many were loaded."""
+    names = sorted(n for n in os.listdir(_TEMPLATES_DIR) if n.endswith(".html"))
+    for name in names:
+        load_template(name)
+    return len(names)
@@ -0,0 +1,128 @@
+"""In-process hub for screening finalize progress events.
+
+Finalization publishes phase events (stopping, transcoding, uploading, done, failed) per
+session, and the progress endpoint streams them to subscribers as server-sent events. Each
+session's latest event is replayed to late subscribers, and a finished session's channel is
+kept for a while so a client that connects right after /close still sees "done".
+
+`publish_progress` may be called from worker threads (upload streams): delivery is always
+handed to the event loop the channel was opened on, in publish order.
+"""
+
+import asyncio
+import json
+import time
+from typing import AsyncIterator, Optional
+
+
+TERMINAL_PHASES = ("done", "failed")
+
+# Finished channels stay around for late subscribers
+_RETAIN_SECONDS = 300.0
+_QUEUE_SIZE = 64
+
+
+class _Channel:
+    def __init__(self, user_id: Optional[str], loop: asyncio.AbstractEventLoop) -> None:
+        self.user_id = user_id
+        self.loop = loop
+        self.last: Optional[dict] = None
+        self.subscribers: set[asyncio.Queue] = set()
+        self.finished_at: Optional[float] = None
+
+
+_channels: dict[str, _Channel] = {}
+
+
+def _prune() -> None:
+    now = time.monotonic()
+    for sid in [sid for sid, ch in _channels.items() if ch.finished_at and now - ch.finished_at > _RETAIN_SECONDS]:
+        _channels.pop(sid, None)
+
+
+def open_progress(session_id: str, user_id: Optional[str]) -> None:
+    """Start (or restart) the progress channel of a session; call from the event loop."""
+    _prune()
+    channel = _channels.get(session_id)
+    if channel is None:
+        channel = _Channel(user_id, asyncio.get_running_loop())
+        _channels[session_id] = channel
+    channel.user_id = user_id or channel.user_id
+    if channel.finished_at is not None:
+        # A new recording under the same session id: drop the previous run's "done"
+        channel.last = None
+        channel.finished_at = None
+
+
+def progress_owner(session_id: str) -> Optional[str]:
+    channel = _channels.get(session_id)
+    return channel.user_id if channel else None
+
+
+def last_progress(session_id: str) -> Optional[dict]:
+    channel = _channels.get(session_id)
+    return channel.last if channel else None
+
+
+def _deliver(channel: _Channel, event: dict) -> None:
+    channel.last = event
+    if event["phase"] in TERMINAL_PHASES:
+        channel.finished_at = time.monotonic()
+    for queue in channel.subscribers:
+        if queue.full():
+            # Progress is cumulative, so a slow subscriber only needs the newest events
+            queue.get_nowait()
+        queue.put_nowait(event)
+
+
+def publish_progress(session_id: str, phase: str, **data: object) -> None:
+    """Publish an event for a session with an open channel; a no-op otherwise."""
+    channel = _channels.get(session_id)
+    if channel is None:
+        return
+    event = {"phase": phase, "ts": round(time.time(), 3), **data}
+    try:
+        # Always via the loop's ready queue, so events from threads and the loop stay in order
+        channel.loop.call_soon_threadsafe(_deliver, channel, event)
+    except RuntimeError:
+        # Loop already closed (shutdown)
+        pass
+
+
+async def progress_events(session_id: str, *, heartbeat_seconds: float = 15.0) -> AsyncIterator[Optional[dict]]:
+    """Events of a session, starting with the latest one; None is yielded as a keep-alive.
+
+    Ends after a terminal event.
+    """
+    channel = _channels.get(session_id)
+    if channel is None:
+        channel = _Channel(None, asyncio.get_running_loop())
+        _channels[session_id] = channel
+    queue: asyncio.Queue = asyncio.Queue(maxsize=_QUEUE_SIZE)
+    channel.subscribers.add(queue)
+    try:
+        if channel.last is not None:
+            yield channel.last
+            if channel.last["phase"] in TERMINAL_PHASES:
+                return
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), heartbeat_seconds)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            yield event
+            if event["phase"] in TERMINAL_PHASES:
+                return
+    finally:
+        channel.subscribers.discard(queue)
+        if not channel.subscribers and channel.last is None and channel.user_id is None:
+            # Subscriber-only channel that never saw a finalize
+            _channels.pop(session_id, None)
+
+
+def format_sse(event: Optional[dict]) -> str:
+    """Server-sent event frame; a comment line for keep-alives."""
+    if event is None:
+        return ": keep-alive\n\n"
+    return f"event: {event['phase']}\ndata: {json.dumps(event, separators=(',', ':'))}\n\n"
@@ -0,0 +1,247 @@
+"""Fragmented-MP4 HLS packaging of screening recordings.
+
+At finalize the browser-ready MP4 is split into short fMP4 segments (a stream-copied "main"
+rendition plus a low-bitrate "low" rendition) under sessions/{id}/hls/. Playlists are served
+through the API, which rewrites segment URIs to short-lived signed storage URLs, so playback
+start and seek only ever fetch a few seconds of media regardless of recording length.
+"""
+
+import hashlib
+import hmac
+import json
+import logging
+import os
+import re
+import subprocess
+import time
+from typing import Callable, Optional
+
+from app.services.artifact_storage import upload_session_artifact
+
+
+_log = logging.getLogger(__name__)
+
+HLS_DIRNAME = "hls"
+MASTER_PLAYLIST = "master.m3u8"
+MEDIA_PLAYLIST = "index.m3u8"
+
+_PATH_PART_RE = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+
+def hls_enabled() -> bool:
+    return (os.getenv("WEBRTC_HLS_ENABLED") or "").strip().lower() in ("1", "true", "yes")
+
+
+def hls_segment_seconds() -> int:
+    try:
+        return max(1, int(os.getenv("HLS_SEGMENT_SECONDS", "4")))
+    except ValueError:
+        return 4
+
+
+def keyframe_args() -> list[str]:
+    """Extra encoder args that place a keyframe at every segment boundary (used by the MP4 transcode)."""
+    return ["-force_key_frames", f"expr:gte(t,n_forced*{hls_segment_seconds()})"]
+
+
+def _segment_rendition(input_path: str, out_dir: str, codec_args: list[str]) -> str:
+    os.makedirs(out_dir, exist_ok=True)
+    playlist = os.path.join(out_dir, MEDIA_PLAYLIST)
+    subprocess.run(
+        [
+            "ffmpeg",
+            "-y",
+            "-i",
+            input_path,
+            "-map", "0:v:0?", "-map", "0:a:0?",
+            *codec_args,
+            "-f", "hls",
+            "-hls_time", str(hls_segment_seconds()),
+            "-hls_playlist_type", "vod",
+            "-hls_segment_type", "fmp4",
+            "-hls_fmp4_init_filename", "init.mp4",
+            "-hls_segment_filename", os.path.join(out_dir, "seg_%05d.m4s"),
+            playlist,
+        ],
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    return playlist
+
+
+def _bandwidths(playlist_path: str) -> tuple[int, int]:
+    """(peak, average) bits per second measured from segment sizes and EXTINF durations."""
+    base = os.path.dirname(playlist_path)
+    peak = 0
+    total_bits = 0
+    total_seconds = 0.0
+    duration: Optional[float] = None
+    with open(playlist_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("#EXTINF:"):
+                duration = float(line[len("#EXTINF:"):].split(",", 1)[0] or 0)
+            elif line and not line.startswith("#") and duration:
+                bits = os.path.getsize(os.path.join(base, line)) * 8
+                peak = max(peak, int(bits / duration))
+                total_bits += bits
+                total_seconds += duration
+                duration = None
+    average = int(total_bits / total_seconds) if total_seconds else peak
+    return max(peak, 1), max(average, 1)
+
+
+def package_hls(mp4_path: str, out_dir: str) -> Optional[str]:
+    """Package `mp4_path` (H.264/AAC with keyframes at segment boundaries) into HLS under `out_dir`.
+
+    Returns the master playlist path, or None if packaging failed.
+    """
+    renditions = [
+        # Stream copy: no re-encode for the full-quality rendition
+        ("main", ["-c", "copy"]),
+        (
+            "low",
+            [
+                "-c:v", "libx264",
+                "-preset", os.getenv("FFMPEG_PRESET", "veryfast"),
+                "-vf", "scale=-2:360",
+                "-b:v", os.getenv("HLS_LOW_VIDEO_BITRATE", "400k"),
+                "-maxrate", os.getenv("HLS_LOW_VIDEO_BITRATE", "400k"),
+                "-bufsize", "800k",
+                "-pix_fmt", "yuv420p",
+                *keyframe_args(),
+                "-c:a", "aac", "-b:a", "64k", "-ac", "1",
+            ],
+        ),
+    ]
+    variants: list[tuple[str, int, int]] = []
+    for name, codec_args in renditions:
+        try:
+            playlist = _segment_rendition(mp4_path, os.path.join(out_dir, name), codec_args)
+            peak, average = _bandwidths(playlist)
+            variants.append((name, peak, average))
+        except Exception as e:
+            _log.warning("hls rendition '%s' failed for %s: %s", name, mp4_path, e)
+    if not variants:
+        return None
+    master = os.path.join(out_dir, MASTER_PLAYLIST)
+    lines = ["#EXTM3U", "#EXT-X-VERSION:7", "#EXT-X-INDEPENDENT-SEGMENTS"]
+    # Lowest bandwidth first so players start on the cheap rendition and switch up
+    for name, peak, average in sorted(variants, key=lambda v: v[1]):
+        lines.append(f"#EXT-X-STREAM-INF:BANDWIDTH={peak},AVERAGE-BANDWIDTH={average}")
+        lines.append(f"{name}/{MEDIA_PLAYLIST}")
+    with open(master, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    return master
+
+
+def upload_hls(
+    session_id: str,
+    out_dir: str,
+    *,
+    digests: Optional[dict[str, dict]] = None,
+    progress: Optional[Callable[[str, int, int], None]] = None,
+) -> Optional[str]:
+    """Upload every file under `out_dir` to sessions/{id}/hls/...; returns the master playlist key."""
+    master_key: Optional[str] = None
+    for root, _dirs, files in os.walk(out_dir):
+        # Segments first, playlists last: a visible playlist never references a missing segment
+        for name in sorted(files, key=lambda n: n.endswith(".m3u8")):
+            path = os.path.join(root, name)
+            rel = os.path.relpath(path, out_dir).replace(os.sep, "/")
+            key = upload_session_artifact(session_id, path, f"{HLS_DIRNAME}/{rel}", digests=digests, progress=progress)
+            if rel == MASTER_PLAYLIST:
+                master_key = key
+    return master_key
+
+
+# --- Signed playlist access -------------------------------------------------
+
+
+def _signing_secret() -> bytes:
+    secret = os.getenv("ARTIFACT_URL_SECRET") or os.getenv("SUPABASE_JWT_SECRET") or os.getenv("JWT_SECRET") or ""
+    if not secret:
+        raise RuntimeError("ARTIFACT_URL_SECRET (or SUPABASE_JWT_SECRET) is required to sign playlist URLs")
+    # A purpose-bound sub-key: a playlist signature can never double as a token signature
+    return hmac.new(secret.encode("utf-8"), b"anqa:hls-playlist", hashlib.sha256).digest()
+
+
+def hls_version(digests: dict[str, dict]) -> str:
+    """Short fingerprint of a screening's stored HLS objects (from artifact_digests).
+
+    Carried (signed) in playlist URLs, so a re-finalized screening gets new URLs and playlist
+    caches keyed by it never serve the previous segment list.
+    """
+    entries = sorted(
+        (key, str((entry or {}).get("sha256") or ""))
+        for key, entry in (digests or {}).items()
+        if f"/{HLS_DIRNAME}/" in key
+    )
+    if not entries:
+        return ""
+    return hashlib.sha256(json.dumps(entries).encode("utf-8")).hexdigest()[:16]
+
+
+def _playlist_signature(screening_id: str, version: str, expires: int) -> str:
+    message = f"{screening_id}:{version}:{expires}".encode("utf-8")
+    return hmac.new(_signing_secret(), message, hashlib.sha256).hexdigest()
+
+
+def sign_playlist_access(screening_id: str, ttl_seconds: int = 3600, version: str = "") -> tuple[int, str]:
+    """Return (expires, sig) granting access to every playlist of one screening until `expires`."""
+    expires = int(time.time()) + ttl_seconds
+    return expires, _playlist_signature(screening_id, version, expires)
+
+
+def verify_playlist_access(screening_id: str, expires: int, sig: str, version: str = "") -> bool:
+    if expires < int(time.time()):
+        return False
+    return hmac.compare_digest(_playlist_signature(screening_id, version, expires), sig or "")
+
+
+def playlist_query(expires: int, sig: str, version: str = "") -> str:
+    return f"expires={expires}&sig={sig}" + (f"&v={version}" if version else "")
+
+
+def playlist_path(screening_id: str, name: str = MASTER_PLAYLIST, ttl_seconds: int = 3600, version: str = "") -> str:
+    expires, sig = sign_playlist_access(screening_id, ttl_seconds, version)
+    return f"/screenings/{screening_id}/hls/{name}?{playlist_query(expires, sig, version)}"
+
+
+def is_safe_playlist_name(name: str) -> bool:
+    parts = name.split("/")
+    return name.endswith(".m3u8") and len(parts) <= 2 and all(p and p != ".." and _PATH_PART_RE.match(p) for p in parts)
+
+
+def playlist_segment_uris(text: str) -> list[str]:
+    """Relative URIs of media segments and init segments referenced by a playlist."""
+    uris: list[str] = []
+    for line in text.splitlines():
+        stripped = line.strip()
+        if stripped.startswith("#EXT-X-MAP:"):
+            m = re.search(r'URI="([^"]+)"', stripped)
+            if m:
+                uris.append(m.group(1))
+        elif stripped and not stripped.startswith("#") and not stripped.endswith(".m3u8"):
+            uris.append(stripped)
+    return uris
+
+
+def rewrite_playlist(text: str, *, query: str, sign_segment: Callable[[str], str]) -> str:
+    """Rewrite playlist URIs for signed delivery.
+
+    Nested playlists keep their relative path and inherit the caller's `query` (expires/sig);
+    media segments and EXT-X-MAP init segments are mapped through `sign_segment(relative_uri)`.
+    """
+    out: list[str] = []
+    for line in text.splitlines():
+        stripped = line.strip()
+        if stripped.startswith("#EXT-X-MAP:"):
+            m = re.search(r'URI="([^"]+)"', stripped)
+            if m:
+                line = stripped.replace(m.group(0), f'URI="{sign_segment(m.group(1))}"')
+        elif stripped and not stripped.startswith("#"):
+            line = f"{stripped}?{query}" if stripped.endswith(".m3u8") else sign_segment(stripped)
+        out.append(line)
+    return "\n".join(out) + "\n"
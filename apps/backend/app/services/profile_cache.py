@@ -0,0 +1,119 @@
+"""Short-lived cache of `profiles` rows used for role checks.
+
+Every account/admin request used to start with a profiles select just to learn the caller's
+role. Rows are now cached per user for PROFILE_CACHE_TTL_SECONDS (default 60). Writes made
+through our own endpoints update or invalidate the entry, so only changes made elsewhere
+(SQL console, dashboard) can be up to one TTL late. Admin writes and the admin user list
+re-check the caller's role in the database regardless.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from app.core.async_db import get_async_db
+from app.core.supabase_client import supabase
+
+
+_log = logging.getLogger(__name__)
+
+PROFILE_COLUMNS = "id, role, prototype_enabled, deleted"
+DEFAULT_ROLE = "patient"
+PRIVILEGED_ROLES = ("admin", "moderator")
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return max(0.0, float(os.getenv(name, str(default))))
+    except ValueError:
+        return default
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(0, int(os.getenv(name, str(default))))
+    except ValueError:
+        return default
+
+
+_TTL_SECONDS = _env_float("PROFILE_CACHE_TTL_SECONDS", 60.0)
+_MAX_ENTRIES = _env_int("PROFILE_CACHE_SIZE", 4096)
+
+# user id -> (monotonic expiry, row)
+_cache: "OrderedDict[str, tuple[float, dict]]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def _cached(user_id: str) -> Optional[dict]:
+    with _lock:
+        entry = _cache.get(user_id)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            _cache.pop(user_id, None)
+            return None
+        _cache.move_to_end(user_id)
+        return entry[1]
+
+
+def remember_profile(user_id: str, row: dict) -> None:
+    """Cache the full profile row of a user (partial writes should invalidate instead)."""
+    if not _TTL_SECONDS or not _MAX_ENTRIES:
+        return
+    with _lock:
+        _cache[user_id] = (time.monotonic() + _TTL_SECONDS, {**row, "id": user_id})
+        _cache.move_to_end(user_id)
+        while len(_cache) > _MAX_ENTRIES:
+            _cache.popitem(last=False)
+
+
+def invalidate_profile(user_id: str) -> None:
+    with _lock:
+        _cache.pop(user_id, None)
+
+
+def get_profile(user_id: str) -> Optional[dict]:
+    """Profile row of a user (cached); None if it does not exist or could not be read."""
+    row = _cached(user_id)
+    if row is not None:
+        return row
+    try:
+        resp = supabase.table("profiles").select(PROFILE_COLUMNS).eq("id", user_id).limit(1).execute()
+        rows = getattr(resp, "data", None) or []
+    except Exception as e:
+        _log.warning("[profiles][%s] lookup failed: %s", user_id, e)
+        return None
+    if not rows or not isinstance(rows[0], dict):
+        return None
+    row = rows[0]
+    remember_profile(user_id, row)
+    return row
+
+
+async def get_profile_async(user_id: str) -> Optional[dict]:
+    """get_profile() for async handlers: a cache miss is read without a worker thread."""
+    row = _cached(user_id)
+    if row is not None:
+        return row
+    try:
+        rows = await get_async_db().table("profiles").select(PROFILE_COLUMNS).eq("id", user_id).limit(1).execute()
+    except Exception as e:
+        _log.warning("[profiles][%s] lookup failed: %s", user_id, e)
+        return None
+    if not rows or not isinstance(rows[0], dict):
+        return None
+    row = rows[0]
+    remember_profile(user_id, row)
+    return row
+
+
+def get_role(user_id: str) -> str:
+    row = get_profile(user_id) or {}
+    return str(row.get("role") or DEFAULT_ROLE).lower()
+
+
+def is_privileged(user_id: str) -> bool:
+    return get_role(user_id) in PRIVILEGED_ROLES
@@ -1,29 +1,265 @@
+"""Sliding-window-counter rate limiting with pluggable storage.
+
+Each (key, window) keeps two counters, the current and the previous fixed window, instead of
+every event timestamp. The count over the sliding window is estimated as
+`previous * (1 - elapsed fraction of current window) + current`, which is O(1) in time and
+memory per key and never under-counts a burst at a window boundary by more than the decayed
+share of the previous window.
+
+Backends (RATE_LIMIT_BACKEND):
+
+- memory:   per process; the default for a single uvicorn worker
+- sqlite:   a file shared by all workers on one host (RATE_LIMIT_SQLITE_PATH, default
+            ~/.cache/anqa/ratelimit.sqlite3 in a private directory); picked by
+            default when WEB_CONCURRENCY > 1
+- postgres: the rate_limit_hit() SQL function, shared by every instance
+
+Keys idle for two windows hold no information and are evicted by a background task
+(RATE_LIMIT_EVICT_INTERVAL_SECONDS). A failing shared backend fails open with a warning:
+rate limits protect email and signup endpoints, they must not take them down.
+"""
+
+import abc
+import asyncio
+import logging
+import math
+import os
+import sqlite3
+import threading
 import time
-from typing import Dict, Tuple
+from typing import Optional
 
 
-class SlidingWindowRateLimiter:
-    """Naive in-memory sliding window limiter keyed by (key, window_seconds).
+_log = logging.getLogger(__name__)
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return max(0.0, float(os.getenv(name, str(default))))
+    except ValueError:
+        return default
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(0, int(os.getenv(name, str(default))))
+    except ValueError:
+        return default
+
+
+def _slide(window_index: int, prev: int, curr: int, now_index: int) -> tuple[int, int]:
+    """Counters (previous, current) as of window `now_index`."""
+    if window_index == now_index:
+        return prev, curr
+    if window_index == now_index - 1:
+        return curr, 0
+    return 0, 0
+
 
-    Good enough for a single-process backend. For multi-instance deployments,
-    replace with Redis or a DB-backed counter.
-    """
+def _admit(prev: int, curr: int, fraction: float, max_events: int) -> bool:
+    return prev * (1.0 - fraction) + curr + 1 <= max_events
+
+
+class RateLimitBackend(abc.ABC):
+    # Whether hit() may block (I/O, cross-process locks); async callers then use a thread
+    blocking = True
+
+    @abc.abstractmethod
+    def hit(self, key: str, max_events: int, window_seconds: int, now: float) -> bool:
+        """Count one event for `key` unless that would exceed the limit; True if admitted."""
+
+    @abc.abstractmethod
+    def evict_idle(self, now: float) -> int:
+        """Drop keys whose counters have decayed to zero; returns how many were removed."""
+
+
+class MemoryBackend(RateLimitBackend):
+    blocking = False
 
     def __init__(self) -> None:
-        self._events: Dict[Tuple[str, int], list[float]] = {}
+        # (key, window_seconds) -> (window index, previous count, current count)
+        self._counters: dict[tuple[str, int], tuple[int, int, int]] = {}
+        self._lock = threading.Lock()
 
-    def allow(self, key: str, max_events: int, window_seconds: int) -> bool:
-        now = time.time()
+    def __len__(self) -> int:
+        return len(self._counters)
+
+    def hit(self, key: str, max_events: int, window_seconds: int, now: float) -> bool:
+        index, offset = divmod(now, window_seconds)
+        index = int(index)
         k = (key, window_seconds)
-        arr = self._events.get(k, [])
-        # drop old
-        cutoff = now - window_seconds
-        arr = [ts for ts in arr if ts >= cutoff]
-        if len(arr) >= max_events:
-            self._events[k] = arr
+        with self._lock:
+            entry = self._counters.get(k)
+            prev, curr = _slide(*entry, index) if entry else (0, 0)
+            admitted = _admit(prev, curr, offset / window_seconds, max_events)
+            self._counters[k] = (index, prev, curr + 1 if admitted else curr)
+            return admitted
+
+    def evict_idle(self, now: float) -> int:
+        with self._lock:
+            idle = [k for k, (index, _, _) in self._counters.items() if index < int(now // k[1]) - 1]
+            for k in idle:
+                del self._counters[k]
+        return len(idle)
+
+
+class SqliteBackend(RateLimitBackend):
+    """Counters in a local SQLite file; each check is one IMMEDIATE transaction across processes."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "create table if not exists rate_limit_counters ("
+                " key text not null, window_seconds integer not null, window_index integer not null,"
+                " prev_count integer not null, curr_count integer not null,"
+                " primary key (key, window_seconds)) without rowid"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("pragma journal_mode=wal")
+            conn.execute("pragma synchronous=normal")
+            self._local.conn = conn
+        return conn
+
+    def hit(self, key: str, max_events: int, window_seconds: int, now: float) -> bool:
+        index, offset = divmod(now, window_seconds)
+        index = int(index)
+        conn = self._connect()
+        conn.execute("begin immediate")
+        try:
+            row = conn.execute(
+                "select window_index, prev_count, curr_count from rate_limit_counters where key = ? and window_seconds = ?",
+                (key, window_seconds),
+            ).fetchone()
+            prev, curr = _slide(*row, index) if row else (0, 0)
+            admitted = _admit(prev, curr, offset / window_seconds, max_events)
+            conn.execute(
+                "insert or replace into rate_limit_counters values (?, ?, ?, ?, ?)",
+                (key, window_seconds, index, prev, curr + 1 if admitted else curr),
+            )
+            conn.execute("commit")
+            return admitted
+        except BaseException:
+            conn.execute("rollback")
+            raise
+
+    def evict_idle(self, now: float) -> int:
+        cur = self._connect().execute(
+            "delete from rate_limit_counters where window_index < cast(? / window_seconds as integer) - 1", (now,)
+        )
+        return cur.rowcount
+
+
+class PostgresBackend(RateLimitBackend):
+    """Counters in public.rate_limit_counters; the database clock decides the window."""
+
+    def hit(self, key: str, max_events: int, window_seconds: int, now: float) -> bool:
+        from app.core.supabase_client import supabase
+
+        resp = supabase.rpc(
+            "rate_limit_hit", {"p_key": key, "p_max_events": max_events, "p_window_seconds": window_seconds}
+        ).execute()
+        return bool(getattr(resp, "data", None))
+
+    def evict_idle(self, now: float) -> int:
+        from app.core.supabase_client import supabase
+
+        resp = supabase.rpc("rate_limit_evict", {}).execute()
+        return int(getattr(resp, "data", None) or 0)
+
+
+class SlidingWindowRateLimiter:
+    def __init__(self, backend: Optional[RateLimitBackend] = None, *, evict_interval_seconds: float = 300.0) -> None:
+        self.backend = backend or MemoryBackend()
+        self.evict_interval = evict_interval_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    def allow(self, key: str, max_events: int, window_seconds: int) -> bool:
+        if max_events <= 0:
             return False
-        arr.append(now)
-        self._events[k] = arr
-        return True
+        try:
+            return self.backend.hit(key, max_events, max(1, int(math.ceil(window_seconds))), time.time())
+        except Exception as e:
+            _log.warning("[ratelimit] %s failed, allowing %s: %s", type(self.backend).__name__, key, e)
+            return True
+
+    def evict_idle(self) -> int:
+        try:
+            return self.backend.evict_idle(time.time())
+        except Exception as e:
+            _log.warning("[ratelimit] eviction failed: %s", e)
+            return 0
+
+    def start(self) -> None:
+        """Start idle-key eviction on the running event loop."""
+        if not self.evict_interval or (self._task is not None and not self._task.done()):
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.evict_interval)
+            removed = await asyncio.to_thread(self.evict_idle)
+            if removed:
+                _log.debug("[ratelimit] evicted %s idle keys", removed)
+
+
+def _default_sqlite_path() -> str:
+    # Not the shared temp dir: any local user could pre-create the file and reset the counters
+    cache_home = os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "anqa", "ratelimit.sqlite3")
+
+
+def _ensure_private(path: str) -> None:
+    """Create the database directory (0700) and refuse a directory or file other users can write."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    for candidate in (directory, path):
+        try:
+            st = os.stat(candidate)
+        except FileNotFoundError:
+            continue
+        if (hasattr(os, "geteuid") and st.st_uid != os.geteuid()) or st.st_mode & 0o022:
+            raise PermissionError(f"{candidate} is not owned by this user or is writable by others")
+
+
+def _default_backend() -> RateLimitBackend:
+    name = (os.getenv("RATE_LIMIT_BACKEND") or "").strip().lower()
+    if not name:
+        # Several workers on one host must share counters to enforce the limits
+        name = "sqlite" if _env_int("WEB_CONCURRENCY", 1) > 1 else "memory"
+    if name == "postgres":
+        return PostgresBackend()
+    if name == "sqlite":
+        path = os.getenv("RATE_LIMIT_SQLITE_PATH") or _default_sqlite_path()
+        try:
+            _ensure_private(path)
+            return SqliteBackend(path)
+        except Exception as e:
+            _log.warning("[ratelimit] cannot open %s, using in-process counters: %s", path, e)
+    elif name != "memory":
+        _log.warning("[ratelimit] unknown RATE_LIMIT_BACKEND %r, using in-process counters", name)
+    return MemoryBackend()
+
+
+_limiter = SlidingWindowRateLimiter(
+    _default_backend(), evict_interval_seconds=_env_float("RATE_LIMIT_EVICT_INTERVAL_SECONDS", 300.0)
+)
 
 
+def get_rate_limiter() -> SlidingWindowRateLimiter:
+    return _limiter
@@ -0,0 +1,267 @@
+"""Batch re-analysis of stored screening recordings.
+
+Lists completed screenings, streams their artifacts into a local cache, runs the analyzers in
+a process pool (one worker per core by default) and uploads a fresh analysis artifact per
+screening. Finished screenings are appended to a checkpoint file so interrupted runs resume.
+
+    python -m app.services.reanalysis --cache-dir /var/cache/anqa-reanalysis
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Iterator, Optional
+
+import requests
+
+from app.core.supabase_client import supabase
+from app.services.analysis_artifacts import ARTIFACT_KEY_SUFFIX
+from app.services.analyzers import ANALYZER_VERSION, analyze_session_artifacts
+from app.services.artifact_storage import load_artifact_digests, sign_artifact_url, upload_session_artifact
+
+
+_log = logging.getLogger(__name__)
+
+CHECKPOINT_FILENAME = "checkpoint.jsonl"
+_DOWNLOAD_CHUNK_BYTES = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class ReanalysisTask:
+    session_id: str
+    work_dir: str
+    audio_path: Optional[str]
+    recording_path: Optional[str]
+
+    @property
+    def output_path(self) -> str:
+        return os.path.join(self.work_dir, ARTIFACT_KEY_SUFFIX)
+
+
+class Checkpoint:
+    """Append-only JSONL record of screenings already re-analyzed with a given analyzer version."""
+
+    def __init__(self, path: str, analyzer_version: str) -> None:
+        self.path = path
+        self.analyzer_version = analyzer_version
+        self._lock = threading.Lock()
+        self._done: set[str] = set()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line from an interrupted run
+                    if entry.get("analyzer_version") == analyzer_version and entry.get("status") == "done":
+                        self._done.add(str(entry.get("session_id")))
+
+    def is_done(self, session_id: str) -> bool:
+        return session_id in self._done
+
+    def mark(self, session_id: str, status: str, **extra: object) -> None:
+        entry = {
+            "session_id": session_id,
+            "status": status,
+            "analyzer_version": self.analyzer_version,
+            "at": datetime.now(timezone.utc).isoformat(),
+            **extra,
+        }
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            if status == "done":
+                self._done.add(session_id)
+
+
+def list_screenings(*, page_size: int = 500, since: Optional[str] = None, limit: Optional[int] = None) -> Iterator[dict]:
+    """Yield completed screenings with stored artifacts, oldest first, paging through PostgREST."""
+    offset = 0
+    yielded = 0
+    while True:
+        q = (
+            supabase.table("screenings")
+            .select("id, started_at, storage_audio_key, storage_recording_key")
+            .eq("status", "completed")
+            .order("started_at", desc=False)
+        )
+        if since:
+            q = q.gte("started_at", since)
+        rows = q.range(offset, offset + page_size - 1).execute().data or []
+        for row in rows:
+            if not (row.get("storage_audio_key") or row.get("storage_recording_key")):
+                continue
+            yield row
+            yielded += 1
+            if limit is not None and yielded >= limit:
+                return
+        if len(rows) < page_size:
+            return
+        offset += page_size
+
+
+def _download(key: str, dest: str) -> str:
+    """Stream an object to `dest` via a signed URL; reuses a complete cached copy."""
+    url = sign_artifact_url(key)
+    if not url:
+        raise RuntimeError(f"Unable to sign {key}")
+    with requests.get(url, stream=True, timeout=60) as resp:
+        resp.raise_for_status()
+        expected = int(resp.headers.get("content-length") or -1)
+        if expected >= 0 and os.path.exists(dest) and os.path.getsize(dest) == expected:
+            return dest
+        tmp = dest + ".part"
+        with open(tmp, "wb") as f:
+            for chunk in resp.iter_content(chunk_size=_DOWNLOAD_CHUNK_BYTES):
+                f.write(chunk)
+    os.replace(tmp, dest)
+    return dest
+
+
+def fetch_artifacts(row: dict, cache_dir: str, *, include_video: bool) -> ReanalysisTask:
+    session_id = str(row["id"])
+    work_dir = os.path.join(cache_dir, session_id)
+    os.makedirs(work_dir, exist_ok=True)
+    audio_key = row.get("storage_audio_key")
+    recording_key = row.get("storage_recording_key") if include_video else None
+    audio_path = _download(audio_key, os.path.join(work_dir, os.path.basename(audio_key))) if audio_key else None
+    recording_path = (
+        _download(recording_key, os.path.join(work_dir, os.path.basename(recording_key))) if recording_key else None
+    )
+    return ReanalysisTask(session_id=session_id, work_dir=work_dir, audio_path=audio_path, recording_path=recording_path)
+
+
+def _process(task: ReanalysisTask) -> Optional[str]:
+    # Runs in a worker process: analyzers only, no storage or DB access
+    return analyze_session_artifacts(
+        audio_path=task.audio_path,
+        recording_path=task.recording_path,
+        output_path=task.output_path,
+        metadata={"session_id": task.session_id},
+    )
+
+
+def _publish(task: ReanalysisTask, output_path: Optional[str]) -> Optional[str]:
+    if not output_path:
+        return None
+    # Unchanged analyzer output (same bytes as already stored) is not re-uploaded
+    digests = load_artifact_digests(task.session_id)
+    key = upload_session_artifact(task.session_id, output_path, ARTIFACT_KEY_SUFFIX, digests=digests)
+    supabase.table("screenings").update({"storage_analysis_key": key, "artifact_digests": digests}).eq("id", task.session_id).execute()
+    return key
+
+
+def run_reanalysis(
+    cache_dir: str,
+    *,
+    workers: Optional[int] = None,
+    download_workers: int = 8,
+    since: Optional[str] = None,
+    limit: Optional[int] = None,
+    include_video: bool = False,
+    keep_cache: bool = False,
+) -> dict:
+    """Re-analyze all matching screenings; returns counts by outcome."""
+    os.makedirs(cache_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    checkpoint = Checkpoint(os.path.join(cache_dir, CHECKPOINT_FILENAME), ANALYZER_VERSION)
+    counts = {"done": 0, "skipped": 0, "failed": 0}
+    # Keep enough fetched work queued to never starve the pool, without filling the disk
+    max_ready = workers * 2
+
+    def _pending_rows() -> Iterator[dict]:
+        for row in list_screenings(since=since, limit=limit):
+            if checkpoint.is_done(str(row["id"])):
+                counts["skipped"] += 1
+                continue
+            yield row
+
+    rows = _pending_rows()
+    fetching: dict[Future, str] = {}
+    processing: dict[Future, ReanalysisTask] = {}
+    publishing: dict[Future, ReanalysisTask] = {}
+
+    def _fail(session_id: str, err: BaseException) -> None:
+        _log.warning("[reanalysis][%s] failed: %s", session_id, err)
+        checkpoint.mark(session_id, "failed", error=str(err))
+        counts["failed"] += 1
+
+    with ThreadPoolExecutor(max_workers=download_workers) as io_pool, ProcessPoolExecutor(max_workers=workers) as cpu_pool:
+        exhausted = False
+        while True:
+            while not exhausted and len(fetching) + len(processing) < max_ready:
+                row = next(rows, None)
+                if row is None:
+                    exhausted = True
+                    break
+                fetching[io_pool.submit(fetch_artifacts, row, cache_dir, include_video=include_video)] = str(row["id"])
+            pending = set(fetching) | set(processing) | set(publishing)
+            if not pending:
+                break
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                if fut in fetching:
+                    session_id = fetching.pop(fut)
+                    try:
+                        task = fut.result()
+                    except Exception as e:
+                        _fail(session_id, e)
+                        continue
+                    processing[cpu_pool.submit(_process, task)] = task
+                elif fut in processing:
+                    task = processing.pop(fut)
+                    try:
+                        output_path = fut.result()
+                    except Exception as e:
+                        _fail(task.session_id, e)
+                        continue
+                    publishing[io_pool.submit(_publish, task, output_path)] = task
+                else:
+                    task = publishing.pop(fut)
+                    try:
+                        key = fut.result()
+                    except Exception as e:
+                        _fail(task.session_id, e)
+                        continue
+                    checkpoint.mark(task.session_id, "done", storage_analysis_key=key)
+                    counts["done"] += 1
+                    _log.info("[reanalysis][%s] done key=%s (%s done)", task.session_id, key, counts["done"])
+                    if not keep_cache:
+                        shutil.rmtree(task.work_dir, ignore_errors=True)
+    return counts
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Re-run analyzers over stored screening recordings.")
+    parser.add_argument("--cache-dir", default=os.getenv("REANALYSIS_CACHE_DIR", "/tmp/anqa-reanalysis"))
+    parser.add_argument("--workers", type=int, default=None, help="Analyzer processes (default: all cores)")
+    parser.add_argument("--download-workers", type=int, default=8)
+    parser.add_argument("--since", default=None, help="Only screenings started at or after this ISO timestamp")
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--include-video", action="store_true", help="Also download and analyze recording video")
+    parser.add_argument("--keep-cache", action="store_true", help="Keep downloaded artifacts after upload")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    counts = run_reanalysis(
+        args.cache_dir,
+        workers=args.workers,
+        download_workers=args.download_workers,
+        since=args.since,
+        limit=args.limit,
+        include_video=args.include_video,
+        keep_cache=args.keep_cache,
+    )
+    print(json.dumps({"analyzer_version": ANALYZER_VERSION, **counts}))
+
+
+if __name__ == "__main__":
+    main()
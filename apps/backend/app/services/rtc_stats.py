@@ -0,0 +1,226 @@
+"""Periodic RTCPeerConnection stats sampling for screening sessions.
+
+Every few seconds a sampler calls `pc.getStats()` and reduces the inbound RTP and transport
+stats to per-interval deltas (bitrate, packets lost, loss %, jitter, frames decoded). The
+per-interval values become analysis time series, a compact summary is stored on the screening
+row, and process-wide totals are exported in Prometheus text format.
+
+aiortc exposes no RTT or dropped-frame counters for a receive-only peer, so those are not
+collected; frames decoded are counted from the session's own video pipeline.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Callable, Optional
+
+import numpy as np
+
+
+_log = logging.getLogger(__name__)
+
+# RTP clock rates used to convert aiortc's jitter (timestamp units) to milliseconds
+_CLOCK_RATES = {"audio": 48000.0, "video": 90000.0}
+
+# Process-wide counters for the metrics endpoint
+_totals: dict[str, float] = {
+    "bytes_received": 0.0,
+    "packets_received_audio": 0.0,
+    "packets_received_video": 0.0,
+    "packets_lost_audio": 0.0,
+    "packets_lost_video": 0.0,
+    "frames_decoded": 0.0,
+    "samples": 0.0,
+    "sample_errors": 0.0,
+}
+_live: dict[str, "RtcStatsSampler"] = {}
+
+
+def stats_interval_seconds() -> float:
+    try:
+        return max(1.0, float(os.getenv("WEBRTC_STATS_INTERVAL_SECONDS", "5")))
+    except ValueError:
+        return 5.0
+
+
+def _summarize(values: list[float]) -> Optional[dict[str, float]]:
+    if not values:
+        return None
+    arr = np.asarray(values, dtype=np.float64)
+    return {
+        "avg": round(float(arr.mean()), 3),
+        "min": round(float(arr.min()), 3),
+        "p5": round(float(np.percentile(arr, 5)), 3),
+        "p95": round(float(np.percentile(arr, 95)), 3),
+        "max": round(float(arr.max()), 3),
+    }
+
+
+class RtcStatsSampler:
+    """Samples one session's peer connection; survives peer connection swaps on reconnect."""
+
+    def __init__(
+        self,
+        session_id: str,
+        *,
+        interval: Optional[float] = None,
+        frames_decoded: Optional[Callable[[], int]] = None,
+    ) -> None:
+        self.session_id = session_id
+        self.interval = interval or stats_interval_seconds()
+        self.series: dict[str, list[float]] = {}
+        self.reconnects = 0
+        self._frames_decoded = frames_decoded
+        self._pc = None
+        self._prev: dict[str, float] = {}
+        self._prev_frames = 0
+        self._last_t: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self._totals = {"packets_received": {"audio": 0, "video": 0}, "packets_lost": {"audio": 0, "video": 0}, "bytes_received": 0}
+
+    def attach(self, pc) -> None:
+        if self._pc is not None and pc is not self._pc:
+            self.reconnects += 1
+        self._pc = pc
+        # Counters restart with a new connection; stat ids differ so deltas start fresh
+        self._prev = {}
+
+    def start(self) -> None:
+        if self._task is None:
+            _live[self.session_id] = self
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        _live.pop(self.session_id, None)
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sample_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                _totals["sample_errors"] += 1
+                _log.debug("[rtc-stats][%s] sample failed: %s", self.session_id, e)
+
+    def _delta(self, key: str, value: float, *, monotonic: bool = True) -> float:
+        prev = self._prev.get(key)
+        self._prev[key] = value
+        if prev is None:
+            # First sample of a stream: the whole value is new
+            return value
+        if value < prev:
+            # Byte and packet-received counters only drop on a reset. packetsLost also goes down
+            # when late or duplicate packets arrive, which is no loss in this interval.
+            return value if monotonic else 0
+        return value - prev
+
+    def _append(self, name: str, value: float) -> None:
+        self.series.setdefault(name, []).append(round(float(value), 3))
+
+    async def sample_once(self) -> None:
+        pc = self._pc
+        if pc is None or pc.connectionState in ("closed", "failed"):
+            return
+        report = await pc.getStats()
+        now = time.monotonic()
+        dt = (now - self._last_t) if self._last_t is not None else self.interval
+        self._last_t = now
+        bytes_delta = 0.0
+        per_kind: dict[str, dict[str, float]] = {}
+        for stat in report.values():
+            if stat.type == "transport":
+                bytes_delta += self._delta(f"{stat.id}:bytes", stat.bytesReceived)
+            elif stat.type == "inbound-rtp":
+                kind = stat.kind
+                received = self._delta(f"{stat.id}:recv", stat.packetsReceived)
+                lost = self._delta(f"{stat.id}:lost", max(0, stat.packetsLost), monotonic=False)
+                agg = per_kind.setdefault(kind, {"received": 0.0, "lost": 0.0, "jitter_ms": 0.0})
+                agg["received"] += received
+                agg["lost"] += lost
+                agg["jitter_ms"] = max(agg["jitter_ms"], 1000.0 * stat.jitter / _CLOCK_RATES.get(kind, 90000.0))
+        self._append("rtc_bitrate_kbps", bytes_delta * 8 / 1000.0 / max(dt, 1e-3))
+        self._totals["bytes_received"] += int(bytes_delta)
+        _totals["bytes_received"] += bytes_delta
+        for kind, agg in per_kind.items():
+            total = agg["received"] + agg["lost"]
+            self._append(f"rtc_loss_pct_{kind}", 100.0 * agg["lost"] / total if total else 0.0)
+            self._append(f"rtc_jitter_ms_{kind}", agg["jitter_ms"])
+            self._totals["packets_received"][kind] = self._totals["packets_received"].get(kind, 0) + int(agg["received"])
+            self._totals["packets_lost"][kind] = self._totals["packets_lost"].get(kind, 0) + int(agg["lost"])
+            _totals[f"packets_received_{kind}"] = _totals.get(f"packets_received_{kind}", 0.0) + agg["received"]
+            _totals[f"packets_lost_{kind}"] = _totals.get(f"packets_lost_{kind}", 0.0) + agg["lost"]
+        if self._frames_decoded is not None:
+            frames = self._frames_decoded()
+            decoded = max(0, frames - self._prev_frames)
+            self._prev_frames = frames
+            self._append("rtc_video_fps", decoded / max(dt, 1e-3))
+            _totals["frames_decoded"] += decoded
+        _totals["samples"] += 1
+
+    def summary(self) -> dict:
+        """Compact aggregates for the screenings.rtc_stats column."""
+        return {
+            "interval_s": self.interval,
+            "samples": len(self.series.get("rtc_bitrate_kbps", [])),
+            "reconnects": self.reconnects,
+            "bytes_received": self._totals["bytes_received"],
+            "packets_received": self._totals["packets_received"],
+            "packets_lost": self._totals["packets_lost"],
+            "frames_decoded": self._prev_frames if self._frames_decoded is not None else None,
+            "bitrate_kbps": _summarize(self.series.get("rtc_bitrate_kbps", [])),
+            "video_fps": _summarize(self.series.get("rtc_video_fps", [])),
+            "loss_pct": {kind: _summarize(self.series.get(f"rtc_loss_pct_{kind}", [])) for kind in ("audio", "video")},
+            "jitter_ms": {kind: _summarize(self.series.get(f"rtc_jitter_ms_{kind}", [])) for kind in ("audio", "video")},
+        }
+
+    def analysis_series(self) -> dict[str, tuple[list[float], float]]:
+        rate = 1.0 / self.interval
+        return {name: (values, rate) for name, values in self.series.items() if values}
+
+
+def render_prometheus() -> str:
+    """Process-wide WebRTC stats in Prometheus text exposition format."""
+    lines = [
+        "# HELP anqa_webrtc_live_sessions Sessions with an active stats sampler.",
+        "# TYPE anqa_webrtc_live_sessions gauge",
+        f"anqa_webrtc_live_sessions {len(_live)}",
+        "# HELP anqa_webrtc_bytes_received_total Media bytes received over all sessions.",
+        "# TYPE anqa_webrtc_bytes_received_total counter",
+        f"anqa_webrtc_bytes_received_total {_totals['bytes_received']:.0f}",
+        "# HELP anqa_webrtc_packets_received_total Inbound RTP packets received.",
+        "# TYPE anqa_webrtc_packets_received_total counter",
+    ]
+    for kind in ("audio", "video"):
+        lines.append(f'anqa_webrtc_packets_received_total{{kind="{kind}"}} {_totals.get(f"packets_received_{kind}", 0.0):.0f}')
+    lines += [
+        "# HELP anqa_webrtc_packets_lost_total Inbound RTP packets reported lost.",
+        "# TYPE anqa_webrtc_packets_lost_total counter",
+    ]
+    for kind in ("audio", "video"):
+        lines.append(f'anqa_webrtc_packets_lost_total{{kind="{kind}"}} {_totals.get(f"packets_lost_{kind}", 0.0):.0f}')
+    lines += [
+        "# HELP anqa_webrtc_frames_decoded_total Video frames decoded.",
+        "# TYPE anqa_webrtc_frames_decoded_total counter",
+        f"anqa_webrtc_frames_decoded_total {_totals['frames_decoded']:.0f}",
+        "# HELP anqa_webrtc_stats_samples_total getStats() samples taken.",
+        "# TYPE anqa_webrtc_stats_samples_total counter",
+        f"anqa_webrtc_stats_samples_total {_totals['samples']:.0f}",
+        "# HELP anqa_webrtc_stats_sample_errors_total getStats() samples that failed.",
+        "# TYPE anqa_webrtc_stats_sample_errors_total counter",
+        f"anqa_webrtc_stats_sample_errors_total {_totals['sample_errors']:.0f}",
+        # Summed over sessions rather than labelled per session to keep series cardinality fixed
+        "# HELP anqa_webrtc_inbound_bitrate_kbps Latest inbound bitrate summed over live sessions.",
+        "# TYPE anqa_webrtc_inbound_bitrate_kbps gauge",
+        f"anqa_webrtc_inbound_bitrate_kbps {sum((s.series.get('rtc_bitrate_kbps') or [0.0])[-1] for s in list(_live.values())):.1f}",
+    ]
+    return "\n".join(lines) + "\n"
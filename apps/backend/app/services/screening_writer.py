@@ -0,0 +1,217 @@
+"""Write-behind queue for screenings rows written from the async signaling path.
+
+The Supabase client is synchronous, so an inline `.execute()` in an async handler stalls the
+event loop for a PostgREST round trip. Handlers enqueue the row change instead and return.
+Pending changes are coalesced per session: later fields override earlier ones, and an update
+queued behind an unflushed upsert is folded into that upsert. A background task drains the
+queue on a worker thread. Upserts with the same column set go out as one bulk request, and
+failed writes are retried with exponential backoff before being dropped with an error log.
+
+`flush_screening_writes()` waits until everything queued before the call has been written
+(or given up on); the app awaits it at shutdown.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Optional
+
+from postgrest.types import ReturnMethod
+
+from app.core.supabase_client import supabase
+
+
+_log = logging.getLogger(__name__)
+
+_OP_UPSERT = "upsert"
+_OP_UPDATE = "update"
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return max(0.0, float(os.getenv(name, str(default))))
+    except ValueError:
+        return default
+
+
+class _PendingWrite:
+    __slots__ = ("op", "fields", "attempts", "not_before")
+
+    def __init__(self, op: str, fields: dict) -> None:
+        self.op = op
+        self.fields = fields
+        self.attempts = 0
+        self.not_before = 0.0
+
+    def merge(self, later: "_PendingWrite") -> None:
+        # An upsert anywhere in the chain keeps the row-creating semantics
+        if later.op == _OP_UPSERT:
+            self.op = _OP_UPSERT
+        self.fields = {**self.fields, **later.fields}
+
+
+class ScreeningWriter:
+    def __init__(self, *, delay_seconds: float = 0.05, max_attempts: int = 5, retry_base_seconds: float = 0.5) -> None:
+        self.delay = delay_seconds
+        self.max_attempts = max(1, max_attempts)
+        self.retry_base = retry_base_seconds
+        self._pending: dict[str, _PendingWrite] = {}
+        self._in_flight: set[str] = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._drained: Optional[asyncio.Condition] = None
+        self._task: Optional[asyncio.Task] = None
+        # Number of flush() calls waiting; each makes the worker skip the coalescing delay
+        self._urgent_waiters = 0
+
+    def _ensure_worker(self, loop: asyncio.AbstractEventLoop) -> None:
+        if self._task is not None and not self._task.done() and self._task.get_loop() is loop:
+            return
+        self._wakeup = asyncio.Event()
+        self._drained = asyncio.Condition()
+        self._in_flight = set()
+        self._task = loop.create_task(self._run())
+
+    def _enqueue(self, session_id: str, write: _PendingWrite) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop (scripts, sync callers): nothing to protect, write inline
+            self._write_one(session_id, write)
+            return
+        current = self._pending.get(session_id)
+        if current is None:
+            self._pending[session_id] = write
+        else:
+            current.merge(write)
+        self._ensure_worker(loop)
+        assert self._wakeup is not None
+        self._wakeup.set()
+
+    def upsert(self, row: dict) -> None:
+        """Queue an upsert of a full screenings row (must contain 'id')."""
+        self._enqueue(str(row["id"]), _PendingWrite(_OP_UPSERT, dict(row)))
+
+    def update(self, session_id: str, fields: dict) -> None:
+        """Queue an update of some columns of the screening `session_id`."""
+        self._enqueue(session_id, _PendingWrite(_OP_UPDATE, dict(fields)))
+
+    def _settled(self, session_id: Optional[str]) -> bool:
+        if session_id is None:
+            return not self._pending and not self._in_flight
+        return session_id not in self._pending and session_id not in self._in_flight
+
+    async def flush(self, timeout: Optional[float] = None, *, session_id: Optional[str] = None) -> bool:
+        """Wait until queued writes (of one session, or all) are written or dropped; False on timeout."""
+        if self._task is None or self._task.done() or self._drained is None:
+            return self._settled(session_id)
+        self._urgent_waiters += 1
+        assert self._wakeup is not None
+        self._wakeup.set()
+        drained = self._drained
+
+        async def _wait() -> None:
+            async with drained:
+                await drained.wait_for(lambda: self._settled(session_id))
+
+        try:
+            await asyncio.wait_for(_wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self._urgent_waiters -= 1
+
+    async def _run(self) -> None:
+        assert self._wakeup is not None and self._drained is not None
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            if not self._urgent_waiters and self.delay:
+                # Let writes of the same transition (e.g. close + finalize) coalesce
+                await asyncio.sleep(self.delay)
+            now = time.monotonic()
+            # A flush barrier does not wait out retry backoff
+            due = {sid: w for sid, w in self._pending.items() if self._urgent_waiters or w.not_before <= now}
+            for sid in due:
+                del self._pending[sid]
+            if due:
+                self._in_flight = set(due)
+                try:
+                    failed = await asyncio.to_thread(self._write_batch, due)
+                finally:
+                    self._in_flight = set()
+                self._requeue(failed)
+            if self._pending:
+                # Retries are waiting on their backoff; check again when the earliest is due
+                wait = max(0.01, min(w.not_before for w in self._pending.values()) - time.monotonic())
+                asyncio.get_running_loop().call_later(wait, self._wakeup.set)
+            async with self._drained:
+                self._drained.notify_all()
+
+    def _requeue(self, failed: dict[str, _PendingWrite]) -> None:
+        for sid, write in failed.items():
+            write.attempts += 1
+            if write.attempts >= self.max_attempts:
+                _log.error("[screenings][%s] giving up on %s after %s attempts: %s", sid, write.op, write.attempts, list(write.fields))
+                continue
+            write.not_before = time.monotonic() + self.retry_base * 2 ** (write.attempts - 1)
+            newer = self._pending.get(sid)
+            if newer is not None:
+                write.merge(newer)
+            self._pending[sid] = write
+
+    def _write_one(self, session_id: str, write: _PendingWrite) -> None:
+        table = supabase.table("screenings")
+        if write.op == _OP_UPSERT:
+            table.upsert(write.fields, on_conflict="id", returning=ReturnMethod.minimal).execute()
+        else:
+            table.update(write.fields, returning=ReturnMethod.minimal).eq("id", session_id).execute()
+
+    def _write_batch(self, due: dict[str, _PendingWrite]) -> dict[str, _PendingWrite]:
+        """Write due changes (worker thread); returns the ones that failed."""
+        failed: dict[str, _PendingWrite] = {}
+        singles = dict(due)
+        # Bulk upserts need identical column sets across rows
+        upsert_groups: dict[frozenset, list[str]] = {}
+        for sid, write in due.items():
+            if write.op == _OP_UPSERT:
+                upsert_groups.setdefault(frozenset(write.fields), []).append(sid)
+        for sids in upsert_groups.values():
+            if len(sids) < 2:
+                continue
+            for sid in sids:
+                singles.pop(sid)
+            try:
+                supabase.table("screenings").upsert(
+                    [due[sid].fields for sid in sids], on_conflict="id", returning=ReturnMethod.minimal
+                ).execute()
+            except Exception as e:
+                _log.warning("[screenings] bulk upsert of %s rows failed: %s", len(sids), e)
+                failed.update({sid: due[sid] for sid in sids})
+        for sid, write in singles.items():
+            try:
+                self._write_one(sid, write)
+            except Exception as e:
+                _log.warning("[screenings][%s] %s failed (attempt %s): %s", sid, write.op, write.attempts + 1, e)
+                failed[sid] = write
+        return failed
+
+
+_writer = ScreeningWriter(delay_seconds=_env_float("SCREENING_WRITE_DELAY_SECONDS", 0.05))
+
+
+def get_screening_writer() -> ScreeningWriter:
+    return _writer
+
+
+def enqueue_screening_upsert(row: dict) -> None:
+    _writer.upsert(row)
+
+
+def enqueue_screening_update(session_id: str, fields: dict) -> None:
+    _writer.update(session_id, fields)
+
+
+async def flush_screening_writes(timeout: Optional[float] = None, *, session_id: Optional[str] = None) -> bool:
+    return await _writer.flush(timeout, session_id=session_id)
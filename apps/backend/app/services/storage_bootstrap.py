@@ -5,7 +5,7 @@ from typing import Any
 import requests
 
 from app.core.supabase_client import supabase
-from app.core.config import Settings
+from app.core.config import get_settings
 
 
 def get_recordings_bucket_name() -> str:
@@ -24,7 +24,7 @@ def ensure_bucket_exists(bucket_name: str | None = None, *, public: bool = False
 
     # Fallback: direct HTTP call to Storage API to avoid SDK signature issues
     try:
-        settings = Settings()
+        settings = get_settings()
         base_url = settings.get_supabase_project_url().rstrip("/")
         service_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or settings.get_supabase_api_key()
         if not base_url or not service_key:
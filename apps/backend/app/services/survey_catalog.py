@@ -0,0 +1,77 @@
+"""Process-local set of survey ids known to exist in `surveys`.
+
+Every response save used to insert the survey's catalog row to satisfy the foreign key, a
+write against a tiny table that almost never changes. Ids are now loaded from `surveys` at
+startup and reloaded once they are SURVEY_CATALOG_TTL_SECONDS (default 300) old; saves for a
+known id skip the catalog insert, so it only happens the first time a new type:version is
+seen. A survey deleted in the meantime shows up as a foreign key violation on save, and the
+caller forgets the id and retries with the insert.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Optional
+
+from app.core.async_db import get_async_db
+
+
+_log = logging.getLogger(__name__)
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return max(0.0, float(os.getenv(name, str(default))))
+    except ValueError:
+        return default
+
+
+_TTL_SECONDS = _env_float("SURVEY_CATALOG_TTL_SECONDS", 300.0)
+
+_known: set[str] = set()
+# Monotonic time of the last successful load; None until the first one
+_loaded_at: Optional[float] = None
+_refresh_lock: Optional[asyncio.Lock] = None
+
+
+async def refresh_known_surveys() -> int:
+    """Reload every survey id from the catalog; returns how many exist."""
+    global _known, _loaded_at
+    rows = await get_async_db().table("surveys").select("id").execute() or []
+    _known = {str(row["id"]) for row in rows if isinstance(row, dict) and row.get("id")}
+    _loaded_at = time.monotonic()
+    return len(_known)
+
+
+def _stale() -> bool:
+    return _loaded_at is None or time.monotonic() - _loaded_at >= _TTL_SECONDS
+
+
+async def is_known_survey(survey_id: str) -> bool:
+    """Whether the catalog row of `survey_id` exists (as of the last load or save)."""
+    global _loaded_at, _refresh_lock
+    if not _TTL_SECONDS:
+        return False
+    if _stale():
+        if _refresh_lock is None:
+            _refresh_lock = asyncio.Lock()
+        # One reload per expiry; concurrent saves wait for it instead of piling on
+        async with _refresh_lock:
+            if _stale():
+                try:
+                    await refresh_known_surveys()
+                except Exception as e:
+                    # Keep what saves have confirmed; try again after another TTL
+                    _loaded_at = time.monotonic()
+                    _log.warning("[surveys] catalog reload failed: %s", e)
+    return survey_id in _known
+
+
+def remember_survey(survey_id: str) -> None:
+    if _TTL_SECONDS:
+        _known.add(survey_id)
+
+
+def forget_survey(survey_id: str) -> None:
+    _known.discard(survey_id)
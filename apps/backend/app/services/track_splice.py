@@ -0,0 +1,70 @@
+import asyncio
+import time
+from typing import Optional
+
+from aiortc import MediaStreamTrack
+from aiortc.mediastreams import MediaStreamError
+
+
+class SpliceTrack(MediaStreamTrack):
+    """A long-lived track whose upstream source can be swapped.
+
+    The recorder consumes one SpliceTrack per kind for the whole session. When a client
+    reconnects on a new peer connection, the new remote track is spliced in with `set_source`
+    and timestamps are rebased so the output stays monotonic; the wall-clock gap of the outage
+    is preserved so audio and video stay aligned.
+    """
+
+    def __init__(self, kind: str) -> None:
+        super().__init__()
+        self.kind = kind
+        self._source: Optional[MediaStreamTrack] = None
+        self._source_ready = asyncio.Event()
+        self._emitting: Optional[MediaStreamTrack] = None
+        self._offset = 0
+        self._last_pts: Optional[int] = None
+        self._last_wall = 0.0
+
+    @property
+    def has_source(self) -> bool:
+        return self._source is not None
+
+    def set_source(self, track: MediaStreamTrack) -> None:
+        self._source = track
+        self._source_ready.set()
+
+    def stop(self) -> None:
+        super().stop()
+        # Wake a recv() parked between sources so it can observe the ended state
+        self._source_ready.set()
+
+    async def recv(self):
+        while True:
+            if self.readyState != "live":
+                raise MediaStreamError
+            source = self._source
+            if source is None:
+                await self._source_ready.wait()
+                continue
+            try:
+                frame = await source.recv()
+            except MediaStreamError:
+                # Upstream ended (peer connection dropped); park until a new source is spliced in
+                if self._source is source:
+                    self._source = None
+                    self._source_ready.clear()
+                continue
+            return self._rebase(source, frame)
+
+    def _rebase(self, source: MediaStreamTrack, frame):
+        now = time.monotonic()
+        if frame.pts is not None:
+            if source is not self._emitting:
+                if self._emitting is not None and self._last_pts is not None and frame.time_base:
+                    gap_ticks = max(1, int((now - self._last_wall) / frame.time_base))
+                    self._offset = self._last_pts + gap_ticks - frame.pts
+                self._emitting = source
+            frame.pts += self._offset
+            self._last_pts = frame.pts
+        self._last_wall = now
+        return frame
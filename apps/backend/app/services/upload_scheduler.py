@@ -0,0 +1,139 @@
+"""Process-wide bandwidth scheduler for artifact uploads.
+
+Finalize paths stream artifacts to storage in chunks and ask the scheduler for each chunk.
+A token bucket enforces UPLOAD_BANDWIDTH_BYTES_PER_SEC (unset or 0 = unlimited) minus a
+reserve per live WebRTC session, so finalizations never starve ongoing screenings. Pending
+chunks are granted by priority class (audio and small artifacts before video) and, within a
+class, by virtual finish time per session (start-time fair queueing), so concurrent
+finalizations share the budget evenly regardless of how many files each one uploads.
+
+Uploads are blocking calls of the storage client and run on a dedicated thread pool so
+throttled uploads never occupy the event loop's default executor.
+"""
+
+import asyncio
+import itertools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+
+_log = logging.getLogger(__name__)
+
+PRIORITY_AUDIO = 0
+PRIORITY_VIDEO = 1
+
+_VIDEO_EXTENSIONS = (".mp4", ".mkv", ".webm", ".m4s")
+
+# Never throttle below this share of the budget, however many sessions are live
+_MIN_RATE_SHARE = 0.1
+
+
+def priority_for_key(key: str) -> int:
+    """Video containers and segments are bulk; audio, analysis and timeline artifacts go first."""
+    return PRIORITY_VIDEO if key.lower().endswith(_VIDEO_EXTENSIONS) else PRIORITY_AUDIO
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(0, int(os.getenv(name, str(default))))
+    except ValueError:
+        return default
+
+
+class UploadScheduler:
+    def __init__(
+        self,
+        rate_bytes_per_sec: int,
+        *,
+        live_reserve_bytes_per_sec: int = 0,
+        burst_bytes: Optional[int] = None,
+    ) -> None:
+        self.rate = rate_bytes_per_sec
+        self.live_reserve = live_reserve_bytes_per_sec
+        self.burst = burst_bytes or max(256 * 1024, rate_bytes_per_sec // 4)
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        # (priority, virtual finish tag, arrival) of waiting chunk requests
+        self._waiting: list[tuple[int, float, int]] = []
+        self._virtual_time = 0.0
+        self._finish_tags: dict[str, float] = {}
+        self._live_sessions: Callable[[], int] = lambda: 0
+
+    @property
+    def unlimited(self) -> bool:
+        return self.rate <= 0
+
+    def set_live_sessions_provider(self, provider: Callable[[], int]) -> None:
+        self._live_sessions = provider
+
+    def effective_rate(self) -> float:
+        try:
+            live = max(0, int(self._live_sessions()))
+        except Exception:
+            live = 0
+        return max(self.rate * _MIN_RATE_SHARE, float(self.rate - live * self.live_reserve))
+
+    def _refill(self) -> float:
+        now = time.monotonic()
+        rate = self.effective_rate()
+        self._tokens = min(float(self.burst), self._tokens + (now - self._last) * rate)
+        self._last = now
+        return rate
+
+    def acquire(self, session_id: str, nbytes: int, *, priority: int = PRIORITY_VIDEO) -> None:
+        """Block until `nbytes` of `session_id` may be sent.
+
+        Chunks larger than the burst are granted on a full bucket.
+        """
+        if self.unlimited or nbytes <= 0:
+            return
+        need = float(min(nbytes, self.burst))
+        with self._cond:
+            tag = max(self._virtual_time, self._finish_tags.get(session_id, 0.0)) + nbytes
+            self._finish_tags[session_id] = tag
+            ticket = (priority, tag, next(self._seq))
+            self._waiting.append(ticket)
+            try:
+                while True:
+                    rate = self._refill()
+                    if min(self._waiting) == ticket and self._tokens >= need:
+                        # Oversized chunks go into debt so the long-run rate still holds
+                        self._tokens -= nbytes
+                        self._virtual_time = max(self._virtual_time, tag - nbytes)
+                        return
+                    deficit = max(0.0, need - self._tokens)
+                    self._cond.wait(timeout=min(1.0, max(0.005, deficit / rate)))
+            finally:
+                self._waiting.remove(ticket)
+                if not self._waiting:
+                    # Idle: forget per-session history so tags do not grow without bound
+                    self._finish_tags.clear()
+                    self._virtual_time = 0.0
+                self._cond.notify_all()
+
+
+_scheduler = UploadScheduler(
+    _env_int("UPLOAD_BANDWIDTH_BYTES_PER_SEC", 0),
+    live_reserve_bytes_per_sec=_env_int("UPLOAD_LIVE_RESERVE_BYTES_PER_SEC", 250_000),
+)
+_executor = ThreadPoolExecutor(max_workers=_env_int("UPLOAD_MAX_CONCURRENCY", 8) or 8, thread_name_prefix="upload")
+
+
+def get_upload_scheduler() -> UploadScheduler:
+    return _scheduler
+
+
+def acquire_upload_bandwidth(session_id: str, nbytes: int, *, priority: int = PRIORITY_VIDEO) -> None:
+    _scheduler.acquire(session_id, nbytes, priority=priority)
+
+
+async def run_upload(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Run a blocking upload function on the upload thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, lambda: fn(*args, **kwargs))
@@ -0,0 +1,150 @@
+import asyncio
+import os
+from typing import Callable, Optional, Sequence
+
+
+def transcoded_path_for(input_path: str) -> str:
+    """Output path for the browser-ready MP4; never the input path (ffmpeg would clobber it)."""
+    in_dir, in_name = os.path.dirname(input_path), os.path.basename(input_path)
+    in_root, in_ext = os.path.splitext(in_name)
+    # If input already ends with .mp4, place transcoded file next to it with a suffix
+    out_name = f"{in_root}.transcoded.mp4" if in_ext.lower() == ".mp4" else f"{in_root}.mp4"
+    return os.path.join(in_dir, out_name)
+
+
+def mp4_transcode_args(
+    input_path: str,
+    output_path: str,
+    *,
+    preset: Optional[str] = None,
+    crf: Optional[str] = None,
+    fps: Optional[str] = None,
+    genpts: bool = True,
+    cfr: bool = True,
+    extra_video_args: Sequence[str] = (),
+) -> list[str]:
+    """ffmpeg command producing a browser-friendly MP4 (H.264 yuv420p + AAC, faststart).
+
+    Defaults come from FFMPEG_PRESET / FFMPEG_CRF / FFMPEG_FPS; keyword overrides exist so the
+    finalize benchmark can compare strategies with the exact production command.
+    """
+    return [
+        "ffmpeg",
+        "-y",
+        # Generate missing/monotonic PTS to fix non-monotonic DTS from real-time recording
+        *(["-fflags", "+genpts"] if genpts else []),
+        "-i",
+        input_path,
+        # Select first video/audio streams if present, optionally (the '?' avoids failure if missing)
+        "-map", "0:v:0?", "-map", "0:a:0?",
+        # Enforce constant frame rate on output
+        *(["-r", fps or os.getenv("FFMPEG_FPS", "30")] if cfr else []),
+        "-c:v",
+        "libx264",
+        "-pix_fmt",
+        "yuv420p",
+        "-preset",
+        preset or os.getenv("FFMPEG_PRESET", "veryfast"),
+        "-crf",
+        crf or os.getenv("FFMPEG_CRF", "23"),
+        # Force CFR output; duplicate/drop frames to match -r
+        *(["-vsync", "cfr"] if cfr else []),
+        *extra_video_args,
+        "-movflags",
+        "+faststart",
+        "-c:a",
+        "aac",
+        "-b:a",
+        "128k",
+        "-ar",
+        "48000",
+        "-ac",
+        "2",
+        # Align output duration to the shortest stream to avoid trailing black/silence
+        "-shortest",
+        output_path,
+    ]
+
+
+def mp4_remux_args(input_path: str, output_path: str) -> list[str]:
+    """Stream-copy into MP4 without re-encoding (only valid for H.264/AAC recordings)."""
+    return [
+        "ffmpeg",
+        "-y",
+        "-fflags", "+genpts",
+        "-i",
+        input_path,
+        "-map", "0:v:0?", "-map", "0:a:0?",
+        "-c", "copy",
+        "-movflags", "+faststart",
+        output_path,
+    ]
+
+
+def stream_copy_args(input_path: str, output_path: str) -> list[str]:
+    """Remux every stream into the output's container without re-encoding.
+
+    Used to turn joined MediaRecorder timeslices into one seekable file: the muxer writes the
+    duration and index (cues / moov) that a live browser recording lacks.
+    """
+    return [
+        "ffmpeg",
+        "-y",
+        "-fflags", "+genpts",
+        "-i",
+        input_path,
+        "-map", "0",
+        "-c", "copy",
+        *(["-movflags", "+faststart"] if output_path.lower().endswith(".mp4") else []),
+        output_path,
+    ]
+
+
+def media_duration_seconds(path: str) -> float:
+    """Container duration via PyAV; 0.0 when unknown or unreadable."""
+    try:
+        import av
+
+        with av.open(path) as container:
+            if container.duration:
+                return float(container.duration) / av.time_base
+            for stream in container.streams:
+                if stream.duration and stream.time_base:
+                    return float(stream.duration * stream.time_base)
+    except Exception:
+        pass
+    return 0.0
+
+
+async def run_ffmpeg_with_progress(
+    args: Sequence[str],
+    *,
+    duration_seconds: float,
+    on_progress: Optional[Callable[[float], None]] = None,
+) -> int:
+    """Run an ffmpeg command without blocking the event loop; returns its exit code.
+
+    ffmpeg's machine-readable `-progress` output is read from stdout and reported as a
+    0..100 percentage of `duration_seconds` (never 100 before ffmpeg reports the end).
+    """
+    cmd = [args[0], "-progress", "pipe:1", "-nostats", *args[1:]]
+    proc = await asyncio.create_subprocess_exec(
+        *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+    )
+    assert proc.stdout is not None
+    try:
+        async for raw in proc.stdout:
+            key, _, value = raw.decode("ascii", "replace").strip().partition("=")
+            if on_progress is None:
+                continue
+            # out_time_us and out_time_ms both carry microseconds; 'N/A' before the first frame
+            if key in ("out_time_us", "out_time_ms") and value.isdigit() and duration_seconds > 0:
+                on_progress(min(99.0, 100.0 * int(value) / 1e6 / duration_seconds))
+            elif key == "progress" and value == "end":
+                on_progress(100.0)
+        return await proc.wait()
+    except BaseException:
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+        raise
@@ -0,0 +1,381 @@
+"""Auth and JWT decode benchmark.
+
+Signs test tokens locally, HS256 with a benchmark secret and RS256 with generated RSA keys
+published by a local JWKS stub (the app is pointed at it through SUPABASE_PROJECT_URL), and
+measures:
+
+- decode: `decode_supabase_jwt` throughput and latency per path, on worker threads like the
+  request threadpool
+    hs256-new / rs256-new    every token seen for the first time (full verification)
+    hs256-repeat / rs256-repeat
+                             the same token again (verified-payload cache)
+    rs256-cold-jwks          empty key store before every token (fetch + verify)
+    rs256-unknown-kid        the stub rotates to a new kid before every token (refresh + verify)
+- middleware: requests through `AuthMiddleware` over in-process ASGI calls, against the same
+  app without the middleware ("baseline"), under concurrent load
+
+Usage (from apps/backend):
+
+    python -m benchmarks.auth_bench --output auth.json
+    python -m benchmarks.auth_bench --baseline auth.json --tolerance 0.15
+
+With --baseline the run exits non-zero when a scenario's throughput dropped or its median
+latency grew by more than the tolerance.
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+
+import numpy as np
+
+
+DECODE_SCENARIOS = ("hs256-new", "hs256-repeat", "rs256-new", "rs256-repeat", "rs256-cold-jwks", "rs256-unknown-kid")
+MIDDLEWARE_SCENARIOS = ("baseline", "public", "protected-hs256", "protected-rs256", "protected-rs256-new")
+# Scenarios that mutate the key store per token run on one thread
+_SERIAL_DECODE_SCENARIOS = ("rs256-cold-jwks", "rs256-unknown-kid")
+
+BENCH_SECRET = "auth-bench-secret"
+_ROTATION_KEYS = 4
+
+
+def _b64url_uint(value: int) -> str:
+    raw = value.to_bytes((value.bit_length() + 7) // 8, "big")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+class _RsaKey:
+    def __init__(self) -> None:
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.hazmat.primitives.asymmetric import rsa
+
+        private = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self.private_pem = private.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        ).decode("ascii")
+        numbers = private.public_key().public_numbers()
+        self.n, self.e = _b64url_uint(numbers.n), _b64url_uint(numbers.e)
+
+    def jwk(self, kid: str) -> dict:
+        return {"kty": "RSA", "alg": "RS256", "use": "sig", "kid": kid, "n": self.n, "e": self.e}
+
+
+class JwksStub:
+    """Serves `{"keys": [...]}` at /auth/v1/keys on localhost; `keys` may be swapped at any time."""
+
+    def __init__(self) -> None:
+        self.keys: list[dict] = []
+        self.fetches = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:  # noqa: N802
+                stub.fetches += 1
+                body = json.dumps({"keys": stub.keys}).encode("utf-8")
+                self.send_response(200 if self.path == "/auth/v1/keys" else 404)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args: object) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def _configure_env(stub: JwksStub, cache_dir: str) -> None:
+    # Before the app is imported: the JWKS store and issuer are derived from these
+    os.environ["SUPABASE_PROJECT_URL"] = stub.url
+    os.environ["SUPABASE_JWT_SECRET"] = BENCH_SECRET
+    os.environ["JWKS_CACHE_PATH"] = os.path.join(cache_dir, "jwks.json")
+    os.environ["JWKS_UNKNOWN_KID_MIN_INTERVAL_SECONDS"] = "0"
+    # The Supabase client is never used, but it validates the key format at import
+    os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "auth.bench.key")
+
+
+class TokenFactory:
+    def __init__(self, issuer: str, rsa_key: _RsaKey) -> None:
+        self.issuer = issuer
+        self.rsa_key = rsa_key
+        self._n = 0
+
+    def _claims(self) -> dict:
+        self._n += 1
+        sub = f"bench-{self._n}"
+        return {"sub": sub, "email": f"{sub}@bench.local", "aud": "authenticated", "iss": self.issuer, "exp": int(time.time()) + 3600}
+
+    def hs256(self) -> str:
+        from jose import jwt
+
+        return jwt.encode(self._claims(), BENCH_SECRET, algorithm="HS256")
+
+    def rs256(self, kid: str = "bench-0", key: Optional[_RsaKey] = None) -> str:
+        from jose import jwt
+
+        return jwt.encode(self._claims(), (key or self.rsa_key).private_pem, algorithm="RS256", headers={"kid": kid})
+
+
+def _summary(latencies: np.ndarray, wall: float) -> dict:
+    return {
+        "ops": int(latencies.size),
+        "ops_per_s": round(latencies.size / wall, 1),
+        "p50_us": round(float(np.percentile(latencies, 50)) * 1e6, 1),
+        "p99_us": round(float(np.percentile(latencies, 99)) * 1e6, 1),
+    }
+
+
+def _timed_threads(ops: list[Callable[[], object]], threads: int) -> dict:
+    latencies = np.zeros(len(ops), dtype=np.float64)
+    errors = 0
+
+    def run(i: int) -> None:
+        nonlocal errors
+        t0 = time.perf_counter()
+        try:
+            ops[i]()
+        except Exception:
+            errors += 1
+        latencies[i] = time.perf_counter() - t0
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(run, range(len(ops))))
+    return {**_summary(latencies, time.perf_counter() - started), "errors": errors}
+
+
+def run_decode(scenario: str, ops: int, threads: int, stub: JwksStub, tokens: TokenFactory, rotation_keys: list[_RsaKey]) -> dict:
+    import app.core.auth as auth
+
+    store = auth.get_jwks_store()
+    stub.keys = [tokens.rsa_key.jwk("bench-0")]
+    store._install([], 0.0)
+    store.ensure_key_blocking("bench-0")
+    auth._VERIFIED_TOKENS.clear()
+    decode = auth.decode_supabase_jwt
+
+    if scenario in ("hs256-new", "hs256-repeat", "rs256-new", "rs256-repeat"):
+        make = tokens.hs256 if scenario.startswith("hs256") else tokens.rs256
+        if scenario.endswith("repeat"):
+            token = make()
+            decode(token)
+            batch = [lambda: decode(token)] * ops
+        else:
+            batch = [lambda t=t: decode(t) for t in [make() for _ in range(ops)]]
+    elif scenario == "rs256-cold-jwks":
+        signed = [tokens.rs256() for _ in range(ops)]
+
+        def cold(t: str) -> None:
+            store._install([], 0.0)
+            decode(t)
+
+        batch = [lambda t=t: cold(t) for t in signed]
+    else:
+        signed = []
+        for i in range(ops):
+            kid = f"rotated-{i + 1}"
+            signed.append((kid, tokens.rs256(kid, rotation_keys[i % len(rotation_keys)])))
+
+        def rotated(i: int, kid: str, t: str) -> None:
+            # Current and previous key published, as during a real rotation
+            previous = stub.keys[-1:]
+            stub.keys = previous + [rotation_keys[i % len(rotation_keys)].jwk(kid)]
+            decode(t)
+
+        batch = [lambda i=i, kid=kid, t=t: rotated(i, kid, t) for i, (kid, t) in enumerate(signed)]
+
+    fetches_before = stub.fetches
+    result = _timed_threads(batch, 1 if scenario in _SERIAL_DECODE_SCENARIOS else threads)
+    return {
+        "group": "decode",
+        "scenario": scenario,
+        "threads": 1 if scenario in _SERIAL_DECODE_SCENARIOS else threads,
+        **result,
+        "jwks_fetches": stub.fetches - fetches_before,
+    }
+
+
+def build_app(with_middleware: bool):
+    from fastapi import Depends, FastAPI
+
+    from app.core.auth import User, get_current_user
+    from app.core.auth_middleware import AuthMiddleware
+
+    app = FastAPI()
+
+    @app.get("/health")
+    def health() -> dict:
+        return {"status": "ok"}
+
+    @app.get("/protected")
+    def protected(user: User = Depends(get_current_user)) -> dict:
+        return {"id": user.id}
+
+    @app.get("/open")
+    def open_route() -> dict:
+        return {"ok": True}
+
+    if with_middleware:
+        app.add_middleware(AuthMiddleware)
+    return app
+
+
+async def _drive(app, scopes: list[dict], warmup: list[dict], concurrency: int) -> dict:
+    from benchmarks.auth_middleware_bench import _call
+
+    for scope in warmup:
+        await _call(app, dict(scope))
+    latencies = np.zeros(len(scopes), dtype=np.float64)
+    statuses: dict[int, int] = {}
+    next_index = 0
+
+    async def worker() -> None:
+        nonlocal next_index
+        while next_index < len(scopes):
+            i = next_index
+            next_index += 1
+            t0 = time.perf_counter()
+            status = await _call(app, dict(scopes[i]))
+            latencies[i] = time.perf_counter() - t0
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return {**_summary(latencies, time.perf_counter() - started), "statuses": {str(k): v for k, v in sorted(statuses.items())}}
+
+
+def run_middleware(scenario: str, requests: int, concurrency: int, tokens: TokenFactory) -> dict:
+    from benchmarks.auth_middleware_bench import _scope
+
+    import app.core.auth as auth
+
+    auth._VERIFIED_TOKENS.clear()
+    warmup = None
+    if scenario == "baseline":
+        app, scopes = build_app(False), [_scope("GET", "/open", None)] * requests
+    elif scenario == "public":
+        token = tokens.rs256()
+        app, scopes = build_app(True), [_scope("GET", "/health", token)] * requests
+    elif scenario == "protected-hs256":
+        token = tokens.hs256()
+        app, scopes = build_app(True), [_scope("GET", "/protected", token)] * requests
+    elif scenario == "protected-rs256":
+        token = tokens.rs256()
+        app, scopes = build_app(True), [_scope("GET", "/protected", token)] * requests
+    else:
+        # Warm-up must not pre-verify the measured tokens
+        app, scopes = build_app(True), [_scope("GET", "/protected", tokens.rs256()) for _ in range(requests)]
+        warmup = [_scope("GET", "/protected", tokens.rs256()) for _ in range(50)]
+    result = asyncio.run(_drive(app, scopes, scopes[:50] if warmup is None else warmup, concurrency))
+    return {"group": "middleware", "scenario": scenario, "concurrency": concurrency, **result}
+
+
+def run_benchmark(decode_scenarios: list[str], middleware_scenarios: list[str], ops: int, cold_ops: int, threads: int, requests: int, concurrency: int) -> dict:
+    cache_dir = tempfile.mkdtemp(prefix="auth_bench_")
+    stub = JwksStub()
+    try:
+        _configure_env(stub, cache_dir)
+        from app.core.auth import _get_expected_issuer
+
+        rsa_key = _RsaKey()
+        stub.keys = [rsa_key.jwk("bench-0")]
+        tokens = TokenFactory(_get_expected_issuer(), rsa_key)
+        rotation_keys = [_RsaKey() for _ in range(_ROTATION_KEYS)] if "rs256-unknown-kid" in decode_scenarios else []
+
+        results = []
+        for scenario in decode_scenarios:
+            n = cold_ops if scenario in _SERIAL_DECODE_SCENARIOS else ops
+            results.append(run_decode(scenario, n, threads, stub, tokens, rotation_keys))
+        stub.keys = [rsa_key.jwk("bench-0")]
+        for scenario in middleware_scenarios:
+            results.append(run_middleware(scenario, requests, concurrency, tokens))
+        for r in results:
+            print(
+                f"{r['group']:>10} {r['scenario']:<20} {r['ops_per_s']:>10.1f} ops/s  p50 {r['p50_us']:>9.1f}us  p99 {r['p99_us']:>9.1f}us",
+                file=sys.stderr,
+            )
+        return {
+            "meta": {
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "threads": threads,
+                "concurrency": concurrency,
+            },
+            "results": results,
+        }
+    finally:
+        stub.close()
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Throughput drops / median latency growth beyond `tolerance` (fractional) vs. the baseline."""
+    key = lambda r: (r["group"], r["scenario"])  # noqa: E731
+    base = {key(r): r for r in baseline.get("results", [])}
+    regressions: list[str] = []
+    for r in current.get("results", []):
+        b = base.get(key(r))
+        if r.get("errors"):
+            regressions.append(f"{key(r)}: {r['errors']} errors")
+        if not b:
+            continue
+        if b.get("ops_per_s") and r["ops_per_s"] < b["ops_per_s"] * (1 - tolerance):
+            regressions.append(f"{key(r)}: ops_per_s {b['ops_per_s']} -> {r['ops_per_s']}")
+        if b.get("p50_us") and r["p50_us"] > b["p50_us"] * (1 + tolerance):
+            regressions.append(f"{key(r)}: p50_us {b['p50_us']} -> {r['p50_us']}")
+    return regressions
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--decode", default=",".join(DECODE_SCENARIOS), help="Decode scenarios: " + ", ".join(DECODE_SCENARIOS))
+    parser.add_argument("--middleware", default=",".join(MIDDLEWARE_SCENARIOS), help="Middleware scenarios: " + ", ".join(MIDDLEWARE_SCENARIOS))
+    parser.add_argument("--ops", type=int, default=2000, help="Tokens per decode scenario")
+    parser.add_argument("--cold-ops", type=int, default=200, help="Tokens per cold-JWKS / unknown-kid scenario")
+    parser.add_argument("--threads", type=int, default=8, help="Decode worker threads")
+    parser.add_argument("--requests", type=int, default=3000, help="Requests per middleware scenario")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--output", help="Write JSON results to this file (default: stdout)")
+    parser.add_argument("--baseline", help="Compare against a previous results file")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args(argv)
+
+    split = lambda v: [x.strip() for x in v.split(",") if x.strip()]  # noqa: E731
+    decode_scenarios, middleware_scenarios = split(args.decode), split(args.middleware)
+    unknown = sorted(set(decode_scenarios) - set(DECODE_SCENARIOS)) + sorted(set(middleware_scenarios) - set(MIDDLEWARE_SCENARIOS))
+    if unknown:
+        parser.error(f"unknown scenario: {', '.join(unknown)}")
+
+    report = run_benchmark(decode_scenarios, middleware_scenarios, args.ops, args.cold_ops, args.threads, args.requests, args.concurrency)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,223 @@
+"""Auth middleware microbenchmark.
+
+Drives an in-process FastAPI app directly over ASGI (no sockets) with the previous
+`BaseHTTPMiddleware` implementation, which decoded every bearer token eagerly, and with the
+current pure ASGI `AuthMiddleware`, and reports requests per second and latency percentiles
+per scenario:
+
+- public:        GET /health with a bearer token (public path; the token is never decoded)
+- protected:     GET /protected with a valid token (sync get_current_user dependency)
+- protected-new: like protected, but every request carries a token never seen before
+- anonymous:     GET /protected without a token (401)
+- unused-auth:   GET /signal, an async route that never reads the user, with a valid token
+
+Tokens are HS256, signed locally with the configured SUPABASE_JWT_SECRET.
+
+Usage (from apps/backend):
+
+    python -m benchmarks.auth_middleware_bench --requests 5000 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import sys
+import time
+from typing import Optional
+
+import numpy as np
+
+
+SCENARIOS = ("public", "protected", "protected-new", "anonymous", "unused-auth")
+MIDDLEWARES = ("legacy", "asgi")
+
+
+def _legacy_middleware_class():
+    """The BaseHTTPMiddleware implementation this benchmark compares against."""
+    from starlette.middleware.base import BaseHTTPMiddleware
+
+    from app.core.auth import User, decode_supabase_jwt
+    from app.core.auth_middleware import _extract_bearer_token
+
+    class LegacyAuthMiddleware(BaseHTTPMiddleware):
+        async def dispatch(self, request, call_next):
+            token = _extract_bearer_token(request.headers.get("authorization"))
+            request.state.user = None
+            request.state.jwt = None
+            if token:
+                try:
+                    payload = decode_supabase_jwt(token)
+                    user_id = str(payload.get("sub") or payload.get("user_id") or "")
+                    if user_id:
+                        request.state.user = User(id=user_id, email=str(payload.get("email") or ""))
+                        request.state.jwt = token
+                except Exception:
+                    pass
+            return await call_next(request)
+
+    return LegacyAuthMiddleware
+
+
+def build_app(middleware: str):
+    from fastapi import Depends, FastAPI
+
+    from app.core.auth import User, get_current_user
+    from app.core.auth_middleware import AuthMiddleware
+
+    app = FastAPI()
+
+    @app.get("/health")
+    def health() -> dict:
+        return {"status": "ok"}
+
+    @app.get("/protected")
+    def protected(user: User = Depends(get_current_user)) -> dict:
+        return {"id": user.id}
+
+    @app.post("/signal")
+    async def signal() -> dict:
+        return {"ok": True}
+
+    app.add_middleware(_legacy_middleware_class() if middleware == "legacy" else AuthMiddleware)
+    return app
+
+
+def make_token(sub: str, *, ttl: int = 3600) -> str:
+    from jose import jwt
+
+    from app.core.auth import _get_expected_issuer
+    from app.core.config import get_settings
+
+    claims = {"sub": sub, "email": f"{sub}@bench.local", "aud": "authenticated", "iss": _get_expected_issuer(), "exp": int(time.time()) + ttl}
+    return jwt.encode(claims, get_settings().get_supabase_jwt_secret(), algorithm="HS256")
+
+
+def _scope(method: str, path: str, token: Optional[str]) -> dict:
+    headers = [(b"host", b"bench.local")]
+    if token:
+        headers.append((b"authorization", f"Bearer {token}".encode("latin-1")))
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": headers,
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench.local", 80),
+    }
+
+
+async def _call(app, scope: dict) -> int:
+    status = 0
+
+    async def receive() -> dict:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: dict) -> None:
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+def _request_for(scenario: str, i: int, token: str, fresh_tokens: list[str]) -> tuple[str, str, Optional[str]]:
+    if scenario == "public":
+        return "GET", "/health", token
+    if scenario == "protected":
+        return "GET", "/protected", token
+    if scenario == "protected-new":
+        return "GET", "/protected", fresh_tokens[i]
+    if scenario == "anonymous":
+        return "GET", "/protected", None
+    return "POST", "/signal", token
+
+
+async def run_scenario(app, scenario: str, requests: int, concurrency: int) -> dict:
+    token = make_token("bench-user")
+    # Signed up front so token creation is not part of the measurement
+    fresh_tokens = [make_token(f"bench-{i}") for i in range(requests)] if scenario == "protected-new" else []
+    scopes = [_scope(*_request_for(scenario, i, token, fresh_tokens)) for i in range(requests)]
+    # Warm up routing, dependency caches and the token cache for the repeat-token scenarios
+    for scope in scopes[: min(50, requests)]:
+        await _call(app, dict(scope))
+
+    latencies = np.zeros(requests, dtype=np.float64)
+    statuses: dict[int, int] = {}
+    next_index = 0
+
+    async def worker() -> None:
+        nonlocal next_index
+        while next_index < requests:
+            i = next_index
+            next_index += 1
+            t0 = time.perf_counter()
+            status = await _call(app, dict(scopes[i]))
+            latencies[i] = time.perf_counter() - t0
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+    return {
+        "scenario": scenario,
+        "requests": requests,
+        "concurrency": concurrency,
+        "rps": round(requests / wall, 1),
+        "p50_us": round(float(np.percentile(latencies, 50)) * 1e6, 1),
+        "p99_us": round(float(np.percentile(latencies, 99)) * 1e6, 1),
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+    }
+
+
+def run_benchmark(scenarios: list[str], middlewares: list[str], requests: int, concurrency: int) -> dict:
+    results = []
+    for middleware in middlewares:
+        app = build_app(middleware)
+        for scenario in scenarios:
+            result = asyncio.run(run_scenario(app, scenario, requests, concurrency))
+            results.append({"middleware": middleware, **result})
+            print(
+                f"{middleware:>7} {scenario:<14} {result['rps']:>10.1f} req/s  p50 {result['p50_us']:>8.1f}us  p99 {result['p99_us']:>8.1f}us",
+                file=sys.stderr,
+            )
+    return {
+        "meta": {"python": platform.python_version(), "machine": platform.machine(), "requests": requests, "concurrency": concurrency},
+        "results": results,
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Scenarios: " + ", ".join(SCENARIOS))
+    parser.add_argument("--middlewares", default=",".join(MIDDLEWARES), help="Middlewares: " + ", ".join(MIDDLEWARES))
+    parser.add_argument("--output", help="Write JSON results to this file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    scenarios = [s for s in args.scenarios.split(",") if s]
+    middlewares = [m for m in args.middlewares.split(",") if m]
+    unknown = sorted(set(scenarios) - set(SCENARIOS)) + sorted(set(middlewares) - set(MIDDLEWARES))
+    if unknown:
+        parser.error(f"unknown scenario or middleware: {', '.join(unknown)}")
+
+    report = run_benchmark(scenarios, middlewares, args.requests, args.concurrency)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
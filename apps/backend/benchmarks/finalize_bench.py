@@ -0,0 +1,308 @@
+"""Finalize pipeline benchmark.
+
+Generates deterministic fixture recordings with PyAV, runs the finalize stages on them with the
+production ffmpeg commands (audio extraction, MP4 transcode strategies, remux) plus an upload
+through `upload_session_artifact` into a local storage stand-in, and writes machine-readable
+results: seconds per recorded minute, peak RSS (stage process and its ffmpeg children) and
+output sizes.
+
+Every stage runs in a fresh process so peak RSS is attributable to that stage.
+
+Usage (from apps/backend):
+
+    python -m benchmarks.finalize_bench --lengths 15,60 --output bench.json
+    python -m benchmarks.finalize_bench --baseline bench.json --tolerance 0.15
+
+With --baseline the run exits non-zero when a stage got slower or larger in memory than the
+baseline by more than the tolerance.
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from fractions import Fraction
+from multiprocessing import get_context
+from typing import Any, Optional
+
+import numpy as np
+
+
+WIDTH, HEIGHT, FPS = 640, 360, 30
+SAMPLE_RATE = 48000
+AUDIO_FRAME = 960
+
+# fixture codec -> (container extension, video codec, audio codec)
+FIXTURE_CODECS: dict[str, tuple[str, str, str]] = {
+    # What the aiortc MediaRecorder writes server-side
+    "h264-aac": (".mkv", "libx264", "aac"),
+    # What a browser MediaRecorder typically produces
+    "vp8-opus": (".webm", "libvpx", "libopus"),
+}
+
+VIDEO_STRATEGIES = ("default", "ultrafast", "no-genpts", "vfr", "remux")
+AUDIO_CODECS = ("wav", "flac", "opus")
+
+
+# --- Fixtures -----------------------------------------------------------------
+
+
+def generate_fixture(path: str, codec: str, seconds: int, seed: int = 7) -> str:
+    """Write a deterministic recording: moving gradient + fixed noise video, tone + noise audio."""
+    import av
+
+    ext, vcodec, acodec = FIXTURE_CODECS[codec]
+    rng = np.random.default_rng(seed)
+    noise = [rng.integers(0, 24, size=(HEIGHT, WIDTH, 3), dtype=np.uint8) for _ in range(8)]
+    ramp = np.linspace(0, 255, WIDTH, dtype=np.float32)
+    audio_noise = (rng.standard_normal(AUDIO_FRAME * 50) * 0.01).astype(np.float32)
+
+    with av.open(path, mode="w") as container:
+        vstream = container.add_stream(vcodec, rate=FPS)
+        vstream.width, vstream.height, vstream.pix_fmt = WIDTH, HEIGHT, "yuv420p"
+        if vcodec == "libx264":
+            vstream.options = {"preset": "veryfast"}
+        else:
+            vstream.bit_rate = 1_000_000
+        astream = container.add_stream(acodec, rate=SAMPLE_RATE)
+        astream.layout = "mono"
+
+        n_video = seconds * FPS
+        n_audio = seconds * SAMPLE_RATE // AUDIO_FRAME
+        vi = ai = 0
+        # Interleave by timestamp like a live recording
+        while vi < n_video or ai < n_audio:
+            if vi < n_video and (ai >= n_audio or vi / FPS <= ai * AUDIO_FRAME / SAMPLE_RATE):
+                shift = (vi * 4) % WIDTH
+                luma = np.roll(ramp, shift).astype(np.uint8)
+                img = np.repeat(np.repeat(luma[None, :, None], HEIGHT, axis=0), 3, axis=2)
+                img = img + noise[vi % len(noise)]
+                frame = av.VideoFrame.from_ndarray(img, format="rgb24")
+                frame.pts = vi
+                frame.time_base = Fraction(1, FPS)
+                for packet in vstream.encode(frame):
+                    container.mux(packet)
+                vi += 1
+            else:
+                t = (np.arange(AUDIO_FRAME) + ai * AUDIO_FRAME) / SAMPLE_RATE
+                tone = 0.2 * np.sin(2 * np.pi * (220 + 40 * np.sin(t / 3.0)) * t).astype(np.float32)
+                start = (ai * AUDIO_FRAME) % (len(audio_noise) - AUDIO_FRAME)
+                samples = (tone + audio_noise[start:start + AUDIO_FRAME]).reshape(1, -1)
+                frame = av.AudioFrame.from_ndarray(samples, format="flt", layout="mono")
+                frame.sample_rate = SAMPLE_RATE
+                frame.pts = ai * AUDIO_FRAME
+                frame.time_base = Fraction(1, SAMPLE_RATE)
+                for packet in astream.encode(frame):
+                    container.mux(packet)
+                ai += 1
+        for stream in (vstream, astream):
+            for packet in stream.encode(None):
+                container.mux(packet)
+    return path
+
+
+# --- Stages (each runs in its own process) ------------------------------------
+
+
+def _peak_rss_mb(who: int) -> float:
+    # ru_maxrss is KiB on Linux
+    return round(resource.getrusage(who).ru_maxrss / 1024.0, 1)
+
+
+def _video_command(strategy: str, input_path: str, output_path: str) -> list[str]:
+    from app.services.video_artifacts import mp4_remux_args, mp4_transcode_args
+
+    if strategy == "default":
+        return mp4_transcode_args(input_path, output_path)
+    if strategy == "ultrafast":
+        return mp4_transcode_args(input_path, output_path, preset="ultrafast")
+    if strategy == "no-genpts":
+        return mp4_transcode_args(input_path, output_path, genpts=False)
+    if strategy == "vfr":
+        return mp4_transcode_args(input_path, output_path, cfr=False)
+    if strategy == "remux":
+        return mp4_remux_args(input_path, output_path)
+    raise ValueError(f"Unknown strategy: {strategy}")
+
+
+class _LocalBucket:
+    """Storage stand-in with the storage3 upload signature; consumes the body in 64 KiB reads."""
+
+    def __init__(self, root: str) -> None:
+        self.root = root
+
+    def upload(self, key: str, f: Any, file_options: Optional[dict] = None) -> dict:
+        dest = os.path.join(self.root, key)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        with open(dest, "wb") as out:
+            for chunk in iter(lambda: f.read(64 * 1024), b""):
+                out.write(chunk)
+        return {"Key": key}
+
+
+class _LocalStorage:
+    def __init__(self, root: str) -> None:
+        self._bucket = _LocalBucket(root)
+
+    def from_(self, _bucket: str) -> _LocalBucket:
+        return self._bucket
+
+
+def run_stage(stage: str, strategy: str, input_path: str, work_dir: str, upload_paths: tuple[str, ...] = ()) -> dict:
+    from app.services.audio_artifacts import extract_audio
+
+    if stage == "upload":
+        # The real client is never contacted; placeholders only satisfy client construction
+        os.environ.setdefault("SUPABASE_PROJECT_URL", "http://127.0.0.1:54321")
+        os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.bench")
+        from app.services import artifact_storage
+
+        artifact_storage.supabase = type("_Client", (), {"storage": _LocalStorage(os.path.join(work_dir, "storage"))})()
+
+    # Imports and client setup above are not part of the measured stage
+    started = time.perf_counter()
+    outputs: list[str] = []
+    if stage == "audio":
+        out = extract_audio(input_path, strategy)
+        if not out:
+            raise RuntimeError(f"audio extraction ({strategy}) failed")
+        outputs.append(out)
+    elif stage == "video":
+        out = os.path.join(work_dir, f"out.{strategy}.mp4")
+        subprocess.run(_video_command(strategy, input_path, out), check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        outputs.append(out)
+    elif stage == "upload":
+        digests: dict[str, dict] = {}
+        for path in upload_paths:
+            artifact_storage.upload_session_artifact("bench", path, os.path.basename(path), digests=digests)
+            outputs.append(path)
+    else:
+        raise ValueError(f"Unknown stage: {stage}")
+    wall = time.perf_counter() - started
+    return {
+        "wall_s": round(wall, 3),
+        # ffmpeg child processes of the stage, and the stage's own Python process (uploads)
+        "peak_rss_mb": _peak_rss_mb(resource.RUSAGE_CHILDREN) if stage != "upload" else _peak_rss_mb(resource.RUSAGE_SELF),
+        "output_bytes": sum(os.path.getsize(p) for p in outputs),
+    }
+
+
+# --- Driver ------------------------------------------------------------------
+
+
+def _ffmpeg_version() -> str:
+    try:
+        out = subprocess.run(["ffmpeg", "-version"], check=True, capture_output=True, text=True).stdout
+        return out.splitlines()[0]
+    except Exception:
+        return "unknown"
+
+
+def run_benchmark(lengths: list[int], codecs: list[str], strategies: list[str], audio_codecs: list[str], work_dir: str) -> dict:
+    results: list[dict] = []
+    ctx = get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=ctx, max_tasks_per_child=1) as pool:
+        for codec in codecs:
+            for seconds in lengths:
+                fixture_name = f"{codec}-{seconds}s"
+                fixture_dir = os.path.join(work_dir, fixture_name)
+                os.makedirs(fixture_dir, exist_ok=True)
+                fixture = generate_fixture(os.path.join(fixture_dir, f"recording{FIXTURE_CODECS[codec][0]}"), codec, seconds)
+                plan = [("audio", c) for c in audio_codecs]
+                plan += [("video", s) for s in strategies if not (s == "remux" and codec != "h264-aac")]
+                produced: list[str] = []
+                for stage, strategy in plan:
+                    entry = {"fixture": fixture_name, "codec": codec, "duration_s": seconds, "stage": stage, "strategy": strategy}
+                    try:
+                        entry.update(pool.submit(run_stage, stage, strategy, fixture, fixture_dir).result())
+                        entry["s_per_min"] = round(entry["wall_s"] * 60.0 / seconds, 3)
+                        if (stage, strategy) in (("audio", "flac"), ("video", "default")):
+                            produced.append(os.path.join(fixture_dir, "recording.flac" if stage == "audio" else "out.default.mp4"))
+                    except Exception as e:
+                        entry["error"] = str(e)
+                    results.append(entry)
+                    print(json.dumps(entry), file=sys.stderr)
+                if produced:
+                    entry = {"fixture": fixture_name, "codec": codec, "duration_s": seconds, "stage": "upload", "strategy": "local"}
+                    try:
+                        entry.update(pool.submit(run_stage, "upload", "local", fixture, fixture_dir, tuple(produced)).result())
+                        entry["s_per_min"] = round(entry["wall_s"] * 60.0 / seconds, 3)
+                        entry["mb_per_s"] = round(entry["output_bytes"] / 1e6 / max(entry["wall_s"], 1e-6), 1)
+                    except Exception as e:
+                        entry["error"] = str(e)
+                    results.append(entry)
+                    print(json.dumps(entry), file=sys.stderr)
+    return {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "ffmpeg": _ffmpeg_version(),
+            "env": {k: os.getenv(k) for k in ("FFMPEG_PRESET", "FFMPEG_CRF", "FFMPEG_FPS", "AUDIO_OPUS_BITRATE")},
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Regressions of s_per_min / peak_rss_mb beyond `tolerance` (fractional) vs. the baseline."""
+    key = lambda r: (r["fixture"], r["stage"], r["strategy"])  # noqa: E731
+    base = {key(r): r for r in baseline.get("results", []) if "error" not in r}
+    regressions: list[str] = []
+    for r in current.get("results", []):
+        b = base.get(key(r))
+        if "error" in r:
+            regressions.append(f"{key(r)}: failed: {r['error']}")
+            continue
+        if not b:
+            continue
+        for metric in ("s_per_min", "peak_rss_mb"):
+            if b.get(metric) and r.get(metric, 0) > b[metric] * (1 + tolerance):
+                regressions.append(f"{key(r)}: {metric} {b[metric]} -> {r[metric]}")
+    return regressions
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--lengths", default="15,60", help="Fixture lengths in seconds, comma separated")
+    parser.add_argument("--codecs", default=",".join(FIXTURE_CODECS), help="Fixture codecs: " + ", ".join(FIXTURE_CODECS))
+    parser.add_argument("--strategies", default=",".join(VIDEO_STRATEGIES), help="Video strategies: " + ", ".join(VIDEO_STRATEGIES))
+    parser.add_argument("--audio-codecs", default=",".join(AUDIO_CODECS))
+    parser.add_argument("--work-dir", help="Keep fixtures and outputs here (default: temporary, removed)")
+    parser.add_argument("--output", help="Write JSON results to this file (default: stdout)")
+    parser.add_argument("--baseline", help="Compare against a previous results file")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args(argv)
+
+    split = lambda v: [x.strip() for x in v.split(",") if x.strip()]  # noqa: E731
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="finalize_bench_")
+    try:
+        report = run_benchmark([int(x) for x in split(args.lengths)], split(args.codecs), split(args.strategies), split(args.audio_codecs), work_dir)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
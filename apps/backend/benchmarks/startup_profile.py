@@ -0,0 +1,132 @@
+"""Startup import profile.
+
+Imports `app.main` in fresh interpreters with `-X importtime` and reports import time per
+module: the slowest modules by cumulative time, the third-party packages that dominate, and
+the app's own modules. The median over --runs is reported so a cold page cache in the first
+run does not skew the result.
+
+Usage (from apps/backend):
+
+    python -m benchmarks.startup_profile --runs 5 --output startup.json
+    python -m benchmarks.startup_profile --baseline startup.json --tolerance 0.2
+
+With --baseline the run exits non-zero when the total import time grew by more than the
+tolerance, or a package that was not imported at startup before (e.g. aiortc) now is.
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+from typing import Optional
+
+
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+# Packages that are deliberately loaded on first use rather than at startup
+LAZY_PACKAGES = ("aiortc", "av", "brevo_python")
+
+
+def profile_once(target: str) -> dict[str, tuple[int, int, int]]:
+    """module -> (self us, cumulative us, nesting depth) for one cold import of `target`."""
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [os.getcwd(), os.environ.get("PYTHONPATH")]))}
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules: dict[str, tuple[int, int, int]] = {}
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if m:
+            modules[m.group(4)] = (int(m.group(1)), int(m.group(2)), len(m.group(3)) // 2)
+    return modules
+
+
+def run_profile(target: str, runs: int, top: int) -> dict:
+    samples = [profile_once(target) for _ in range(runs)]
+    names = set().union(*samples)
+    median = {
+        name: (
+            statistics.median(s[name][0] for s in samples if name in s),
+            statistics.median(s[name][1] for s in samples if name in s),
+            next(s[name][2] for s in samples if name in s),
+        )
+        for name in names
+    }
+    total_us = median[target][1] if target in median else sum(v[0] for v in median.values())
+
+    # Top-level packages: cumulative time of their outermost import
+    packages: dict[str, float] = {}
+    for name, (_self, cumulative, _depth) in median.items():
+        root = name.split(".")[0]
+        if root == name or root not in median:
+            packages[root] = max(packages.get(root, 0.0), cumulative)
+    ms = lambda us: round(us / 1000.0, 1)  # noqa: E731
+    return {
+        "meta": {"python": platform.python_version(), "machine": platform.machine(), "target": target, "runs": runs},
+        "total_ms": ms(total_us),
+        "modules_imported": len(median),
+        "lazy_packages_loaded": sorted(p for p in LAZY_PACKAGES if p in median),
+        "packages": [
+            {"package": p, "cumulative_ms": ms(us)}
+            for p, us in sorted(packages.items(), key=lambda kv: -kv[1])[:top]
+        ],
+        "slowest_self": [
+            {"module": n, "self_ms": ms(v[0]), "cumulative_ms": ms(v[1])}
+            for n, v in sorted(median.items(), key=lambda kv: -kv[1][0])[:top]
+        ],
+        "app_modules": [
+            {"module": n, "self_ms": ms(v[0]), "cumulative_ms": ms(v[1])}
+            for n, v in sorted(median.items(), key=lambda kv: -kv[1][1])
+            if n == "app" or n.startswith("app.")
+        ],
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Startup regressions vs. the baseline: total import time and newly eager lazy packages."""
+    regressions: list[str] = []
+    if baseline.get("total_ms") and current["total_ms"] > baseline["total_ms"] * (1 + tolerance):
+        regressions.append(f"total_ms {baseline['total_ms']} -> {current['total_ms']}")
+    for package in sorted(set(current["lazy_packages_loaded"]) - set(baseline.get("lazy_packages_loaded", []))):
+        regressions.append(f"{package} is imported at startup again")
+    return regressions
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--target", default="app.main", help="Module to import")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=25, help="Entries in the package and module lists")
+    parser.add_argument("--output", help="Write JSON results to this file (default: stdout)")
+    parser.add_argument("--baseline", help="Compare against a previous results file")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    report = run_profile(args.target, max(1, args.runs), args.top)
+    print(f"{args.target}: {report['total_ms']} ms, {report['modules_imported']} modules", file=sys.stderr)
+    for entry in report["packages"][:10]:
+        print(f"  {entry['package']:<24} {entry['cumulative_ms']:>8.1f} ms", file=sys.stderr)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
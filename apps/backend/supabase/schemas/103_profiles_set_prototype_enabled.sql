@@ -0,0 +1,37 @@
+-- Set or toggle a profile's prototype flag in one round trip
+
+-- Checks that the caller is an admin or moderator, creates the target profile if missing and
+-- returns the new value. p_enabled = null toggles (a missing profile counts as false).
+create or replace function public.set_prototype_enabled(
+  p_caller uuid,
+  p_target uuid,
+  p_enabled boolean default null
+)
+returns boolean
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+  v_enabled boolean;
+begin
+  if not exists (
+    select 1 from public.profiles
+    where id = p_caller and lower(role) in ('admin', 'moderator')
+  ) then
+    raise exception 'Admin or moderator role required' using errcode = '42501';
+  end if;
+
+  insert into public.profiles as p (id, role, prototype_enabled)
+  values (p_target, 'patient', coalesce(p_enabled, true))
+  on conflict (id) do update
+    set prototype_enabled = coalesce(p_enabled, not p.prototype_enabled)
+  returning p.prototype_enabled into v_enabled;
+
+  return v_enabled;
+end;
+$$;
+
+-- p_caller is trusted input: only the backend (service role) may call this
+revoke all on function public.set_prototype_enabled(uuid, uuid, boolean) from public, anon, authenticated;
+grant execute on function public.set_prototype_enabled(uuid, uuid, boolean) to service_role;
@@ -0,0 +1,3 @@
+-- Object key of the per-screening analysis time-series container (sessions/{id}/analysis.anqts)
+alter table if exists public.screenings
+  add column if not exists storage_analysis_key text;
@@ -0,0 +1,3 @@
+-- Object key of the HLS master playlist (sessions/{id}/hls/master.m3u8) when packaging is enabled
+alter table if exists public.screenings
+  add column if not exists storage_hls_key text;
@@ -0,0 +1,5 @@
+-- Small derived artifacts for the review timeline: waveform peaks JSON and thumbnail sprite + WebVTT index
+alter table if exists public.screenings
+  add column if not exists storage_peaks_key text,
+  add column if not exists storage_thumbnails_key text,
+  add column if not exists storage_thumbnails_vtt_key text;
@@ -0,0 +1,4 @@
+-- Content digests of uploaded artifacts, keyed by object key: {"sessions/<id>/recording.mp4": {"sha256": "...", "bytes": 123}}
+-- Finalize retries and re-runs skip uploads whose stored digest matches the local file
+alter table if exists public.screenings
+  add column if not exists artifact_digests jsonb not null default '{}'::jsonb;
@@ -0,0 +1,3 @@
+-- Aggregated RTCPeerConnection stats for the session (bitrate, loss, jitter, fps summaries, reconnects)
+alter table if exists public.screenings
+  add column if not exists rtc_stats jsonb;
@@ -0,0 +1,7 @@
+-- Client-side ingestion: 'client' sessions are recorded in the browser and uploaded as chunks
+-- under sessions/{id}/chunks/; the manifest lists them ({mime_type, chunks: [{index, bytes, sha256?}]})
+alter table if exists public.screenings
+  add column if not exists ingest_mode text not null default 'webrtc';
+
+alter table if exists public.screenings
+  add column if not exists ingest_manifest jsonb;
@@ -0,0 +1,83 @@
+-- Shared sliding-window-counter rate limits (RATE_LIMIT_BACKEND=postgres)
+
+create table if not exists public.rate_limit_counters (
+  key text not null,
+  window_seconds integer not null,
+  window_index bigint not null,
+  prev_count integer not null default 0,
+  curr_count integer not null default 0,
+  primary key (key, window_seconds)
+);
+
+-- Backend-only table: no policies, so RLS denies every client role
+alter table public.rate_limit_counters enable row level security;
+
+-- Count one event for p_key unless that exceeds p_max_events over the sliding window;
+-- returns whether the event was admitted
+create or replace function public.rate_limit_hit(
+  p_key text,
+  p_max_events integer,
+  p_window_seconds integer
+)
+returns boolean
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+  v_now double precision := extract(epoch from clock_timestamp());
+  v_index bigint := floor(v_now / p_window_seconds);
+  v_fraction double precision := (v_now - v_index * p_window_seconds) / p_window_seconds;
+  v_row public.rate_limit_counters%rowtype;
+  v_prev integer := 0;
+  v_curr integer := 0;
+  v_admitted boolean;
+begin
+  insert into public.rate_limit_counters (key, window_seconds, window_index)
+  values (p_key, p_window_seconds, v_index)
+  on conflict (key, window_seconds) do nothing;
+
+  select * into v_row from public.rate_limit_counters
+  where key = p_key and window_seconds = p_window_seconds
+  for update;
+
+  if v_row.window_index = v_index then
+    v_prev := v_row.prev_count;
+    v_curr := v_row.curr_count;
+  elsif v_row.window_index = v_index - 1 then
+    v_prev := v_row.curr_count;
+  end if;
+
+  v_admitted := v_prev * (1 - v_fraction) + v_curr + 1 <= p_max_events;
+
+  update public.rate_limit_counters
+  set window_index = v_index,
+      prev_count = v_prev,
+      curr_count = case when v_admitted then v_curr + 1 else v_curr end
+  where key = p_key and window_seconds = p_window_seconds;
+
+  return v_admitted;
+end;
+$$;
+
+-- Remove keys idle for two windows (their counters have decayed to zero)
+create or replace function public.rate_limit_evict()
+returns integer
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+  v_removed integer;
+begin
+  delete from public.rate_limit_counters
+  where window_index < floor(extract(epoch from clock_timestamp()) / window_seconds) - 1;
+  get diagnostics v_removed = row_count;
+  return v_removed;
+end;
+$$;
+
+revoke all on function public.rate_limit_hit(text, integer, integer) from public, anon, authenticated;
+revoke all on function public.rate_limit_evict() from public, anon, authenticated;
+grant execute on function public.rate_limit_hit(text, integer, integer) to service_role;
+grant execute on function public.rate_limit_evict() to service_role;
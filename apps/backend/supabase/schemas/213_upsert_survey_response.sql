@@ -0,0 +1,67 @@
+-- Save a survey response (autosave or submit) in one round trip
+
+-- Ensures the catalog row exists, then inserts or updates the response of
+-- (survey_type:survey_version, client_session_id) atomically. p_answers_text = null keeps the
+-- stored text; a submit (or any non-autosave save) stamps submitted_at and finalizes the row.
+-- p_ensure_survey = false skips the catalog insert (a write on every autosave) for surveys the
+-- backend knows exist; if one has disappeared since, the response insert fails with a foreign
+-- key violation (23503) and the backend retries with true. Returns the response id.
+create or replace function public.upsert_survey_response(
+  p_survey_type text,
+  p_survey_version text,
+  p_client_session_id text,
+  p_answers jsonb,
+  p_is_autosave boolean,
+  p_submit boolean default false,
+  p_answers_text jsonb default null,
+  p_ip_address text default null,
+  p_user_agent text default null,
+  p_auth_user_id uuid default null,
+  p_ensure_survey boolean default true
+)
+returns uuid
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+  v_survey_id text := p_survey_type || ':' || p_survey_version;
+  v_submit boolean := coalesce(p_submit, false) or not p_is_autosave;
+  v_id uuid;
+begin
+  if p_ensure_survey then
+    insert into public.surveys (id, survey_type, survey_version, status)
+    values (v_survey_id, p_survey_type, p_survey_version, 'active')
+    on conflict do nothing;
+  end if;
+
+  insert into public.survey_responses as r (
+    survey_id, survey_type, survey_version, client_session_id, answers, answers_text,
+    is_autosave, ip_address, user_agent, auth_user_id, submitted_at, finalized
+  )
+  values (
+    v_survey_id, p_survey_type, p_survey_version, p_client_session_id,
+    coalesce(p_answers, '{}'::jsonb), coalesce(p_answers_text, '{}'::jsonb),
+    p_is_autosave, p_ip_address, p_user_agent, p_auth_user_id,
+    case when v_submit then now() end, v_submit
+  )
+  on conflict (survey_id, client_session_id) do update
+    set answers = excluded.answers,
+        answers_text = case when p_answers_text is null then r.answers_text else excluded.answers_text end,
+        is_autosave = excluded.is_autosave,
+        ip_address = excluded.ip_address,
+        user_agent = excluded.user_agent,
+        auth_user_id = excluded.auth_user_id,
+        submitted_at = case when v_submit then now() else r.submitted_at end,
+        finalized = r.finalized or v_submit
+  returning r.id into v_id;
+
+  return v_id;
+end;
+$$;
+
+-- Caller identity and IP are trusted input: only the backend (service role) may call this
+revoke all on function public.upsert_survey_response(text, text, text, jsonb, boolean, boolean, jsonb, text, text, uuid, boolean)
+  from public, anon, authenticated;
+grant execute on function public.upsert_survey_response(text, text, text, jsonb, boolean, boolean, jsonb, text, text, uuid, boolean)
+  to service_role;